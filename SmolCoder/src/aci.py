@@ -1,21 +1,59 @@
 # Agent-Computer Interface
 # Manages tool use and augments prompts with auxiliary information, such as the current working directory
 
-from typing import List, Tuple
+import math
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 from pathlib import Path
 
+from SmolCoder.src.cancellation import DeadlineExceeded, run_with_deadline
+from SmolCoder.src.meta_tokenizer import WHOLE_ARGUMENT_TOOLS
+from SmolCoder.src.output_capture import capture_output
+from SmolCoder.src.pagination import truncate
+from SmolCoder.src.symbol_index import find_symbol_index, get_symbol_index
 from SmolCoder.src.toolkit import SearchMode, Toolkit
+from SmolCoder.src.tools.tool import Tool
+
+
+class MemoStats(NamedTuple):
+    hits: int = 0
+    misses: int = 0
+    seconds_saved: float = 0.0      # the time the memoized calls took when they were run
+    prefetched: int = 0             # observations that were computed while the model was still generating
 
 
 class AgentComputerInterface:
 
-    def __init__(self, cwd:Path, tools:Toolkit, logger) -> None:
+    def __init__(self, cwd:Path, tools:Toolkit, logger, watch_files:bool = False, tool_timeout:Optional[float] = 60.0, tool_timeouts:Optional[Dict[str, float]] = None, max_parallel_actions:int = 4, max_observation_tokens:Optional[int] = 2000) -> None:
         assert(cwd.exists())
         self.cwd = cwd
         self.tools = tools
-        self.search_mode:SearchMode = SearchMode.EXACT
+        # small typos in tool names are corrected instead of costing another call
+        self.search_mode:SearchMode = SearchMode.FUZZY
         self.finished = False
         self.logger = logger 
+        # tools that take longer are cancelled and the agent gets a timeout observation, None waits forever
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = tool_timeouts or {}
+        self.max_parallel_actions = max_parallel_actions
+        # every observation is resent with each later call, so they are cut off at this size, None for no limit
+        self.max_observation_tokens = max_observation_tokens
+
+        # (tool, normalized arguments, cwd) -> (observation, seconds the call took)
+        self._memo: Dict[Tuple[str, Tuple[str, ...], str], Tuple[str, float]] = {}
+        self._memo_stats = MemoStats()
+        self._memo_generation = 0
+        # prefetched observations that were not asked for yet: key -> (future, memo generation at the start)
+        self._prefetches: Dict[Tuple[str, Tuple[str, ...], str], Tuple[Future, int]] = {}
+        self._memo_lock = threading.Lock()
+        self._watched_roots: Set[Path] = set()
+
+        # Keeps the symbol index in sync with files that get changed outside of the tools, e.g. by executed code
+        if watch_files:
+            get_symbol_index(cwd, logger).start_watching()
 
     def _generate_cwd_information(self) -> str:
         return f"(Current Working Directory: {str(self.cwd)}) \n"
@@ -31,8 +69,6 @@ class AgentComputerInterface:
             self.logger.debug("New directory path: " + str(path))
         
         if path.exists():
-            if self.logger is not None:
-                print("The New directory path doesn't exist.")
             if path.is_dir():
                 self.cwd = path
                 return f"Set the current working directory to `{str(self.cwd)}`."
@@ -42,34 +78,264 @@ class AgentComputerInterface:
             return f"Could not change the current working directory to {new_dir}, as it does not exist."
 
     def get_observation(self, tool_name:str, input_variables: List[str]) -> str:
-        if tool_name == "Move_to_Folder":
+        return self.get_observations([(tool_name, input_variables)])
+
+    def get_observations(self, actions: List[Tuple[str, List[str]]]) -> str:
+        """
+        Executes the actions of one step. Consecutive read-only actions run concurrently, consecutive calls of a
+        transactional tool (e.g. several Replace_Method) are made as one, all others one after another.
+        The observations are merged in the order of the actions. Actions after a `Finish` are skipped.
+        """
+        resolved = [self._resolve_tool(tool_name, input_variables) for tool_name, input_variables in actions]
+        observations: List[Optional[str]] = [None] * len(actions)
+
+        index = 0
+        while index < len(actions) and not self.finished:
+            end = index + 1
+            if self._is_read_only(*resolved[index][:2]):
+                while end < len(actions) and self._is_read_only(*resolved[end][:2]):
+                    end += 1
+            elif self._is_transactional(*resolved[index][:2]):
+                while end < len(actions) and resolved[end][0] is resolved[index][0] and self._is_transactional(*resolved[end][:2]):
+                    end += 1
+                if end - index > 1:
+                    observations[index:end] = self._observe_together(index, resolved[index:end])
+                    index = end
+                    continue
+
+            if end - index > 1:
+                with ThreadPoolExecutor(max_workers=min(end - index, self.max_parallel_actions)) as executor:
+                    futures = [executor.submit(self._observe, tool_name, *resolved[i]) for i, (tool_name, _) in enumerate(actions[index:end], start=index)]
+                    for i, future in enumerate(futures, start=index):
+                        observations[i] = future.result()
+            else:
+                observations[index] = self._observe(actions[index][0], *resolved[index])
+            index = end
+
+        if len(actions) == 1:
+            obs = observations[0]
+            if self._is_move(actions[0][0], resolved[0][0]):
+                return obs
+        else:
+            obs = "\n".join(f"({i}) {tool_name}: " + (observation if observation is not None else "Skipped, as the task was finished before.")
+                             for i, ((tool_name, _), observation) in enumerate(zip(actions, observations), start=1))
+
+        if not self.finished:
+            obs += f"\n{self._generate_cwd_information()}\n"
+        return obs
+
+    def _resolve_tool(self, tool_name: str, input_variables: List[str]) -> Tuple[Optional[Tool], List[str], str]:
+        """
+        Finds the tool, returns it with the input variables and a note if its name had to be corrected.
+        """
+        tool = self.tools.find_tool(tool_name, mode=self.search_mode)
+        correction = ""
+        if tool is not None and tool.name.lower() != tool_name.lower():
+            if self.logger is not None:
+                self.logger.info("Corrected the tool name %s to %s", tool_name, tool.name)
+            correction = f"(There is no tool `{tool_name}`, used `{tool.name}` instead.)\n"
+            if tool.name in WHOLE_ARGUMENT_TOOLS and tool_name not in WHOLE_ARGUMENT_TOOLS:
+                # the tokenizer split the argument at its commas, since it did not know the tool
+                input_variables = [", ".join(input_variables)]
+        return tool, input_variables, correction
+
+    @staticmethod
+    def _is_read_only(tool: Optional[Tool], input_variables: List[str]) -> bool:
+        return tool is not None and tool.name != "Move_to_Folder" and tool.read_only and tool.valid_params(input_variables)
+
+    @staticmethod
+    def _is_transactional(tool: Optional[Tool], input_variables: List[str]) -> bool:
+        return tool is not None and tool.transactional and tool.valid_params(input_variables)
+
+    @staticmethod
+    def _is_move(tool_name: str, tool: Optional[Tool]) -> bool:
+        return tool_name == "Move_to_Folder" or (tool is not None and tool.name == "Move_to_Folder")
+
+    def _observe(self, tool_name: str, tool: Optional[Tool], input_variables: List[str], correction: str) -> str:
+        if self._is_move(tool_name, tool):
             assert len(input_variables) == 1, f"Input variables for `Move_to_Folder` are not of length 1: {input_variables}"
             new_dir = input_variables[0]
-            return self._change_cwd(new_dir)
+            return correction + self._change_cwd(new_dir)
+
+        if (tool is None):
+            obs =  (
+                f"No tool was found. Please choose one of the following tools: {self.tools.print_tool_short_descs()}."
+                "Remember that to use a tool it has to follow the format of Tool_Name[arg1, arg2, ...]."
+            )
+        elif (not tool.valid_params(input_variables)):
+            obs = tool.invalid_params_message(input_variables)
         else:
-            tool = self.tools.find_tool(tool_name)
-            if (tool is None):
-                obs =  (
-                    f"No tool was found. Please choose one of the following tools: {self.tools.print_tool_short_descs()}."
-                    "Remember that to use a tool it has to follow the format of Tool_Name[arg1, arg2, ...]."
-                )
-            elif (not tool.valid_params(input_variables)):
-                obs = (
-                    f"The tool expected {tool.number_of_input_variables()} parameters, but got {len(input_variables)}.\n"
-                    f"The parameters that the tool {tool.name} needs are {tool.input_variables}"
-                    )
-            else:
-                if tool_name == "Finish":
-                    self.finished = True
-                input_variables = [self._remove_encapsulating_quotes(i_v) for i_v in input_variables]
-                obs = tool(input_variables, cwd=self.cwd, logger=self.logger)
-            
-            if not self.finished:
-                cwd_msg = f"\n{self._generate_cwd_information()}\n"
-                obs += cwd_msg
+            if tool.name == "Finish":
+                self.finished = True
+            input_variables = [self._remove_encapsulating_quotes(i_v) for i_v in input_variables]
+            obs = self._run_memoized(tool, input_variables)
+            if self.max_observation_tokens is not None and tool.name != "Finish":
+                obs = truncate(obs, self.max_observation_tokens)
+
+        return correction + obs
 
+    def _observe_together(self, index: int, resolved: List[Tuple[Tool, List[str], str]]) -> List[str]:
+        """
+        Makes the calls of a transactional tool as one, the first action gets the observation.
+        """
+        tool = resolved[0][0]
+        input_variables_list = [[self._remove_encapsulating_quotes(i_v) for i_v in input_variables] for _, input_variables, _ in resolved]
+        obs, _ = self._run(tool, input_variables_list, call=lambda cwd: tool.call_many(input_variables_list, cwd=cwd, logger=self.logger))
+        self.clear_memo()
+        if self.max_observation_tokens is not None:
+            obs = truncate(obs, self.max_observation_tokens)
+        return [resolved[0][2] + obs] + [correction + f"Done together with ({index + 1}), see there." for _, _, correction in resolved[1:]]
+
+    def _run_memoized(self, tool: Tool, input_variables: List[str]) -> str:
+        """
+        Observations of read-only tools are reused within the trajectory until a file changes:
+        after every tool that is not read-only and whenever the symbol index notices a change.
+        """
+        if not tool.memoizable:
+            obs, _ = self._run(tool, input_variables)
+            if not tool.read_only:
+                self.clear_memo()
             return obs
 
+        key = self._memo_key(tool, input_variables)
+        with self._memo_lock:
+            if key in self._memo:
+                obs, seconds = self._memo[key]
+                self._memo_stats = self._memo_stats._replace(hits=self._memo_stats.hits + 1,
+                                                             seconds_saved=self._memo_stats.seconds_saved + seconds)
+                return obs
+            prefetch = self._prefetches.pop(key, None)
+            generation = self._memo_generation
+
+        if prefetch is not None and prefetch[1] == generation:
+            # started while the action was generated, no file changed since then
+            obs, completed, seconds = prefetch[0].result()
+            with self._memo_lock:
+                if completed and generation == self._memo_generation:
+                    self._memo_stats = self._memo_stats._replace(prefetched=self._memo_stats.prefetched + 1)
+                    self._memo[key] = (obs, seconds)
+                    return obs
+
+        self._watch_index(tool)
+        obs, completed, seconds = self._timed_run(tool, input_variables)
+
+        with self._memo_lock:
+            self._memo_stats = self._memo_stats._replace(misses=self._memo_stats.misses + 1)
+            # nothing changed while the tool ran, otherwise the observation may already be outdated
+            if completed and generation == self._memo_generation:
+                self._memo[key] = (obs, seconds)
+        return obs
+
+    def prefetch(self, tool_name: str, input_variables: List[str]) -> bool:
+        """
+        Starts a read-only action in the background, before the model finished generating the step.
+        `_run_memoized` picks up the result once the action is confirmed.
+        Returns False if the action can not be prefetched, because it is unknown or not read-only.
+        """
+        tool, input_variables, _ = self._resolve_tool(tool_name, input_variables)
+        if not self._is_read_only(tool, input_variables) or not tool.memoizable:
+            return False
+
+        input_variables = [self._remove_encapsulating_quotes(i_v) for i_v in input_variables]
+        key = self._memo_key(tool, input_variables)
+        with self._memo_lock:
+            if key in self._memo or key in self._prefetches:
+                return True
+            future: Future = Future()
+            self._prefetches[key] = (future, self._memo_generation)
+
+        self._watch_index(tool)
+
+        def work():
+            try:
+                future.set_result(self._timed_run(tool, input_variables))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=work, name=f"smolcoder-prefetch-{tool.name}", daemon=True).start()
+        return True
+
+    def _memo_key(self, tool: Tool, input_variables: List[str]) -> Tuple[str, Tuple[str, ...], str]:
+        # whitespace within an argument matters, e.g. for Search_Code
+        return tool.name, tuple(i_v.strip() for i_v in input_variables), str(self.cwd)
+
+    def _timed_run(self, tool: Tool, input_variables: List[str]) -> Tuple[str, bool, float]:
+        start = time.perf_counter()
+        obs, completed = self._run(tool, input_variables)
+        return obs, completed, time.perf_counter() - start
+
+    def _run(self, tool: Tool, input_variables: List[str], call: Optional[Callable[[Path], str]] = None) -> Tuple[str, bool]:
+        """
+        Calls the tool with its deadline, returns the observation and whether the tool finished in time.
+        `call` replaces the plain call of the tool, it gets the working directory.
+        """
+        # output the tool prints would otherwise end up in the console, mixed with the one of other agents
+        timeout = self._timeout(tool)
+        cwd = self.cwd
+        completed = True
+        with capture_output() as output:
+            try:
+                if call is None:
+                    obs = run_with_deadline(lambda: tool(input_variables, cwd=cwd, logger=self.logger), timeout, tool.name)
+                else:
+                    obs = run_with_deadline(lambda: call(cwd), timeout, tool.name)
+            except DeadlineExceeded:
+                if self.logger is not None:
+                    self.logger.info("Cancelled %s after %s seconds", tool.name, timeout)
+                if tool.name == "Finish":
+                    self.finished = False
+                obs = (f"The tool {tool.name} did not finish within {timeout:g} seconds and was cancelled. "
+                       "Try it with a narrower input or use another tool.")
+                completed = False
+        if output.getvalue() and self.logger is not None:
+            self.logger.debug("Output of %s: %s", tool.name, output.getvalue())
+        return obs, completed
+
+    @property
+    def memo_stats(self) -> "MemoStats":
+        return self._memo_stats
+
+    def clear_memo(self) -> None:
+        # an observation does not record which files it read, so any change drops all of them
+        with self._memo_lock:
+            self._memo.clear()
+            self._prefetches.clear()
+            self._memo_generation += 1
+
+    def _watch_index(self, tool: Tool) -> None:
+        # files changed by other agents or the file watcher invalidate the memoized observations as well,
+        # only tools that need the symbol index anyway build it, the others just use one that is already there
+        try:
+            index = get_symbol_index(self.cwd, self.logger) if tool.uses_symbol_index else find_symbol_index(self.cwd)
+        except Exception:
+            return
+        if index is None:
+            return
+        with self._memo_lock:
+            if index.root in self._watched_roots:
+                return
+            self._watched_roots.add(index.root)
+
+        reference = weakref.WeakMethod(self.clear_memo)
+
+        def listener(paths: List[Path]) -> None:
+            clear_memo = reference()
+            if clear_memo is None:
+                index.remove_listener(listener)
+            else:
+                clear_memo()
+
+        index.add_listener(listener)
+
+    def _timeout(self, tool) -> float:
+        """
+        The deadline of a tool: configured for its name, its own one or the default, in this order.
+        """
+        timeout = self.tool_timeouts.get(tool.name, tool.deadline)
+        if timeout is None:
+            timeout = self.tool_timeout
+        return math.inf if timeout is None else timeout
+
     def _remove_encapsulating_quotes(self, s) -> str:
         if len(s) >= 2 and ((s[0] == '"' and s[-1] == '"') or (s[0] == "'" and s[-1] == "'")):
             if self.logger is not None:
@@ -2,14 +2,18 @@
 from os import execv
 from pathlib import Path
 
-from SmolCoder.src.meta_tokenizer import Action, MetaToken, MetaTokenizer, Observation
+from SmolCoder.src.meta_tokenizer import QUESTION_TOKEN, Action, IncrementalMetaTokenizer, MetaToken, MetaTokenizer, Observation
 from typing import List 
 
 from typing import List, Optional
 
 from SmolCoder.src.prompting_strategy import PromptingStrategy
+from SmolCoder.src.repo_map import get_repo_map
 from SmolCoder.src.aci import AgentComputerInterface
 from SmolCoder.src.llm_wrapper import LLM
+from SmolCoder.src.embeddings import format_symbol_hits, get_semantic_index
+from SmolCoder.src.localization import format_candidates, get_localizer
+from SmolCoder.src.prefetch import Prefetcher
 from SmolCoder.src.toolkit import Toolkit
 
 
@@ -17,22 +21,32 @@ class SmolCoder:
     """
     This class handles the communication between the prompting strategy and the agent-computer-interface.
     """
-    def __init__(self, model:LLM, codebase_dir:Path, toolkit:Toolkit, logger, prompting_strategy:str = "ReAct", mode:int = 2) -> None:
+    def __init__(self, model:LLM, codebase_dir:Path, toolkit:Toolkit, logger, prompting_strategy:str = "ReAct", mode:int = 2, watch_files:bool = False, localization_k:int = 5, semantic_k:int = 0, repo_map_tokens:int = 0, prefetch:bool = True) -> None:
         if prompting_strategy != "ReAct":
             raise NotImplementedError("Currently, only 'ReAct' is a valid answer.")
         
         """
         Args:
             mode (int): 0 for github_issue_mode, 1 for repoduce_error_mode, 2 for ReAct Mode
+            watch_files (bool): re-index files that are changed outside of the tools while the agent runs
+            localization_k (int): number of candidate files from the localization that are given to the model in github_issue_mode, 0 disables it
+            semantic_k (int): number of semantically similar symbols that are added to the localization, needs an embedding model in Ollama, 0 disables it
+            repo_map_tokens (int): token budget of the repository map in the system prompt, 0 disables it
+            prefetch (bool): start read-only actions while the model is still generating the step
         """
         self.logger = logger
-        self.ACI = AgentComputerInterface(cwd=codebase_dir, tools=toolkit, logger=self.logger)
+        self.mode = mode
+        self.localization_k = localization_k
+        self.semantic_k = semantic_k
+        self.prefetch = prefetch
+        self.ACI = AgentComputerInterface(cwd=codebase_dir, tools=toolkit, logger=self.logger, watch_files=watch_files)
         self.prompting_strategy = PromptingStrategy.create(model, 
                                                            strategy=prompting_strategy, 
                                                            toolkit=toolkit, 
-                                                           mode=mode
+                                                           mode=mode,
+                                                           repo_map=self._repo_map(repo_map_tokens)
                                                            )
-        self.meta_tokenizer = MetaTokenizer(toolkit)
+        self.meta_tokenizer = MetaTokenizer(toolkit, logger)
         self.token_stream: List[MetaToken] = [] # this saves the tokens (Action, Thought, Observation, ...)
         self._history = [] # this saves the history of the trajectory
         
@@ -56,6 +70,46 @@ class SmolCoder:
 
         return result 
 
+    def _repo_map(self, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        try:
+            return get_repo_map(self.ACI.cwd, max_tokens=max_tokens, logger=self.logger)
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.info("Building the repository map failed: %s", e)
+            return ""
+
+    def _localize(self, userprompt: str) -> str:
+        """
+        Ranks the files of the codebase against the issue, before the agent takes its first step.
+        """
+        if self.mode != 0:
+            return ""
+
+        issue = userprompt[len(QUESTION_TOKEN):] if userprompt.startswith(QUESTION_TOKEN) else userprompt
+        hints = []
+        if self.localization_k > 0:
+            try:
+                candidates = get_localizer(self.ACI.cwd, self.logger).localize(issue, k=self.localization_k)
+                if self.logger is not None:
+                    self.logger.info("Localization candidates: %s", [str(candidate.path) for candidate in candidates])
+                hints.append(format_candidates(candidates, self.ACI.cwd))
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.info("Localization failed: %s", e)
+
+        if self.semantic_k > 0:
+            try:
+                symbols = get_semantic_index(self.ACI.cwd, logger=self.logger).search(issue, k=self.semantic_k)
+                if symbols:
+                    hints.append("The following code is the most similar to the issue:\n" + format_symbol_hits(symbols, self.ACI.cwd))
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.info("Semantic localization failed: %s", e)
+
+        return "\n".join(hint for hint in hints if hint)
+
     def _backtrack_action(self) -> bool:
         if isinstance(self.token_stream[-1], Action):
             self.token_stream.pop()
@@ -75,63 +129,68 @@ class SmolCoder:
             self.logger.info("Starting SmolCoder call with userprompt: %s, max_calls: %d", userprompt, max_calls)
         
         trajectory = ""
+        # only the text appended in a step is tokenized, a failed step is rolled back
+        token_stream = IncrementalMetaTokenizer(self.meta_tokenizer)
+        hints = self._localize(userprompt)
+        # memoized observations belong to a trajectory
+        self.ACI.clear_memo()
 
         for i in range(max_calls):
             temp_traj = trajectory
-            temp_token_stream = self.token_stream
+            checkpoint = token_stream.checkpoint()
             if self.logger:
                 self.logger.info("Call iteration: %d", i)
+            prefetcher = Prefetcher(self.ACI) if self.prefetch else None
             if i == 0:
-                temp_traj = self.prompting_strategy(prompt=userprompt, begin=True)
+                temp_traj = self.prompting_strategy(prompt=userprompt, begin=True, hints=hints, on_text=prefetcher)
             else:
-                temp_traj = self.prompting_strategy(prompt=temp_traj, begin=False)
+                temp_traj = self.prompting_strategy(prompt=temp_traj, begin=False, on_text=prefetcher)
+            if prefetcher is not None and prefetcher.started and self.logger:
+                self.logger.debug("Prefetched %d action(s) while generating", prefetcher.started)
             
             if self.logger is not None:
                 self.logger.info(f"Current call trajectory:\n{temp_traj}")
 
-            temp_token_stream = self.meta_tokenizer.tokenize(temp_traj)
-            if not self.meta_tokenizer.is_valid_traj(temp_traj):
+            token_stream.feed(temp_traj[len(trajectory):])
+            if not token_stream.is_valid():
                 if self.logger:
                     self.logger.info("Early error. Backtracking.")
+                token_stream.rollback(checkpoint)
                 continue
 
-            if not isinstance(temp_token_stream[-1], Action):
+            if not isinstance(token_stream[-1], Action):
                 if self.logger:
                     self.logger.info("Action format invalid. Backtracking")
+                token_stream.rollback(checkpoint)
                 continue
-            action: Action = temp_token_stream[-1]
-
-            # Debugging
-            # ------------------------------------------------------------------
-            token_str_test = "("
-            for curr_token in temp_token_stream:
-                token_str_test += str(curr_token) + ", "
-            token_str_test += ")"
-            
-            if isinstance(action, Action):
-                if self.logger:
+            # all actions of the last step, the model may take several independent ones at once
+            actions: List[Action] = []
+            for token in reversed(token_stream):
+                if not isinstance(token, Action):
+                    break
+                actions.insert(0, token)
+
+            if self.logger:
+                for action in actions:
                     self.logger.debug("------")
                     self.logger.debug("action: " + str(action.tool_name))
-
                     self.logger.debug("action args: " + str(action.input_variables))
                     self.logger.debug("------")
-            # ------------------------------------------------------------------      
 
-            tool_name, input_variables = action.unpack()
-            obs = self.ACI.get_observation(tool_name=tool_name, input_variables=input_variables)
+            obs = self.ACI.get_observations([action.unpack() for action in actions])
             temp_traj += obs
+            token_stream.feed(obs)
 
             if self.logger is not None:
                 self.logger.info(f"Current call trajectory:\n{temp_traj}")
 
-            if not self.meta_tokenizer.is_valid_traj(temp_traj):
+            if not token_stream.is_valid():
                 if self.logger:
                     self.logger.info("Trajectory invalid after Observation. Backtracking.")
+                token_stream.rollback(checkpoint)
                 continue
-            temp_token_stream = self.meta_tokenizer.tokenize(temp_traj)
 
             # After successful looping, update agent state
-            self.token_stream = temp_token_stream
             trajectory = temp_traj
             self._history.append(trajectory) #TODO: Make graph
 
@@ -140,7 +199,9 @@ class SmolCoder:
                     self.logger.info("Finished before expiration!")
                 break
         
+        self.token_stream = token_stream.tokens
         if self.logger is not None:
             self.logger.info("Final trajectory: %s", trajectory)
+            self.logger.info("Memoized tool calls: %s", self.ACI.memo_stats)
         
         return trajectory
@@ -10,6 +10,7 @@ import logging
 
 from SmolCoder.src.agent import SmolCoder
 from SmolCoder.src.llm_wrapper import LLM
+from SmolCoder.src.symbol_index import refresh_symbol_index
 
 # This class is a wrapper for the MolCoder Agent, it is responsible for setting up the required enviroment and cleaning up. 
 # Its job is the following:
@@ -28,22 +29,9 @@ class AgentWrapper():
         self.mode = mode
         self.dummy_model = dummy_model
         
-        # For logging purpose
-        #------
-        # ensure logging folder exists
-        log_dir = Path('logs')
-        log_dir.mkdir(exist_ok=True)
-        
-        # generate a logging file
-        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        log_file = log_dir / f'{model}_{current_time}.log'
-
-        logging.basicConfig(filename=log_file, filemode='w', level=logging.DEBUG,
-                            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
         # Only when the logger is enabled do we want to set it
         if self.logging_enabled:
-            self.logger = logging.getLogger(__name__)
+            self.logger = self._create_logger(model)
         else:
             self.logger = None
         
@@ -53,6 +41,23 @@ class AgentWrapper():
         if not os.path.isdir(working_directory):
             os.makedirs(working_directory)
 
+    def _create_logger(self, model: str) -> logging.Logger:
+        # Every agent gets its own logger and file instead of configuring the root logger,
+        # so that several agents can run in one process without mixing their logs.
+        log_dir = Path('logs')
+        log_dir.mkdir(exist_ok=True)
+
+        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        log_file = log_dir / f'{model}_{self.name}_{current_time}.log'
+
+        logger = logging.getLogger(f"{__name__}.{self.name}.{id(self)}")
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        handler = logging.FileHandler(log_file, mode='w')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        logger.addHandler(handler)
+        return logger
+
     def predict(self, row_input: Series):   
         # clone the github repo, from which issue we want to solve
         repo_dir = self._clone_repo(row_input["repo"], row_input["base_commit"])
@@ -70,16 +75,16 @@ class AgentWrapper():
 
         result = agent("[Question]" + str(row_input["problem_statement"]))
         
-        if self.logging_enabled:
-            print("LOGGING: Finished the Agent with the following as return: " + str(result))
+        if self.logger:
+            self.logger.info("Finished the Agent with the following as return: %s", result)
         repo = git.Repo(repo_dir)
         repo.git.add("*")
         
         diff = repo.git.diff("--cached")
         
-        if self.logging_enabled:
-            print("LOGGING: Finished caculating the git diff.")
-            if diff == '': print("LOGGING: Git Diff is empty.")
+        if self.logger:
+            self.logger.info("Finished calculating the git diff.")
+            if diff == '': self.logger.info("Git Diff is empty.")
         
         return diff
 
@@ -98,15 +103,19 @@ class AgentWrapper():
             # clones the repo on which llm will work
             git.Repo.clone_from(repo_url, repo_dir)
 
-        if self.logging_enabled:
-            print("LOGGING: Repo " + str(repo_url) + "downloaded in folder `" + str(repo_dir) + "`.")
+        if self.logger:
+            self.logger.info("Repo %s downloaded in folder `%s`.", repo_url, repo_dir)
             
         # we need to make sure we have the correct commit stage
         repo = git.Repo(repo_dir)
         repo.git.reset('--hard', base_commit)
 
-        if self.logging_enabled:
-            print("LOGGING: Reset Git repo to the commit " + str(base_commit))
+        if self.logger:
+            self.logger.info("Reset Git repo to the commit %s", base_commit)
+
+        # the files changed underneath an index that may still be loaded from the previous instance,
+        # only blobs that are not in the shared blob cache yet get parsed again
+        refresh_symbol_index(Path(repo_dir))
         
         return repo_dir
 
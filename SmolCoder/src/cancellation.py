@@ -0,0 +1,100 @@
+# Cancellation
+# Tools run with a deadline. The tool call runs in a separate thread, if it does not finish in time the agent gets a
+# timeout observation right away and the call is cancelled: long loops, like the walks over the file system, call
+# `check_cancelled` and stop at the next check. Code that never checks (e.g. a blocking `input()`) is abandoned,
+# its thread is a daemon thread and does not keep the process alive.
+
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Cancelled(Exception):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised by `run_with_deadline`, unlike a TimeoutError of the call itself, e.g. of a socket it uses.
+    """
+    pass
+
+
+class CancellationToken:
+    def __init__(self, deadline: Optional[float] = None) -> None:
+        self.deadline = deadline        # in `time.monotonic()` seconds
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise Cancelled
+
+
+_TOKEN: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar("smolcoder_cancellation_token", default=None)
+
+
+def check_cancelled() -> None:
+    """
+    Raises `Cancelled` if the tool call this runs in was cancelled, does nothing outside of tool calls.
+    """
+    token = _TOKEN.get()
+    if token is not None:
+        token.check()
+
+
+def run_with_deadline(function: Callable[[], T], timeout: float, name: str = "tool") -> T:
+    """
+    Runs `function` in a daemon thread with the context of the caller (e.g. its output capture).
+    Raises `DeadlineExceeded` and cancels the call if it takes longer than `timeout` seconds.
+    """
+    if math.isinf(timeout):
+        return function()
+
+    token = CancellationToken(time.monotonic() + timeout)
+    context = contextvars.copy_context()
+    done = threading.Event()
+    outcome = {}
+
+    def target():
+        _TOKEN.set(token)
+        try:
+            outcome["value"] = function()
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=context.run, args=(target,), name=f"smolcoder-{name}", daemon=True).start()
+    if not done.wait(timeout):
+        token.cancel()
+        raise DeadlineExceeded(f"{name} did not finish within {timeout:g} seconds")
+    if isinstance(outcome.get("error"), Cancelled) and token.cancelled:
+        # the call noticed the deadline a moment before we did
+        raise DeadlineExceeded(f"{name} did not finish within {timeout:g} seconds")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
+
+
+def wait_for(future: "Future[T]", poll_interval: float = 0.2) -> T:
+    """
+    `future.result()` that raises `Cancelled` while waiting if the tool call this runs in is cancelled.
+    """
+    while True:
+        check_cancelled()
+        try:
+            return future.result(timeout=poll_interval)
+        except FutureTimeoutError:
+            continue
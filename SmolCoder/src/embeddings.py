@@ -0,0 +1,309 @@
+# Embedding-based Code Retrieval
+# Embeds every class, method and function of a repository through the local Ollama server and keeps the
+# vectors in a memory-mapped file per commit, so semantic queries do not depend on guessing the right names.
+
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import requests
+
+from SmolCoder.src.symbol_index import FileEntry, Symbol, SymbolIndex, get_symbol_index, head_commit
+
+# Above this many vectors the search only looks at the closest clusters instead of at every vector.
+IVF_THRESHOLD = 50_000
+MAX_SNIPPET_CHARS = 2000
+
+
+class OllamaEmbedder:
+    """
+    Computes embeddings with the `/api/embeddings` route of the same Ollama server the LLM wrapper talks to.
+    The route takes a single prompt, so a batch is sent as concurrent requests over one session.
+    """
+
+    def __init__(self, model: str = "nomic-embed-text", url: str = 'http://localhost:11434/api/embeddings',
+                 batch_size: int = 16, logger=None) -> None:
+        self.model = model
+        self.url = url
+        self.batch_size = batch_size
+        self.logger = logger
+        self._session = requests.Session()
+
+    def _embed_one(self, text: str) -> List[float]:
+        try:
+            response = self._session.post(self.url, data=json.dumps({"model": self.model, "prompt": text}),
+                                          headers={'Content-Type': 'application/json'})
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"Request failed: {e}")
+        return response.json()["embedding"]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        with ThreadPoolExecutor(max_workers=self.batch_size) as executor:
+            for start in range(0, len(texts), self.batch_size):
+                vectors.extend(executor.map(self._embed_one, texts[start:start + self.batch_size]))
+                if self.logger:
+                    self.logger.debug("Embedded %d/%d snippets", min(start + self.batch_size, len(texts)), len(texts))
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def symbol_snippet(symbol: Symbol, lines: List[str]) -> str:
+    body = "\n".join(lines[symbol.lineno - 1:symbol.end_lineno])
+    text = f"{symbol.kind} {symbol.qualname}: {symbol.signature}\n"
+    if symbol.docstring:
+        text += symbol.docstring + "\n"
+    return (text + body)[:MAX_SNIPPET_CHARS]
+
+
+class EmbeddingCache:
+    """
+    Embeddings of all symbols of a file, keyed by the git blob hash of the file and the embedding model.
+    The symbols of a blob are always the same, so the rows are stored in the order of `FileEntry.symbols`.
+    """
+
+    def __init__(self, cache_dir: Path, model: str) -> None:
+        self.directory = Path(cache_dir) / "embeddings" / re.sub(r"[^\w.-]", "_", model)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._memory: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, blob: str) -> Path:
+        return self.directory / blob[:2] / f"{blob[2:]}.npy"
+
+    def get(self, blob: str) -> Optional[np.ndarray]:
+        with self._lock:
+            if blob in self._memory:
+                return self._memory[blob]
+        try:
+            vectors = np.load(self._path(blob))
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._memory[blob] = vectors
+        return vectors
+
+    def put(self, blob: str, vectors: np.ndarray) -> None:
+        path = self._path(blob)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        np.save(tmp_file, vectors)
+        os.replace(tmp_file, path)
+        with self._lock:
+            self._memory[blob] = vectors
+
+
+def build_ivf(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 42) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Spherical k-means over the (normalized) vectors.
+    Returns the centroids, the row ids sorted by list and the offsets of each list in that order.
+    """
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), n_lists * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(n_lists):
+            members = sample[assignment == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), 65536):
+        assignment[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+
+    order = np.argsort(assignment, kind="stable").astype(np.int64)
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+    return centroids, order, offsets
+
+
+class SymbolHit(NamedTuple):
+    path: Path
+    symbol: Symbol
+    score: float
+
+
+class VectorStore:
+    """
+    The normalized embeddings of all symbols of one repository state, in a float32 memmap on disk.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with open(self.path.with_suffix(".json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.rows: List[Tuple[str, int]] = [tuple(row) for row in self.meta["rows"]]  # (file, index into the file's symbols)
+
+        count, dim = len(self.rows), self.meta["dim"]
+        self.vectors = np.memmap(self.path, dtype=np.float32, mode="r", shape=(count, dim)) if count else np.zeros((0, dim), dtype=np.float32)
+
+        self.ivf = None
+        ivf_path = self.path.with_suffix(".ivf.npz")
+        if ivf_path.exists():
+            with np.load(ivf_path) as ivf:
+                self.ivf = (ivf["centroids"], ivf["order"], ivf["offsets"])
+
+    @classmethod
+    def write(cls, path: Path, vectors: np.ndarray, rows: List[Tuple[str, int]], digest: str, model: str) -> "VectorStore":
+        path.parent.mkdir(parents=True, exist_ok=True)
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        if len(vectors):
+            memmap = np.memmap(tmp_file, dtype=np.float32, mode="w+", shape=vectors.shape)
+            memmap[:] = vectors
+            memmap.flush()
+            del memmap
+        else:
+            tmp_file.touch()
+        os.replace(tmp_file, path)
+
+        ivf_path = path.with_suffix(".ivf.npz")
+        if len(vectors) > IVF_THRESHOLD:
+            centroids, order, offsets = build_ivf(vectors, n_lists=int(np.sqrt(len(vectors))))
+            np.savez(ivf_path, centroids=centroids, order=order, offsets=offsets)
+        elif ivf_path.exists():
+            ivf_path.unlink()
+
+        with open(path.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump({"digest": digest, "model": model, "dim": int(vectors.shape[1]) if len(vectors) else 0, "rows": rows}, f)
+        return cls(path)
+
+    def search(self, query: np.ndarray, k: int, n_probe: int = 8) -> List[Tuple[int, float]]:
+        if not len(self.rows):
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+
+        if self.ivf is None:
+            candidates = None
+            scores = self.vectors @ query
+        else:
+            centroids, order, offsets = self.ivf
+            closest = np.argsort(-(centroids @ query))[:n_probe]
+            # sorted row ids keep the reads from the memmap sequential
+            candidates = np.sort(np.concatenate([order[offsets[i]:offsets[i + 1]] for i in closest]))
+            scores = self.vectors[candidates] @ query
+
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        rows = best if candidates is None else candidates[best]
+        return [(int(row), float(scores[i])) for row, i in zip(rows, best)]
+
+
+class SemanticIndex:
+    """
+    Keeps the vector store of a checkout in sync with its symbol index.
+    Only the files whose blobs are not in the embedding cache are sent to the embedding model.
+    """
+
+    def __init__(self, symbol_index: SymbolIndex, embedder=None, logger=None) -> None:
+        self.symbol_index = symbol_index
+        self.embedder = embedder if embedder is not None else OllamaEmbedder(logger=logger)
+        self.logger = logger
+        self.cache = EmbeddingCache(symbol_index.cache_dir, self.embedder.model)
+        self._store: Optional[VectorStore] = None
+        self._lock = threading.Lock()
+
+    def _store_path(self) -> Path:
+        root_key = hashlib.sha1(str(self.symbol_index.root).encode("utf-8")).hexdigest()[:16]
+        model_key = re.sub(r"[^\w.-]", "_", self.embedder.model)
+        return self.symbol_index.cache_dir / "vectors" / f"{root_key}-{head_commit(self.symbol_index.root)[:12]}-{model_key}.f32"
+
+    def _file_vectors(self, rel: str, entry: FileEntry) -> Optional[np.ndarray]:
+        if not entry.symbols or not entry.blob:
+            return None
+
+        vectors = self.cache.get(entry.blob)
+        if vectors is None:
+            try:
+                with open(self.symbol_index.root / rel, "r", encoding="utf-8", errors="replace") as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                return None
+            vectors = self.embedder.embed([symbol_snippet(symbol, lines) for symbol in entry.symbols])
+            self.cache.put(entry.blob, vectors)
+        return vectors
+
+    def ensure_current(self) -> VectorStore:
+        entries = self.symbol_index.entries()
+        digest = hashlib.sha1("\n".join(f"{rel}:{entry.blob}" for rel, entry in entries).encode("utf-8")).hexdigest()
+
+        with self._lock:
+            if self._store is not None and self._store.meta["digest"] == digest:
+                return self._store
+
+            path = self._store_path()
+            try:
+                store = VectorStore(path)
+                if store.meta["digest"] == digest:
+                    self._store = store
+                    return store
+            except (OSError, ValueError, KeyError):
+                pass
+
+            matrices, rows = [], []
+            for rel, entry in entries:
+                vectors = self._file_vectors(rel, entry)
+                if vectors is None:
+                    continue
+                matrices.append(vectors)
+                rows.extend((rel, i) for i in range(len(vectors)))
+
+            vectors = np.concatenate(matrices) if matrices else np.zeros((0, 0), dtype=np.float32)
+            self._store = VectorStore.write(path, vectors, rows, digest, self.embedder.model)
+            if self.logger:
+                self.logger.info("Built the vector store %s with %d symbols", path, len(rows))
+            return self._store
+
+    def search(self, query: str, k: int = 10) -> List[SymbolHit]:
+        store = self.ensure_current()
+        if not store.rows:
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        hits = []
+        for row, score in store.search(query_vector, k):
+            rel, i = store.rows[row]
+            entry = self.symbol_index.file_entry(self.symbol_index.root / rel)
+            if i < len(entry.symbols):
+                hits.append(SymbolHit(self.symbol_index.root / rel, entry.symbols[i], score))
+        return hits
+
+
+_SEMANTIC_INDEXES: Dict[Path, SemanticIndex] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_semantic_index(cwd: Path, embedder=None, logger=None) -> SemanticIndex:
+    symbol_index = get_symbol_index(cwd, logger)
+    with _REGISTRY_LOCK:
+        index = _SEMANTIC_INDEXES.get(symbol_index.root)
+        if index is None or index.symbol_index is not symbol_index or (embedder is not None and index.embedder is not embedder):
+            index = SemanticIndex(symbol_index, embedder=embedder, logger=logger)
+            _SEMANTIC_INDEXES[symbol_index.root] = index
+        return index
+
+
+def format_symbol_hits(hits: List[SymbolHit], cwd: Path) -> str:
+    lines = []
+    for hit in hits:
+        try:
+            path = hit.path.relative_to(Path(cwd).resolve())
+        except ValueError:
+            path = hit.path
+        lines.append(f"{path}:{hit.symbol.lineno}: {hit.symbol.kind} `{hit.symbol.qualname}` - {hit.symbol.signature}")
+    return "\n".join(lines)
@@ -0,0 +1,282 @@
+# File Tree
+# Listing of a folder and its subfolders as an indented tree, for `List_Files`.
+# Directory contents are cached and only read again when the mtime of the directory changes, which happens whenever
+# an entry is added, removed or renamed. Everything ignored by the `.gitignore` files of the repository is left out.
+
+import os
+import re
+import threading
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from SmolCoder.src.cancellation import check_cancelled
+from SmolCoder.src.symbol_index import SKIP_DIRS, find_index_root
+
+# never interesting to the agent, even if a repository does not ignore them
+ALWAYS_SKIPPED_DIRS = SKIP_DIRS | {"node_modules", ".venv", "venv", ".eggs"}
+ALWAYS_SKIPPED_SUFFIXES = (".pyc", ".pyo", ".egg-info")
+
+# The caches are dropped when they grow past this many directories.
+MAX_CACHED_DIRS = 20000
+
+INDENT = "  "
+
+
+class Entry(NamedTuple):
+    name: str
+    is_dir: bool
+
+
+class IgnoreRule(NamedTuple):
+    regex: "re.Pattern"
+    negated: bool
+    dir_only: bool
+
+
+def _translate(pattern: str) -> str:
+    """
+    Translates a glob of a `.gitignore` into a regular expression, `*` does not match `/` but `**` does.
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            parts.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            content = pattern[i + 1:end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            parts.append(f"[{content}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+
+def parse_gitignore(text: str) -> List[IgnoreRule]:
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+
+        # a slash anywhere but at the end binds the pattern to the folder of the `.gitignore`
+        anchored = "/" in line
+        regex = _translate(line.lstrip("/"))
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append(IgnoreRule(re.compile(regex + r"\Z"), negated, dir_only))
+    return rules
+
+
+class IgnoreRules:
+    """
+    The rules of all `.gitignore` files from the root of the repository down to one folder.
+    Paths are relative to the root and use `/`.
+    """
+
+    def __init__(self, rule_sets: Tuple[Tuple[str, Tuple[IgnoreRule, ...]], ...] = ()) -> None:
+        self._rule_sets = rule_sets     # (folder relative to the root, rules of its .gitignore)
+
+    def with_folder(self, rel_folder: str, rules: List[IgnoreRule]) -> "IgnoreRules":
+        if not rules:
+            return self
+        return IgnoreRules(self._rule_sets + ((rel_folder, tuple(rules)),))
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        # the last matching rule decides, the rules of deeper folders come later
+        for folder, rules in self._rule_sets:
+            if folder:
+                if not rel_path.startswith(folder + "/"):
+                    continue
+                path = rel_path[len(folder) + 1:]
+            else:
+                path = rel_path
+
+            for rule in rules:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(path):
+                    ignored = not rule.negated
+        return ignored
+
+
+_SNAPSHOTS: Dict[str, Tuple[int, List[Entry]]] = {}
+_GITIGNORES: Dict[str, Tuple[int, List[IgnoreRule]]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def scan_directory(directory: Path) -> List[Entry]:
+    """
+    The entries of `directory`, folders first and both sorted by name.
+    Raises OSError if the directory can not be read.
+    """
+    key = os.fspath(directory)
+    mtime = os.stat(key).st_mtime_ns
+    with _CACHE_LOCK:
+        cached = _SNAPSHOTS.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with os.scandir(key) as scanned:
+        entries = [Entry(entry.name, entry.is_dir()) for entry in scanned]
+    entries.sort(key=lambda entry: (not entry.is_dir, entry.name))
+
+    with _CACHE_LOCK:
+        if len(_SNAPSHOTS) >= MAX_CACHED_DIRS:
+            _SNAPSHOTS.clear()
+        _SNAPSHOTS[key] = (mtime, entries)
+    return entries
+
+
+def _gitignore_rules(directory: Path) -> List[IgnoreRule]:
+    # a `.gitignore` can be changed in place, which does not touch the mtime of its directory
+    key = os.fspath(directory / ".gitignore")
+    try:
+        mtime = os.stat(key).st_mtime_ns
+    except OSError:
+        return []
+
+    with _CACHE_LOCK:
+        cached = _GITIGNORES.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(key, encoding="utf-8", errors="replace") as f:
+            rules = parse_gitignore(f.read())
+    except OSError:
+        rules = []
+
+    with _CACHE_LOCK:
+        if len(_GITIGNORES) >= MAX_CACHED_DIRS:
+            _GITIGNORES.clear()
+        _GITIGNORES[key] = (mtime, rules)
+    return rules
+
+
+def clear_cache() -> None:
+    with _CACHE_LOCK:
+        _SNAPSHOTS.clear()
+        _GITIGNORES.clear()
+
+
+class FileTree:
+    """
+    Renders the tree below `folder` down to `depth` levels. With a glob `pattern`, only the files matching it
+    (by name, or by path below `folder` if the pattern contains a `/`) and the folders leading to them are shown.
+    """
+
+    def __init__(self, folder: Path, depth: int = 2, pattern: Optional[str] = None) -> None:
+        self.folder = Path(folder).resolve()
+        self.depth = max(depth, 1)
+        self.pattern = pattern
+        self.root = find_index_root(self.folder)
+
+    def _rules_down_to_folder(self) -> IgnoreRules:
+        rules = IgnoreRules()
+        rel_parts = self.folder.relative_to(self.root).parts
+        directory = self.root
+        for i in range(len(rel_parts) + 1):
+            rules = rules.with_folder("/".join(rel_parts[:i]), _gitignore_rules(directory))
+            if i < len(rel_parts):
+                directory = directory / rel_parts[i]
+        return rules
+
+    def _visible(self, directory: Path, rel: str, rules: IgnoreRules) -> Tuple[List[Entry], IgnoreRules]:
+        """
+        The entries of `directory` (at `rel` below the root) that are not ignored, and the rules for its subfolders.
+        """
+        check_cancelled()
+        try:
+            entries = scan_directory(directory)
+        except OSError:
+            return [], rules
+
+        if any(entry.name == ".gitignore" for entry in entries) and directory != self.folder:
+            rules = rules.with_folder(rel, _gitignore_rules(directory))
+
+        visible = []
+        for entry in entries:
+            if entry.is_dir and entry.name in ALWAYS_SKIPPED_DIRS:
+                continue
+            if entry.name.endswith(ALWAYS_SKIPPED_SUFFIXES):
+                continue
+            if rules.is_ignored(f"{rel}/{entry.name}" if rel else entry.name, entry.is_dir):
+                continue
+            visible.append(entry)
+        return visible, rules
+
+    def _matches(self, name: str, path_below_folder: str) -> bool:
+        if self.pattern is None:
+            return True
+        if "/" in self.pattern:
+            return fnmatchcase(path_below_folder, self.pattern)
+        return fnmatchcase(name, self.pattern)
+
+    def render(self) -> List[str]:
+        """One line per entry, folders end with a `/`, their content is indented below them."""
+        rel = self.folder.relative_to(self.root).as_posix()
+        rel = "" if rel == "." else rel
+        entries, rules = self._visible(self.folder, rel, self._rules_down_to_folder())
+        return self._render(self.folder, rel, "", entries, rules, 1)
+
+    def _render(self, directory: Path, rel: str, below: str, entries: List[Entry], rules: IgnoreRules, level: int) -> List[str]:
+        indent = INDENT * (level - 1)
+        lines = []
+        for entry in entries:
+            child_rel = f"{rel}/{entry.name}" if rel else entry.name
+            child_below = f"{below}/{entry.name}" if below else entry.name
+            if not entry.is_dir:
+                if self._matches(entry.name, child_below):
+                    lines.append(indent + entry.name)
+                continue
+
+            # chains of folders with a single subfolder are shown in one line, e.g. `src/package/`
+            name = entry.name
+            child = directory / entry.name
+            children, child_rules = self._visible(child, child_rel, rules)
+            while len(children) == 1 and children[0].is_dir:
+                name = f"{name}/{children[0].name}"
+                child = child / children[0].name
+                child_rel = f"{child_rel}/{children[0].name}"
+                child_below = f"{child_below}/{children[0].name}"
+                children, child_rules = self._visible(child, child_rel, child_rules)
+
+            if level < self.depth:
+                sublines = self._render(child, child_rel, child_below, children, child_rules, level + 1)
+                if sublines or self.pattern is None:
+                    lines.append(f"{indent}{name}/")
+                    lines.extend(sublines)
+            elif self.pattern is None:
+                count = f" ({len(children)} {'entry' if len(children) == 1 else 'entries'})" if children else " (empty)"
+                lines.append(f"{indent}{name}/{count}")
+        return lines
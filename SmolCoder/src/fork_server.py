@@ -0,0 +1,240 @@
+# Fork Server
+# Importing the checked-out project can take seconds, so instead of a fresh interpreter for every snippet a server
+# process imports the top-level packages of the checkout once and forks a copy-on-write child for every request.
+# The server is restarted lazily after a python file of the checkout changed, e.g. through Replace_Method.
+
+import contextlib
+import importlib
+import json
+import os
+import resource
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from SmolCoder.src.sandbox import Limits, SandboxError, SandboxResult, execute_request, receive_message, send_message
+from SmolCoder.src.symbol_index import SymbolIndex, get_symbol_index
+
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+_NOT_PRELOADED = {"test", "tests", "doc", "docs", "example", "examples", "benchmarks", "scripts"}
+
+
+def top_level_packages(root: Path) -> Tuple[List[str], List[str]]:
+    """
+    The import paths (`root` and a `src` layout) and the packages directly in them.
+    """
+    paths, packages = [], []
+    for directory in (root, root / "src"):
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        found = [entry.name for entry in entries
+                 if entry.is_dir() and entry.name.isidentifier() and entry.name not in _NOT_PRELOADED
+                 and os.path.exists(os.path.join(entry.path, "__init__.py"))]
+        if found or directory == root:
+            paths.append(str(directory))
+            packages.extend(found)
+    return paths, packages
+
+
+class ForkServer:
+    """
+    Runs code like the `WorkerPool`, but in children forked from a server that has the checkout already imported.
+    Every request is served by its own child, so calls run concurrently.
+    With a `symbol_index`, only changes of the content of a python file make the server outdated, not a mere touch.
+    """
+
+    def __init__(self, root: Path, limits: Limits = Limits(), packages: Optional[List[str]] = None,
+                 startup_timeout: float = 120.0, logger=None, symbol_index: Optional[SymbolIndex] = None) -> None:
+        self.root = Path(root).resolve()
+        self.limits = limits
+        self.sys_path, found = top_level_packages(self.root)
+        self.packages = found if packages is None else list(packages)
+        self.startup_timeout = startup_timeout
+        self.logger = logger
+        self.symbol_index = symbol_index
+        self.imported: List[str] = []
+        self._blobs: Optional[Dict[str, str]] = None     # python files of the index when the server started
+        self._process: Optional[subprocess.Popen] = None
+        self._socket_dir: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _socket_path(self) -> str:
+        return os.path.join(self._socket_dir, "server.sock")
+
+    def _start(self) -> None:
+        if self.symbol_index is not None:
+            self._blobs = {rel: entry.blob for rel, entry in self.symbol_index.entries() if rel.endswith(".py")}
+        self._socket_dir = tempfile.mkdtemp(prefix="smolcoder-fork-")
+        config = {"root": str(self.root), "sys_path": self.sys_path, "packages": self.packages,
+                  "memory_mb": self.limits.memory_mb, "socket": self._socket_path}
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(_REPO_ROOT), env.get("PYTHONPATH")]))
+        self._process = subprocess.Popen(
+            [sys.executable, "-u", "-m", "SmolCoder.src.fork_server", json.dumps(config)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, cwd=str(self.root),
+            start_new_session=True,
+        )
+        try:
+            ready = receive_message(self._process.stdout.fileno(), time.monotonic() + self.startup_timeout)
+        except (TimeoutError, EOFError, OSError, ValueError) as e:
+            self._stop()
+            raise SandboxError(f"The fork server for '{self.root}' did not start: {type(e).__name__}")
+        self.imported = ready["imported"]
+        if self.logger:
+            self.logger.info("Started fork server for %s with %s preloaded", self.root, ", ".join(self.imported) or "nothing")
+
+    def _stop(self) -> None:
+        if self._process is not None:
+            with contextlib.suppress(OSError):
+                os.killpg(self._process.pid, signal.SIGKILL)
+            self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+        if self._socket_dir is not None:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+            self._socket_dir = None
+        self._blobs = None
+
+    def _changed(self, path: Path) -> bool:
+        if not str(path).endswith(".py"):
+            return False
+        if self.symbol_index is None or self._blobs is None:
+            return True
+        try:
+            rel = Path(path).relative_to(self.symbol_index.root).as_posix()
+            blob = self.symbol_index.file_entry(path).blob
+        except (ValueError, OSError):
+            # outside of the index or removed
+            return True
+        return self._blobs.get(rel) != blob
+
+    def invalidate(self, paths: Optional[List[Path]] = None) -> None:
+        """
+        Stops the server if one of the changed `paths` is a python file whose content differs from the one the server
+        started with, the next call starts a fresh one. Children that are still running finish undisturbed.
+        """
+        if paths is not None and not any(self._changed(path) for path in paths):
+            return
+        with self._lock:
+            if self._process is not None and self.logger:
+                self.logger.debug("Fork server for %s is outdated", self.root)
+            self._stop()
+
+    def run(self, code: str, cwd: Path, limits: Optional[Limits] = None) -> SandboxResult:
+        limits = limits or self.limits
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._stop()
+                self._start()
+            socket_path = self._socket_path
+
+        deadline = time.monotonic() + limits.wall_seconds
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            try:
+                connection.connect(socket_path)
+                stream = connection.makefile("wb")
+                pid = receive_message(connection.fileno(), deadline)["pid"]
+            except (TimeoutError, EOFError, OSError) as e:
+                self.invalidate()
+                return SandboxResult("", None, f"The fork server did not respond: {type(e).__name__}")
+
+            try:
+                send_message(stream, {"code": code, "cwd": str(cwd), "cpu_seconds": limits.cpu_seconds})
+                reply = receive_message(connection.fileno(), deadline)
+            except TimeoutError:
+                error = f"The code did not finish within {limits.wall_seconds:g} seconds."
+            except (EOFError, OSError, ValueError):
+                error = "The process running the code crashed."
+            else:
+                return SandboxResult(reply["output"], reply["result"], reply["error"])
+
+            with contextlib.suppress(OSError):
+                os.killpg(pid, signal.SIGKILL)
+            return SandboxResult("", None, error)
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+
+_SERVERS: Dict[Path, Tuple[SymbolIndex, ForkServer]] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_fork_server(cwd: Path, limits: Limits = Limits(), logger=None) -> ForkServer:
+    """
+    Returns the fork server of the checkout containing `cwd`, it is invalidated by the changes its symbol index sees.
+    """
+    symbol_index = get_symbol_index(cwd, logger)
+    with _REGISTRY_LOCK:
+        if symbol_index.root in _SERVERS:
+            known_index, server = _SERVERS[symbol_index.root]
+            if known_index is symbol_index and server.limits == limits:
+                return server
+            known_index.remove_listener(server.invalidate)
+            server.close()
+
+        server = ForkServer(symbol_index.root, limits, logger=logger, symbol_index=symbol_index)
+        symbol_index.add_listener(server.invalidate)
+        _SERVERS[symbol_index.root] = (symbol_index, server)
+        return server
+
+
+def _serve(config: dict) -> None:
+    """
+    The loop of the server process.
+    """
+    replies = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    memory = config["memory_mb"] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    sys.path[:0] = config["sys_path"]
+    os.chdir(config["root"])
+
+    imported = []
+    for package in config["packages"]:
+        try:
+            importlib.import_module(package)
+        except Exception:
+            continue
+        imported.append(package)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(config["socket"])
+    listener.listen(64)
+    # the children are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    send_message(replies, {"imported": imported})
+
+    while True:
+        connection, _ = listener.accept()
+        if os.fork() == 0:
+            try:
+                listener.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                # the client kills the whole group on a timeout
+                os.setpgid(0, 0)
+                stream = connection.makefile("wb")
+                send_message(stream, {"pid": os.getpid()})
+                request = receive_message(connection.fileno())
+                send_message(stream, execute_request(request, config["memory_mb"]))
+            finally:
+                os._exit(0)
+        connection.close()
+
+
+if __name__ == "__main__":
+    _serve(json.loads(sys.argv[1]))
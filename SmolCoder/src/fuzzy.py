@@ -0,0 +1,156 @@
+# Fuzzy Matching
+# Edit distance and a BK-tree over it, used to correct small typos in tool, class and method names
+# instead of answering them with an error and losing a whole LLM call.
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# A correction is only made if at most this share of the characters has to be edited.
+DEFAULT_THRESHOLD = 0.75
+# Prefixes shorter than this are too ambiguous to be completed.
+MIN_PREFIX_LENGTH = 4
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+
+
+def normalize(name: str) -> str:
+    """`List_Files`, `list files` and `ListFiles` are all the same name."""
+    return _SEPARATORS.sub("", name).lower()
+
+
+def levenshtein(a: str, b: str) -> int:
+    """
+    Edit distance with Myers' bit-parallel algorithm, every column of the dynamic programming matrix is one integer.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(b)
+    if m == 0:
+        return len(a)
+
+    peq: Dict[str, int] = {}
+    for i, char in enumerate(b):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for char in a:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv & full
+    return score
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree, a search only compares the query with the nodes that the triangle inequality
+    can not rule out, which is a small part of the words for small distances.
+    """
+
+    def __init__(self, words: Iterable[str] = ()) -> None:
+        self._root: Optional[Tuple[str, Dict[int, tuple]]] = None
+        self._size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        if self._root is None:
+            self._root = (word, {})
+            self._size = 1
+            return
+
+        node = self._root
+        while True:
+            distance = levenshtein(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                self._size += 1
+                return
+            node = child
+
+    def search(self, query: str, max_distance: int) -> List[Tuple[int, str]]:
+        """Returns (distance, word) of all words within `max_distance`, the closest first."""
+        if self._root is None:
+            return []
+
+        results = []
+        stack = [self._root]
+        while stack:
+            word, children = stack.pop()
+            distance = levenshtein(query, word)
+            if distance <= max_distance:
+                results.append((distance, word))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(results)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class FuzzyMatch(NamedTuple):
+    name: str
+    distance: int
+    confidence: float
+
+
+class FuzzyIndex:
+    """
+    Resolves misspelled names to the known ones. Names are compared in their normalized form,
+    a query is only resolved if the best candidate is unambiguous and similar enough.
+    """
+
+    def __init__(self, names: Iterable[str], threshold: float = DEFAULT_THRESHOLD) -> None:
+        self.threshold = threshold
+        self._names: Dict[str, List[str]] = {}
+        for name in names:
+            self._names.setdefault(normalize(name), []).append(name)
+        self._tree = BKTree(self._names)
+
+    def match(self, query: str) -> Optional[FuzzyMatch]:
+        key = normalize(query)
+        if not key:
+            return None
+        if key in self._names:
+            return self._unique(self._names[key], 0, 1.0)
+
+        # a truncated name, e.g. `Show_Method` for `Show_Method_Body`
+        if len(key) >= MIN_PREFIX_LENGTH:
+            completions = [name for name in self._names if name.startswith(key)]
+            if len(completions) == 1:
+                return self._unique(self._names[completions[0]], len(completions[0]) - len(key), len(key) / len(completions[0]))
+
+        max_distance = max(1, int(len(key) * (1 - self.threshold)))
+        candidates = self._tree.search(key, max_distance)
+        if not candidates:
+            return None
+        best_distance, best = candidates[0]
+        if len(candidates) > 1 and candidates[1][0] == best_distance:
+            return None
+
+        confidence = 1 - best_distance / max(len(key), len(best))
+        if confidence < self.threshold:
+            return None
+        return self._unique(self._names[best], best_distance, confidence)
+
+    @staticmethod
+    def _unique(names: List[str], distance: int, confidence: float) -> Optional[FuzzyMatch]:
+        # `foo_bar` and `FooBar` normalize to the same key, there is no way to tell which one was meant
+        if len(set(names)) != 1:
+            return None
+        return FuzzyMatch(names[0], distance, confidence)
@@ -0,0 +1,232 @@
+# Human Channels
+# The ways `Human_Interaction` can reach a human. A channel waits at most `timeout` seconds for an answer and returns
+# None if nobody answered, the tool then gives the agent a fallback observation instead of hanging the run.
+# The waits check for cancellation regularly, so a cancelled tool call returns right away as well.
+
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from SmolCoder.src.cancellation import check_cancelled
+from SmolCoder.src.output_capture import uncaptured
+
+# how often the waits check for cancellation and for new answers in the mailbox
+POLL_INTERVAL = 0.2
+
+
+class Question(NamedTuple):
+    id: str
+    text: str
+    asked_at: float     # `time.time()`
+
+
+class HumanChannel(ABC):
+    @abstractmethod
+    def ask(self, question: str, timeout: float) -> Optional[str]:
+        """
+        Asks the human and returns the answer, or None if there was none within `timeout` seconds.
+        """
+        pass
+
+
+def _wait(poll, timeout: float):
+    """
+    Calls `poll(seconds)` until it returns something else than None or the timeout is over.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        check_cancelled()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        result = poll(min(POLL_INTERVAL, remaining))
+        if result is not None:
+            return result
+
+
+class ConsoleChannel(HumanChannel):
+    """
+    Asks on stdout and reads the answer from stdin. A single reader thread owns stdin, so a question that timed out
+    does not leave a blocked `input()` behind, and questions of concurrent agents are asked one after the other.
+    """
+
+    _lock = threading.Lock()
+    # input stream -> (time read, line), ids of streams get reused, so they would mix up the lines of different ones
+    _readers: "weakref.WeakKeyDictionary[object, queue.Queue[Tuple[float, Optional[str]]]]" = weakref.WeakKeyDictionary()
+
+    def __init__(self, stdin=None, stdout=None) -> None:
+        self.stdin = stdin
+        self.stdout = stdout
+
+    @classmethod
+    def _lines(cls, stdin) -> "queue.Queue[Tuple[float, Optional[str]]]":
+        # only called while holding the lock
+        lines = cls._readers.get(stdin)
+        if lines is not None:
+            return lines
+
+        lines = queue.Queue()
+
+        def read():
+            for line in stdin:
+                lines.put((time.monotonic(), line.rstrip("\n")))
+            lines.put((time.monotonic(), None))     # end of input
+
+        cls._readers[stdin] = lines
+        threading.Thread(target=read, name="smolcoder-human-console", daemon=True).start()
+        return lines
+
+    def ask(self, question: str, timeout: float) -> Optional[str]:
+        deadline = time.monotonic() + timeout
+        if not _wait(lambda seconds: True if self._lock.acquire(timeout=seconds) else None, timeout):
+            return None
+
+        try:
+            asked_at = time.monotonic()
+            lines = self._lines(self.stdin or sys.stdin)
+            # the tool runs with its output captured into the observation, the human would never see the question
+            stdout = self.stdout or uncaptured(sys.stdout)
+            stdout.write(f"{question}\n> ")
+            stdout.flush()
+
+            def poll(seconds):
+                try:
+                    read_at, line = lines.get(timeout=seconds)
+                except queue.Empty:
+                    return None
+                if line is None:
+                    # a closed stdin ends the wait, there will be no answer
+                    lines.put((read_at, None))
+                    return ""
+                # answers that came in after an earlier question timed out belong to that question
+                return line if read_at >= asked_at else None
+
+            answer = _wait(poll, deadline - time.monotonic())
+            return answer or None
+        finally:
+            self._lock.release()
+
+
+class QueueChannel(HumanChannel):
+    """
+    In-process channel, e.g. for a UI thread that answers the questions of several agents.
+    `pending` lists the open questions, `answer` answers one of them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._questions: Dict[str, Question] = {}
+        self._answers: Dict[str, Future] = {}
+        self._ids = itertools.count(1)
+        self.questions: "queue.Queue[Question]" = queue.Queue()    # every new question, for consumers that block
+
+    def pending(self) -> List[Question]:
+        with self._lock:
+            return list(self._questions.values())
+
+    def answer(self, question_id: str, answer: str) -> bool:
+        """Returns False if the question is not open anymore, e.g. because it timed out."""
+        with self._lock:
+            self._questions.pop(question_id, None)
+            future = self._answers.pop(question_id, None)
+        if future is None:
+            return False
+        future.set_result(answer)
+        return True
+
+    def ask(self, question: str, timeout: float) -> Optional[str]:
+        future = Future()
+        with self._lock:
+            asked = Question(str(next(self._ids)), question, time.time())
+            self._questions[asked.id] = asked
+            self._answers[asked.id] = future
+        self.questions.put(asked)
+
+        def poll(seconds):
+            try:
+                return future.result(timeout=seconds)
+            except FutureTimeoutError:
+                return None
+
+        try:
+            return _wait(poll, timeout)
+        finally:
+            with self._lock:
+                self._questions.pop(asked.id, None)
+                self._answers.pop(asked.id, None)
+
+
+class MailboxChannel(HumanChannel):
+    """
+    File-backed channel that works across processes. Every question is written to `<directory>/<id>.question` as json,
+    a human answers it by writing the plain text answer to `<directory>/<id>.answer`.
+    Files are written to a temporary name first and then renamed, so a reader never sees half of one.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, path: Path, text: str) -> None:
+        tmp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_file.write_text(text, encoding="utf-8")
+        os.replace(tmp_file, path)
+
+    def pending(self) -> List[Question]:
+        questions = []
+        for path in sorted(self.directory.glob("*.question")):
+            try:
+                questions.append(Question(**json.loads(path.read_text(encoding="utf-8"))))
+            except (OSError, ValueError, TypeError):
+                continue
+        return questions
+
+    def answer(self, question_id: str, answer: str) -> bool:
+        if not (self.directory / f"{question_id}.question").exists():
+            return False
+        self._write(self.directory / f"{question_id}.answer", answer)
+        return True
+
+    def ask(self, question: str, timeout: float) -> Optional[str]:
+        asked = Question(uuid.uuid4().hex, question, time.time())
+        question_file = self.directory / f"{asked.id}.question"
+        answer_file = self.directory / f"{asked.id}.answer"
+        self._write(question_file, json.dumps(asked._asdict()))
+
+        def poll(seconds):
+            try:
+                return answer_file.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                time.sleep(seconds)
+                return None
+
+        try:
+            return _wait(poll, timeout)
+        finally:
+            for path in (question_file, answer_file):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+def default_channel() -> Optional[HumanChannel]:
+    """
+    The mailbox in `SMOLCODER_HUMAN_MAILBOX` if it is set, the console if stdin is a terminal, None otherwise.
+    """
+    mailbox = os.environ.get("SMOLCODER_HUMAN_MAILBOX")
+    if mailbox:
+        return MailboxChannel(Path(mailbox))
+    if sys.stdin is not None and sys.stdin.isatty():
+        return ConsoleChannel()
+    return None
@@ -0,0 +1,145 @@
+# Impact Analysis
+# Maps every module of a repository to the test files that (transitively) import it,
+# so that an edit can be validated by running only the tests that could notice it.
+
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from SmolCoder.src.import_graph import import_graph
+from SmolCoder.src.symbol_index import SymbolIndex, get_symbol_index
+
+_SUMMARY_COUNT = re.compile(r"(\d+) (passed|failed|errors?|skipped|xfailed|xpassed)")
+
+
+def is_test_file(rel: str) -> bool:
+    """
+    The files pytest collects by default.
+    """
+    name = os.path.basename(rel)
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def modified_files(root: Path) -> List[str]:
+    """
+    The python files that differ from HEAD or are untracked, relative to `root`. Empty if `root` is not a git checkout.
+    """
+    files = []
+    for command in (["git", "diff", "--name-only", "HEAD", "--relative"], ["git", "ls-files", "--others", "--exclude-standard"]):
+        try:
+            result = subprocess.run(command, cwd=root, capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            return []
+        if result.returncode != 0:
+            return []
+        files.extend(line.strip() for line in result.stdout.splitlines() if line.strip().endswith(".py"))
+    return sorted({os.path.normpath(rel) for rel in files})
+
+
+class ImpactIndex:
+    """
+    The reverse import graph of a symbol index, rebuilt whenever one of its files changes.
+    """
+
+    def __init__(self, symbol_index: SymbolIndex) -> None:
+        self.symbol_index = symbol_index
+        self._importers: Optional[Dict[str, Set[str]]] = None
+        self._lock = threading.Lock()
+        symbol_index.add_listener(self._invalidate)
+
+    def _invalidate(self, paths: List[Path]) -> None:
+        self._importers = None
+
+    def affected_tests(self, changed: List[str]) -> List[str]:
+        """
+        Returns the test files that import one of the `changed` files, directly or through other modules.
+        Changed test files are affected by definition, a changed `conftest.py` affects every test below it.
+        """
+        with self._lock:
+            if self._importers is None:
+                self._importers = import_graph(self.symbol_index.entries(), packages=True)
+            importers = self._importers
+
+        seen = set(changed)
+        stack = list(changed)
+        while stack:
+            for importer in importers.get(stack.pop(), ()):
+                if importer not in seen:
+                    seen.add(importer)
+                    stack.append(importer)
+
+        tests = {rel for rel in seen if is_test_file(rel) and rel in importers}
+        for rel in changed:
+            if os.path.basename(rel) == "conftest.py":
+                directory = os.path.dirname(rel)
+                prefix = directory + os.sep if directory else ""
+                tests.update(test for test in importers if is_test_file(test) and test.startswith(prefix))
+        return sorted(tests)
+
+
+_INDEXES: Dict[Path, ImpactIndex] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_impact_index(cwd: Path, logger=None) -> ImpactIndex:
+    symbol_index = get_symbol_index(cwd, logger)
+    with _REGISTRY_LOCK:
+        index = _INDEXES.get(symbol_index.root)
+        if index is None or index.symbol_index is not symbol_index:
+            index = ImpactIndex(symbol_index)
+            _INDEXES[symbol_index.root] = index
+        return index
+
+
+class RunReport(NamedTuple):
+    counts: Dict[str, int]      # e.g. {"passed": 10, "failed": 1}
+    failures: List[str]         # the `FAILED ...` and `ERROR ...` lines of pytest
+    seconds: float
+    timed_out: List[str]        # test files of the shards that did not finish in time
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures and not self.timed_out and not self.counts.get("failed") and not self.counts.get("error")
+
+
+def run_tests(root: Path, test_files: List[str], python: str = sys.executable, timeout: float = 120.0,
+              workers: Optional[int] = None) -> RunReport:
+    """
+    Runs the test files with pytest, split into `workers` shards that run in parallel subprocesses.
+    Every shard is killed after `timeout` seconds.
+    """
+    start = time.perf_counter()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(test_files)))
+    shards = [test_files[i::workers] for i in range(workers)]
+
+    def run_shard(shard: List[str]):
+        command = [python, "-m", "pytest", "-q", "--tb=line", "-rfE", "-p", "no:cacheprovider", *shard]
+        try:
+            result = subprocess.run(command, cwd=root, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return shard, None
+        return shard, result.stdout + result.stderr
+
+    counts: Dict[str, int] = {}
+    failures: List[str] = []
+    timed_out: List[str] = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for shard, output in executor.map(run_shard, shards):
+            if output is None:
+                timed_out.extend(shard)
+                continue
+
+            lines = output.splitlines()
+            failures.extend(line for line in lines if line.startswith(("FAILED ", "ERROR ")))
+            summary = next((line for line in reversed(lines) if _SUMMARY_COUNT.search(line)), "")
+            for count, outcome in _SUMMARY_COUNT.findall(summary):
+                outcome = "error" if outcome.startswith("error") else outcome
+                counts[outcome] = counts.get(outcome, 0) + int(count)
+
+    return RunReport(counts, failures, time.perf_counter() - start, timed_out)
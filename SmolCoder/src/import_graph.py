@@ -0,0 +1,76 @@
+# Import Graph
+# Resolves the imports recorded in the symbol index to the files of the repository.
+
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from SmolCoder.src.symbol_index import FileEntry
+
+
+def module_name(rel: str) -> str:
+    parts = rel[:-len(".py")].split(os.sep)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def _package(rel: str) -> List[str]:
+    parts = rel[:-len(".py")].split(os.sep)
+    return parts[:-1]
+
+
+class ModuleResolver:
+    """
+    Maps imported module names to the files of the repository.
+    Besides the full dotted path every unambiguous suffix is known, which covers `src/` layouts and scripts that
+    put a subdirectory on `sys.path`.
+    """
+
+    def __init__(self, rels: List[str]) -> None:
+        self._modules: Dict[str, str] = {}
+        suffixes: Dict[str, List[str]] = {}
+        for rel in rels:
+            name = module_name(rel)
+            if not name:
+                continue
+            self._modules[name] = rel
+            parts = name.split(".")
+            for i in range(1, len(parts)):
+                suffixes.setdefault(".".join(parts[i:]), []).append(rel)
+
+        for suffix, candidates in suffixes.items():
+            if suffix not in self._modules and len(candidates) == 1:
+                self._modules[suffix] = candidates[0]
+
+    def resolve(self, imported: str, importer: str) -> Optional[str]:
+        if imported.startswith("."):
+            level = len(imported) - len(imported.lstrip("."))
+            package = _package(importer)
+            if level > 1:
+                package = package[:-(level - 1)] if level - 1 <= len(package) else None
+            if package is None:
+                return None
+            imported = ".".join(package + [part for part in imported[level:].split(".") if part])
+        return self._modules.get(imported)
+
+
+def import_graph(entries: List[Tuple[str, FileEntry]], packages: bool = False) -> Dict[str, Set[str]]:
+    """
+    Returns file -> the files that import it directly.
+    With `packages` the `__init__.py` of every enclosing package counts as imported as well, as it is at runtime.
+    """
+    resolver = ModuleResolver([rel for rel, _ in entries])
+    importers: Dict[str, Set[str]] = {rel: set() for rel, _ in entries}
+    for rel, entry in entries:
+        for imported in entry.imports:
+            target = resolver.resolve(imported, rel)
+            if target is None:
+                continue
+            targets = [target]
+            if packages:
+                parts = module_name(target).split(".")
+                targets.extend(resolver.resolve(".".join(parts[:i]), rel) for i in range(1, len(parts)))
+            for target in targets:
+                if target is not None and target != rel:
+                    importers[target].add(rel)
+    return importers
@@ -0,0 +1,176 @@
+# Lint Gate
+# Checks a method replacement before it is written: the file has to compile, the new method has to end up inside of
+# the target class and it must not use names that are defined nowhere. The results are memoized by content hash.
+
+import ast
+import builtins
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Set, Tuple
+
+from SmolCoder.src.source_edit import find_method
+
+MAX_CACHED_RESULTS = 256
+
+# Names every module has without binding them.
+_MODULE_NAMES = {"__name__", "__file__", "__doc__", "__package__", "__spec__", "__loader__", "__builtins__",
+                 "__path__", "__annotations__", "__class__", "__debug__"}
+_BUILTINS = set(dir(builtins))
+
+
+class LintIssue(NamedTuple):
+    severity: str       # "error" rejects the edit, "warning" is only reported
+    lineno: int         # line within the new method, starting at 1
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.severity.capitalize()} in line {self.lineno} of the new method: {self.message}"
+
+
+def _bindings(node: ast.AST, descend_into_scopes: bool) -> Set[str]:
+    """
+    Names bound by `node`. Without `descend_into_scopes` the bodies of nested functions, lambdas and classes are
+    skipped, only their own names count.
+    """
+    names = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, ast.Name) and isinstance(current.ctx, (ast.Store, ast.Del)):
+            names.add(current.id)
+        elif isinstance(current, ast.arg):
+            names.add(current.arg)
+        elif isinstance(current, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(current.name)
+            if current is not node and not descend_into_scopes:
+                # decorators, defaults and bases are evaluated in the enclosing scope
+                stack.extend(current.decorator_list)
+                if not isinstance(current, ast.ClassDef):
+                    stack.extend(current.args.defaults + [d for d in current.args.kw_defaults if d is not None])
+                continue
+        elif isinstance(current, ast.Lambda) and current is not node and not descend_into_scopes:
+            continue
+        elif isinstance(current, (ast.Import, ast.ImportFrom)):
+            for alias in current.names:
+                if alias.name != "*":
+                    names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(current, ast.ExceptHandler) and current.name:
+            names.add(current.name)
+        elif isinstance(current, (ast.Global, ast.Nonlocal)):
+            names.update(current.names)
+        elif isinstance(current, (ast.MatchAs, ast.MatchStar)) and current.name:
+            names.add(current.name)
+        elif isinstance(current, ast.MatchMapping) and current.rest:
+            names.add(current.rest)
+        stack.extend(ast.iter_child_nodes(current))
+    return names
+
+
+def _has_star_import(tree: ast.Module) -> bool:
+    return any(isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names) for node in ast.walk(tree))
+
+
+def _enclosing_functions(tree: ast.Module, target: ast.AST) -> List[ast.AST]:
+    """The functions the target is (indirectly) defined in, e.g. for a class inside of a function."""
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+
+    functions = []
+    node = parents.get(target)
+    while node is not None:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            functions.append(node)
+        node = parents.get(node)
+    return functions
+
+
+def _lint_method(tree: ast.Module, method: ast.AST, module_names: Set[str]) -> List[LintIssue]:
+    issues = []
+    first_line = min([method.lineno] + [decorator.lineno for decorator in method.decorator_list])
+
+    known = module_names | _bindings(method, descend_into_scopes=True)
+    for function in _enclosing_functions(tree, method):
+        known |= _bindings(function, descend_into_scopes=True)
+
+    loaded = {}
+    for node in ast.walk(method):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            loaded.setdefault(node.id, node.lineno)
+
+    if not _has_star_import(tree):
+        for name, lineno in sorted(loaded.items(), key=lambda item: item[1]):
+            if name not in known and name not in _BUILTINS and name not in _MODULE_NAMES:
+                issues.append(LintIssue("error", lineno - first_line + 1, f"undefined name `{name}`"))
+
+    for node in ast.walk(method):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound = alias.asname or alias.name.split(".")[0]
+                if alias.name != "*" and bound not in loaded:
+                    issues.append(LintIssue("warning", node.lineno - first_line + 1, f"`{bound}` is imported but unused"))
+    return issues
+
+
+def lint_replacement(source: bytes, class_name: str, method_names: Tuple[str, ...], filename: str = "<unknown>") -> List[LintIssue]:
+    """
+    Lints the file `source` after the methods `method_names` of `class_name` were replaced.
+    """
+    key = hashlib.sha1(b"\0".join([source, class_name.encode("utf-8"), *(name.encode("utf-8") for name in method_names)])).hexdigest()
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return list(_CACHE[key])
+
+    issues = _lint(source, class_name, method_names, filename)
+
+    with _CACHE_LOCK:
+        _CACHE[key] = tuple(issues)
+        if len(_CACHE) > MAX_CACHED_RESULTS:
+            _CACHE.popitem(last=False)
+    return issues
+
+
+def _method_line(source: bytes, method_names: Tuple[str, ...], lineno: int) -> int:
+    """
+    The line within the new method for the line `lineno` of a file that does not parse, so there is no tree.
+    The method is the last definition of one of `method_names` at or before the line.
+    """
+    definition = re.compile(rb"\s*(?:async\s+)?def\s+(?:" + b"|".join(re.escape(name.encode("utf-8")) for name in method_names) + rb")\b")
+    starts = [i for i, line in enumerate(source.splitlines(), start=1) if definition.match(line)]
+    start = max((i for i in starts if i <= lineno), default=None)
+    return 1 if start is None else lineno - start + 1
+
+
+def _lint(source: bytes, class_name: str, method_names: Tuple[str, ...], filename: str) -> List[LintIssue]:
+    try:
+        tree = ast.parse(source, filename=filename)
+    except SyntaxError as e:
+        return [LintIssue("error", _method_line(source, method_names, e.lineno or 1), e.msg)]
+
+    methods = []
+    for method_name in method_names:
+        method = find_method(tree, class_name, method_name)
+        if method is None:
+            return [LintIssue("error", 1, f"`{method_name}` is not a method of `{class_name}` after the replacement, check the indentation")]
+        methods.append(method)
+
+    try:
+        # finds what the parser lets through, e.g. `return` outside of a function or duplicate arguments
+        compile(tree, filename, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        method = next((m for m in methods if e.lineno is not None and m.lineno <= e.lineno <= m.end_lineno), methods[0])
+        return [LintIssue("error", (e.lineno or method.lineno) - method.lineno + 1, e.msg)]
+
+    module_names = _bindings(tree, descend_into_scopes=False)
+    issues = []
+    for method in methods:
+        issues.extend(_lint_method(tree, method, module_names))
+    return issues
+
+
+_CACHE: "OrderedDict[str, Tuple[LintIssue, ...]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
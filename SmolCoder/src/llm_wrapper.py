@@ -1,6 +1,7 @@
 import requests
 import json
 import openai
+from typing import Callable, Optional
 
 class LLM:
     def __init__(self, model: str, logger, openai, url='http://localhost:11434/api/generate', raw : bool = True):
@@ -10,7 +11,11 @@ class LLM:
         self.raw = raw # if enabled will not return markdown, this hsouldb e set to true when using llam3 and to false if using phi3
         self.openai = openai
         
-    def query_completion(self, prompt, stop_token=None, seed=42):
+    def query_completion(self, prompt, stop_token=None, seed=42, on_text: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            on_text: called with the response generated so far after every streamed chunk, e.g. to start work early
+        """
         openai_enabled = self.openai[0]
         openai_key = self.openai[1]
 
@@ -49,9 +54,13 @@ class LLM:
                             stop_index = response_text.find(stop_token)
                             response_text = response_text[:stop_index + len(stop_token)]
                             break
+
+                        if on_text is not None:
+                            on_text(response_text)
             except json.JSONDecodeError as e:
-                print(f"JSON decoding failed: {e}")
-                print(f"Response content: {response.content}")
+                if self.logger:
+                    self.logger.error(f"JSON decoding failed: {e}")
+                    self.logger.error(f"Response content: {response.content}")
                 raise ValueError
             
             if self.logger:
@@ -84,6 +93,9 @@ class LLM:
                             response_text = response_text.split(stop_token)[0] + stop_token
                             break
 
+                        if on_text is not None:
+                            on_text(response_text)
+
                 # Count tokens in response
                 token_count = len(response_text.split())
 
@@ -0,0 +1,187 @@
+# Localization
+# Ranks the files of a repository against the text of an issue with BM25, before the agent takes its first step.
+# The candidates are given to the model in the first prompt, so it does not have to spend its calls on navigating.
+
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from SmolCoder.src.symbol_index import SymbolIndex, get_symbol_index
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_CASE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for", "from", "has", "have", "if",
+    "in", "into", "is", "it", "its", "not", "of", "on", "or", "so", "that", "the", "then", "there", "this", "to",
+    "was", "we", "when", "which", "will", "with", "would", "you", "self", "none", "true", "false", "def", "class",
+    "return", "import", "py", "init",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase terms, identifiers are kept whole and additionally split at `_` and camel case.
+    """
+    terms = []
+    for identifier in _IDENTIFIER.findall(text):
+        terms.extend(_split_identifier(identifier))
+    return terms
+
+
+@lru_cache(maxsize=1 << 16)
+def _split_identifier(identifier: str) -> Tuple[str, ...]:
+    lowered = identifier.lower()
+    parts = [part.lower() for piece in identifier.split("_") for part in _CAMEL_CASE.findall(piece)]
+    terms = [lowered] if len(parts) > 1 and lowered not in STOPWORDS else []
+    terms.extend(part for part in parts if len(part) > 1 and part not in STOPWORDS)
+    return tuple(terms)
+
+
+class Candidate(NamedTuple):
+    path: Path
+    score: float
+    symbols: List[str]      # the best matching classes and functions of the file
+
+
+class BM25Index:
+    """
+    Okapi BM25 over one document per file, made of its path, symbol names and docstrings.
+    The postings are stored term-major in flat arrays with the BM25 weight of every (term, document) pair
+    precomputed, scoring a query is a single `np.bincount` over the postings of its terms.
+    """
+
+    def __init__(self, documents: Dict[str, List[str]], k1: float = 1.2, b: float = 0.75) -> None:
+        self.paths = list(documents)
+        self.vocabulary: Dict[str, int] = {}
+
+        # collect (document, term, frequency) triples and sort them by term to get the postings of each term
+        rows_doc: List[int] = []
+        rows_term: List[int] = []
+        rows_freq: List[int] = []
+        lengths = np.zeros(len(self.paths), dtype=np.float32)
+        for doc_id, path in enumerate(self.paths):
+            counts = Counter(documents[path])
+            lengths[doc_id] = len(documents[path])
+            rows_doc.extend([doc_id] * len(counts))
+            rows_term.extend(self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts)
+            rows_freq.extend(counts.values())
+
+        term_ids = np.array(rows_term, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.array(rows_doc, dtype=np.int32)[order]
+        freqs = np.array(rows_freq, dtype=np.float32)[order]
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)))
+
+        n_docs = max(len(self.paths), 1)
+        doc_freq = np.diff(self.offsets).astype(np.float32)
+        idf = np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        avg_length = float(lengths.mean()) if len(self.paths) else 1.0
+        norm = k1 * (1.0 - b + b * lengths[self.doc_ids] / max(avg_length, 1.0))
+        self.weights = np.repeat(idf, np.diff(self.offsets)) * freqs * (k1 + 1.0) / (freqs + norm)
+
+    def score(self, query_terms: List[str]) -> np.ndarray:
+        counts = Counter(term for term in query_terms if term in self.vocabulary)
+        if not counts:
+            return np.zeros(len(self.paths), dtype=np.float32)
+
+        term_ids = np.fromiter((self.vocabulary[term] for term in counts), dtype=np.int64, count=len(counts))
+        starts, ends = self.offsets[term_ids], self.offsets[term_ids + 1]
+        # gather the postings of all query terms at once
+        lengths = ends - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        query_weights = np.repeat(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)), lengths)
+        return np.bincount(self.doc_ids[positions], weights=self.weights[positions] * query_weights,
+                           minlength=len(self.paths))
+
+    def top_k(self, query_terms: List[str], k: int) -> List[Tuple[str, float]]:
+        scores = self.score(query_terms)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.paths[i], float(scores[i])) for i in best]
+
+
+class Localizer:
+    """
+    Keeps a BM25 index of a symbol index up to date and ranks its files against issue descriptions.
+    """
+
+    def __init__(self, symbol_index: SymbolIndex, logger=None) -> None:
+        self.symbol_index = symbol_index
+        self.logger = logger
+        self._bm25: Optional[BM25Index] = None
+        self._lock = threading.Lock()
+        symbol_index.add_listener(self._invalidate)
+
+    def _invalidate(self, paths: List[Path]) -> None:
+        self._bm25 = None
+
+    def _build(self) -> BM25Index:
+        documents = {}
+        for rel, entry in self.symbol_index.entries():
+            terms = tokenize(rel.replace("/", " "))
+            for symbol in entry.symbols:
+                terms.extend(tokenize(symbol.name))
+                if symbol.docstring:
+                    terms.extend(tokenize(symbol.docstring))
+            documents[rel] = terms
+        return BM25Index(documents)
+
+    def localize(self, issue: str, k: int = 5, symbols_per_file: int = 3) -> List[Candidate]:
+        with self._lock:
+            if self._bm25 is None:
+                self._bm25 = self._build()
+            bm25 = self._bm25
+
+        query_terms = tokenize(issue)
+        query = set(query_terms)
+        candidates = []
+        for rel, score in bm25.top_k(query_terms, k):
+            path = self.symbol_index.root / rel
+            ranked_symbols = []
+            for symbol in self.symbol_index.file_entry(path).symbols:
+                overlap = len(query.intersection(tokenize(symbol.name)))
+                if overlap:
+                    ranked_symbols.append((-overlap, symbol.lineno, symbol.qualname))
+            candidates.append(Candidate(path, score, [name for _, _, name in sorted(ranked_symbols)[:symbols_per_file]]))
+        return candidates
+
+
+_LOCALIZERS: Dict[Path, Localizer] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_localizer(cwd: Path, logger=None) -> Localizer:
+    symbol_index = get_symbol_index(cwd, logger)
+    with _REGISTRY_LOCK:
+        localizer = _LOCALIZERS.get(symbol_index.root)
+        if localizer is None or localizer.symbol_index is not symbol_index:
+            localizer = Localizer(symbol_index, logger)
+            _LOCALIZERS[symbol_index.root] = localizer
+        return localizer
+
+
+def format_candidates(candidates: List[Candidate], cwd: Path) -> str:
+    if not candidates:
+        return ""
+
+    lines = ["The following files are the most likely to be relevant to the issue, the most relevant first:"]
+    for candidate in candidates:
+        try:
+            path = candidate.path.relative_to(Path(cwd).resolve())
+        except ValueError:
+            path = candidate.path
+        line = f"- {path}"
+        if candidate.symbols:
+            line += " (" + ", ".join(f"`{name}`" for name in candidate.symbols) + ")"
+        lines.append(line)
+    return "\n".join(lines)
@@ -11,6 +11,11 @@ THOUGHT_TOKEN = "[Thought]"
 ACTION_TOKEN = "[Action]"
 OBS_TOKEN = "[Observation]"
 
+# Tools whose single argument is free text, it is not split at commas
+WHOLE_ARGUMENT_TOOLS = ("Finish", "Human_Interaction", "Search_Code", "Semantic_Search")
+# Tools whose last argument is code, only the arguments in front of it are split at commas
+CODE_ARGUMENT_TOOLS = {"Replace_Method": 2}
+
 class MetaToken(ABC):
     @abstractmethod
     def match(cls, text: str) -> Tuple[Union['MetaToken', None], int]:
@@ -103,11 +108,15 @@ class Action(MetaToken):
 
     @classmethod
     def match(cls, text: str) -> Tuple[Union['Action', None], int]:
-        match = re.match(rf"{re.escape(ACTION_TOKEN)}\s*([\w_]+)\[(.*?)\](?={re.escape(OBS_TOKEN)}|$)", text, re.DOTALL)
+        # a step may consist of several actions, so an action ends at the next action as well
+        match = re.match(rf"{re.escape(ACTION_TOKEN)}\s*([\w_]+)\[(.*?)\](?=\s*(?:{re.escape(ACTION_TOKEN)}|{re.escape(OBS_TOKEN)}|$))", text, re.DOTALL)
         if match:
             tool_name = match.group(1)
-            if tool_name == "Finish" or tool_name == "Human_Interaction":
+            if tool_name in WHOLE_ARGUMENT_TOOLS:
                 input_variables = [match.group(2)]
+            elif tool_name in CODE_ARGUMENT_TOOLS:
+                arguments = match.group(2).split(',', CODE_ARGUMENT_TOOLS[tool_name])
+                input_variables = [var.strip() for var in arguments[:-1]] + [arguments[-1].strip("\n ")] if match.group(2).strip() else []
             else:
                 input_variables = [var.strip() for var in match.group(2).strip().split(',')] if match.group(2).strip() else []
             pointer = match.end()
@@ -149,10 +158,15 @@ class Observation(MetaToken):
         return "ObservationToken"
 
 
+# Thought, one or more Actions, Observation, Thought, ...
+_EXPECTED_TYPES = {Question: (Thought,), Thought: (Action,), Action: (Action, Observation), Observation: (Thought,)}
+
+
 class MetaTokenizer:
     
-    def __init__(self, tool_kit: Toolkit) -> None:
+    def __init__(self, tool_kit: Toolkit, logger=None) -> None:
         self.possible_action_token_names = tool_kit.get_possible_actions()
+        self.logger = logger
 
     def tokenize(self, trajectory: str) -> List[MetaToken]:
         token_stream = []
@@ -163,26 +177,57 @@ class MetaTokenizer:
             token_stream.append(sys_prompt_token)
             trajectory = trajectory[pointer:]
 
-        # normalize trajectory
-        trajectory = trajectory.replace("\n", "")
+        # the newlines are kept, the code argument of `Replace_Method` needs them
         
         #Handles FewShotExamples in the prompt
         #token = FewShotExamples.match(trajectory)
         #token_stream.append(token)
         #trajectory = trajectory[len(token.unparse()):].strip()  
         
-        while trajectory:
-            trajectory = trajectory.strip()
+        token_stream.extend(token for token, _ in self._scan(trajectory))
+        return token_stream
+
+    @staticmethod
+    def _scan(text: str) -> List[Tuple[MetaToken, int]]:
+        """
+        Tokenizes a trajectory without its sysprompt, returns the tokens and where they start.
+        Stops at the first text that is no token.
+        """
+        tokens = []
+        offset = 0
+        while offset < len(text):
+            remaining = text[offset:]
+            stripped = remaining.strip()
+            if not stripped:
+                break
+            start = offset + len(remaining) - len(remaining.lstrip())
             for token_class in [Question, Thought, Action, Observation]:
-                token, pointer = token_class.match(trajectory)
+                token, pointer = token_class.match(stripped)
                 if token:
-                    token_stream.append(token)
-                    trajectory = trajectory[pointer:].strip()
+                    tokens.append((token, start))
+                    offset = start + pointer
                     break
             else:
                 break
-
-        return token_stream
+        return tokens
+
+    @staticmethod
+    def _transition_error(index: int, previous: Union[MetaToken, None], token: MetaToken) -> Union[Tuple, None]:
+        """
+        Checks that `token` may follow `previous` at position `index`, returns the log message and arguments if not.
+        """
+        if index == 0:
+            if not isinstance(token, SysPrompt):
+                return ("When validating the trajectory, the first metatoken was not a systemprompt.",)
+        elif index == 1:
+            if not isinstance(token, Question):
+                return ("When validating the trajectory, the second token was not a question token.",)
+        else:
+            expected_type = _EXPECTED_TYPES[type(previous)]
+            if not isinstance(token, expected_type):
+                return ("When validating the trajectory, a unexpected token was found: expected: '%s' but got: '%s'.",
+                        expected_type, token)
+        return None
     
     def is_valid_traj(self, traj: Union[str, List[MetaToken]]) -> bool:
         if isinstance(traj, str):
@@ -191,34 +236,107 @@ class MetaTokenizer:
             token_stream = traj
 
         if not token_stream:
-            print("Logger: when validatin the trajectory the trajectory was empty.")
-            return False
-
-        if not isinstance(token_stream[0], SysPrompt):
-            print("Logger: when validating the trajectory, the first metatoken was not a systemprompt.")
-            return False
-
-        if len(token_stream) > 1 and not isinstance(token_stream[1], Question):
-            print("Logger: when validating the trajectory, the second token was not a question token.")
+            self._log("When validating the trajectory, the trajectory was empty.")
             return False
 
-        expected_types = [Thought, Action, Observation]
-        index = 2
-        while index < len(token_stream):
-            expected_type = expected_types[(index - 2) % 3]
-            if not isinstance(token_stream[index], expected_type):
-                print("Logger: When validating the trajectory, a unexpected token was found: expected: '" + str(expected_type) + "' but got: '" + str(token_stream[index]) + "'.")
-                
-                token_str_test = "("
-                for curr_token in token_stream:
-                    token_str_test += str(curr_token) + ", "
-                token_str_test += ")"
-           
-                print("Current token stream: " + str(token_str_test))
+        for index, token in enumerate(token_stream):
+            error = self._transition_error(index, token_stream[index - 1] if index else None, token)
+            if error is not None:
+                self._log(*error)
+                if index > 1:
+                    self._log("Current token stream: (%s)", ", ".join(str(curr_token) for curr_token in token_stream))
                 return False
-            index += 1
 
         return True
 
+    def _log(self, message: str, *args) -> None:
+        if self.logger is not None:
+            self.logger.debug(message, *args)
+
     def unparse(self, token_stream: List[MetaToken]) -> str:
         return "\n".join(token.unparse() for token in token_stream)
+
+
+class IncrementalMetaTokenizer:
+    """
+    Tokenizes a trajectory that only ever grows at the end, e.g. model output and observations of the agent loop.
+    Only the last token can still change when text is appended, so every token in front of it is accepted and
+    validated once. `feed` only looks at the last token and the new text, `is_valid` only at the last token.
+    The tokens are the same as `MetaTokenizer.tokenize` of the whole text.
+    It is a read-only sequence of its tokens, `checkpoint` and `rollback` undo the text fed in between.
+    """
+
+    def __init__(self, tokenizer: MetaTokenizer) -> None:
+        self.tokenizer = tokenizer
+        self._head: Union[str, None] = ""   # the raw text until it is clear whether it starts with a sysprompt
+        self._accepted: List[MetaToken] = []
+        self._pending = ""                  # the text from the start of the last token on
+        self._tail: List[MetaToken] = []    # the last token, if the pending text starts with one
+        self._error: Union[Tuple, None] = None  # the first invalid transition between accepted tokens
+
+    def feed(self, text: str) -> None:
+        if self._head is not None:
+            self._head += text
+            token, pointer = SysPrompt.match(self._head)
+            if token:
+                self._accept(token)
+                text = self._head[pointer:]
+            elif SYSPROMPT_TOKEN.startswith(self._head) or self._head.startswith(SYSPROMPT_TOKEN):
+                # the sysprompt is not complete yet
+                return
+            else:
+                text = self._head
+            self._head = None
+
+        self._pending += text
+        scanned = MetaTokenizer._scan(self._pending)
+        if not scanned:
+            self._tail = []
+            return
+
+        for token, _ in scanned[:-1]:
+            self._accept(token)
+        last, start = scanned[-1]
+        self._pending = self._pending[start:]
+        self._tail = [last]
+
+    def _accept(self, token: MetaToken) -> None:
+        if self._error is None:
+            self._error = self.tokenizer._transition_error(len(self._accepted), self._accepted[-1] if self._accepted else None, token)
+        self._accepted.append(token)
+
+    def is_valid(self) -> bool:
+        if not self:
+            self.tokenizer._log("When validating the trajectory, the trajectory was empty.")
+            return False
+
+        error = self._error
+        if error is None and self._tail:
+            error = self.tokenizer._transition_error(len(self._accepted), self._accepted[-1] if self._accepted else None, self._tail[0])
+        if error is not None:
+            self.tokenizer._log(*error)
+            return False
+        return True
+
+    def checkpoint(self) -> Tuple:
+        return (self._head, len(self._accepted), self._pending, self._tail, self._error)
+
+    def rollback(self, checkpoint: Tuple) -> None:
+        self._head, accepted, self._pending, self._tail, self._error = checkpoint
+        del self._accepted[accepted:]
+
+    @property
+    def tokens(self) -> List[MetaToken]:
+        return self._accepted + self._tail
+
+    def __len__(self) -> int:
+        return len(self._accepted) + len(self._tail)
+
+    def __getitem__(self, index: int) -> MetaToken:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token index out of range")
+        if index < len(self._accepted):
+            return self._accepted[index]
+        return self._tail[index - len(self._accepted)]
@@ -0,0 +1,73 @@
+# Output Capture
+# `contextlib.redirect_stdout` swaps `sys.stdout` for the whole process, so agents running in different threads
+# would capture each other's output. Instead `sys.stdout` and `sys.stderr` are replaced once by proxies that write
+# to the buffer of the current context, or to the original stream if nothing is captured there.
+
+import contextlib
+import contextvars
+import io
+import sys
+import threading
+from typing import Iterator, Optional, TextIO
+
+_BUFFER: contextvars.ContextVar[Optional[io.StringIO]] = contextvars.ContextVar("smolcoder_output_buffer", default=None)
+_INSTALL_LOCK = threading.Lock()
+
+
+class _ContextStream(io.TextIOBase):
+    def __init__(self, original: TextIO) -> None:
+        self.original = original
+
+    def _target(self) -> TextIO:
+        buffer = _BUFFER.get()
+        return self.original if buffer is None else buffer
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return _BUFFER.get() is None and self.original.isatty()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.original, "encoding", "utf-8")
+
+    def fileno(self) -> int:
+        return self.original.fileno()
+
+
+def _install() -> None:
+    with _INSTALL_LOCK:
+        if not isinstance(sys.stdout, _ContextStream):
+            sys.stdout = _ContextStream(sys.stdout)
+        if not isinstance(sys.stderr, _ContextStream):
+            sys.stderr = _ContextStream(sys.stderr)
+
+
+def uncaptured(stream: TextIO) -> TextIO:
+    """
+    The stream behind the proxy, for output that has to reach the console even while it is captured,
+    e.g. a question to the human.
+    """
+    return stream.original if isinstance(stream, _ContextStream) else stream
+
+
+@contextlib.contextmanager
+def capture_output() -> Iterator[io.StringIO]:
+    """
+    Collects everything the current context (thread or task) writes to stdout and stderr,
+    the output of other threads is not affected.
+    """
+    _install()
+    buffer = io.StringIO()
+    token = _BUFFER.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _BUFFER.reset(token)
@@ -0,0 +1,62 @@
+# Pagination
+# The whole trajectory is sent to the model on every call, so a single large observation makes every later call
+# more expensive. Tools split long listings into pages that fit a token budget, the ACI cuts off whatever is
+# still too long.
+
+from typing import List, Optional, Tuple
+
+# rough estimate for code and english text, good enough for budgets
+CHARS_PER_TOKEN = 4
+
+
+def parse_page(argument: str) -> Optional[int]:
+    """
+    `2` or `page=2`, None if the argument is not a page number.
+    """
+    argument = argument.strip()
+    if argument.lower().startswith("page"):
+        argument = argument[4:].lstrip(" =:")
+    return int(argument) if argument.isdigit() else None
+
+
+def paginate(items: List[str], page: int, max_tokens: int, separator: str = "\n") -> Tuple[List[str], int]:
+    """
+    Splits the items into pages of at most `max_tokens` and returns the items of `page` (starting at 1)
+    and the number of pages. Every page has at least one item, items that are too long by themselves are shortened.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pages: List[List[str]] = [[]]
+    size = 0
+    for item in items:
+        if len(item) > max_chars:
+            item = item[:max_chars] + "..."
+        if pages[-1] and size + len(separator) + len(item) > max_chars:
+            pages.append([])
+            size = 0
+        size += len(item) + (len(separator) if pages[-1] else 0)
+        pages[-1].append(item)
+
+    if page < 1 or page > len(pages):
+        return [], len(pages)
+    return pages[page - 1], len(pages)
+
+
+def continuation(tool_name: str, arguments: List[str], page: int, pages: int) -> str:
+    """The hint how to get the next page, empty on the last page."""
+    if page >= pages:
+        return ""
+    return f"(Page {page} of {pages}, use {tool_name}[{', '.join(arguments + [str(page + 1)])}] to see more.)"
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """
+    Cuts `text` off at a line break after `max_tokens`, with a note how much is missing.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return (text[:cut].rstrip() + f"\n(The observation was cut off after {cut} of {len(text)} characters. "
+            "Use the page argument of the tool or a narrower input to see the rest.)")
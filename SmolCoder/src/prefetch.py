@@ -0,0 +1,38 @@
+# Speculative Prefetch
+# While the model streams a step, every action that is complete already is handed to the ACI, which runs it in the
+# background if it is read-only. By the time generation finished, the observation is often ready.
+# An action counts as complete once something follows its closing bracket, e.g. a newline or the next token.
+
+import re
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.meta_tokenizer import ACTION_TOKEN, Action
+
+_COMPLETE_ACTION = re.compile(rf"{re.escape(ACTION_TOKEN)}\s*\w+\[.*?\][ \t]*(?=\n|\[)", re.DOTALL)
+
+
+class Prefetcher:
+    """
+    The `on_text` callback for one step of the agent.
+    """
+
+    def __init__(self, aci: AgentComputerInterface) -> None:
+        self.aci = aci
+        self.started = 0
+        self._offset = 0
+        self._stopped = False
+
+    def __call__(self, text: str) -> None:
+        if self._stopped:
+            return
+
+        for match in _COMPLETE_ACTION.finditer(text, self._offset):
+            self._offset = match.end()
+            action, _ = Action.match(match.group(0).rstrip())
+            if action is None:
+                continue
+            if not self.aci.prefetch(*action.unpack()):
+                # the later actions of the step may depend on the changes of this one
+                self._stopped = True
+                return
+            self.started += 1
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Callable, Optional
 
 from SmolCoder.src.llm_wrapper import LLM
 from SmolCoder.src.toolkit import Toolkit
@@ -19,9 +20,9 @@ class PromptingStrategy(ABC):
         pass
     
     @staticmethod
-    def create(model:LLM, toolkit:Toolkit, strategy="ReAct", mode:int = 2):
+    def create(model:LLM, toolkit:Toolkit, strategy="ReAct", mode:int = 2, repo_map:str = ""):
         if strategy == "ReAct":
-            return ReAct(name=strategy, lm=model, toolkit=toolkit, mode=mode)
+            return ReAct(name=strategy, lm=model, toolkit=toolkit, mode=mode, repo_map=repo_map)
         else:
             raise ValueError
 
@@ -31,13 +32,15 @@ class ReAct(PromptingStrategy):
     ACTION_TOKEN = "[Action]"
     OBSERVATION_TOKEN = "[Observation]"
 
-    def __init__(self, name:str, lm: LLM, toolkit:Toolkit, mode:int = 2) -> None:
+    def __init__(self, name:str, lm: LLM, toolkit:Toolkit, mode:int = 2, repo_map:str = "") -> None:
         """
         Args:
             mode (int): 0 for github_issue_mode, 1 for repoduce_error_mode, 2 for ReAct Mode
+            repo_map (str): outline of the repository that is appended to the instructions, empty to leave it out
         """
         super().__init__(name, lm, toolkit)
         self._mode = mode 
+        self._repo_map = repo_map
         self._sysprompt = self._build_sysprompt()
 
     def _build_sysprompt(self) -> str:
@@ -84,21 +87,38 @@ class ReAct(PromptingStrategy):
             f"{self.THOUGHT_TOKEN}next steps to take based on the previous Observation\n"
             "...\n"
             f"until {self.ACTION_TOKEN} is of type `Finish`.\n"
+            f"You can take several independent actions in one step, e.g. to look at several methods at once, by starting each of them with {self.ACTION_TOKEN}. "
+            "They are executed in their order and you get one observation with all of their results.\n"
             "Do not use any special formatation such as markdown.\n"
             f"The {self.OBSERVATION_TOKEN} will automatically be given to you after you used an action, so you can stop after taking an {self.ACTION_TOKEN}"
             "---\n\n"
         )
 
+        if self._repo_map:
+            # inside of the sysprompt block, the tokenizer expects the question right after it
+            sysprompt += (
+                "The repository contains the following files, classes and methods, the most imported files first. "
+                "Use it to go straight to the relevant code:\n"
+                f"{self._repo_map}\n"
+            )
+
         sysprompt += self.SYSPROMPT_TOKEN
         sysprompt += "\n\n"
 
         return sysprompt
 
-    def __call__(self, prompt: str, begin=False) -> str:
+    def __call__(self, prompt: str, begin=False, hints: str = "", on_text: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Args:
+            hints (str): auxiliary information for the first prompt, e.g. the files that are likely relevant to the question
+            on_text: receives the completion generated so far while it is streamed
+        """
         if begin:
             prompt = self.sysprompt + prompt + "\n"
+            if hints:
+                prompt += hints + "\n"
         
-        prompt += self.lm.query_completion(prompt, stop_token=self.OBSERVATION_TOKEN)
+        prompt += self.lm.query_completion(prompt, stop_token=self.OBSERVATION_TOKEN, on_text=on_text)
         return prompt
 
 
@@ -0,0 +1,126 @@
+# Repository Map
+# A compact outline of the most important files of a repository with their classes and signatures.
+# Files are ranked by how many other files import them, the outline is cut off at a token budget.
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import List, Tuple
+
+from SmolCoder.src.import_graph import import_graph
+from SmolCoder.src.meta_tokenizer import ACTION_TOKEN, OBS_TOKEN, QUESTION_TOKEN, SYSPROMPT_TOKEN, THOUGHT_TOKEN
+from SmolCoder.src.symbol_index import FileEntry, SymbolIndex, get_symbol_index, head_commit
+
+# Rough estimate used for the budget, close enough for code with the usual tokenizers.
+CHARS_PER_TOKEN = 4
+
+# Names the map must not contain, the meta tokenizer would split the system prompt at them.
+_META_TOKENS = re.compile("|".join(re.escape(token) for token in (SYSPROMPT_TOKEN, QUESTION_TOKEN, THOUGHT_TOKEN, ACTION_TOKEN, OBS_TOKEN)))
+
+
+def rank_files(entries: List[Tuple[str, FileEntry]]) -> List[Tuple[str, int]]:
+    """
+    Returns (file, number of other files importing it), the most imported files first.
+    """
+    importers = import_graph(entries)
+    symbol_counts = {rel: len(entry.symbols) for rel, entry in entries}
+    ranked = sorted(importers, key=lambda rel: (-len(importers[rel]), -symbol_counts[rel], rel))
+    return [(rel, len(importers[rel])) for rel in ranked]
+
+
+def _public(name: str) -> bool:
+    return not name.startswith("_") or name in ("__init__", "__call__")
+
+
+def outline(rel: str, entry: FileEntry, with_methods: bool = True) -> str:
+    lines = [f"{rel}:"]
+    for symbol in entry.symbols:
+        if not _public(symbol.name):
+            continue
+        depth = symbol.qualname.count(".")
+        if symbol.kind == "class":
+            lines.append("  " * (depth + 1) + f"class {symbol.signature}")
+        elif symbol.kind == "function":
+            lines.append(f"  def {symbol.signature}")
+        elif with_methods:
+            lines.append("  " * (depth + 1) + f"def {symbol.signature}")
+    return "\n".join(lines)
+
+
+def build_repo_map(entries: List[Tuple[str, FileEntry]], max_tokens: int = 1024) -> str:
+    """
+    Outlines the files in the order of `rank_files` until the budget is used up.
+    A file whose full outline does not fit anymore is shown without its methods, if that fits.
+    """
+    budget = max_tokens * CHARS_PER_TOKEN
+    entries = [(rel, entry) for rel, entry in entries if entry.symbols]
+    by_path = dict(entries)
+
+    blocks = []
+    for rel, _ in rank_files(entries):
+        for with_methods in (True, False):
+            block = _META_TOKENS.sub("", outline(rel, by_path[rel], with_methods))
+            if len(block) + 1 <= budget:
+                break
+        else:
+            break
+        if block.count("\n") == 0:
+            # nothing public in this file
+            continue
+        blocks.append(block)
+        budget -= len(block) + 1
+    return "\n".join(blocks)
+
+
+class RepoMap:
+    """
+    Caches the map of a repository on disk per commit, the stored map is reused as long as the indexed files
+    are the same as the ones it was built from.
+    """
+
+    def __init__(self, symbol_index: SymbolIndex, max_tokens: int = 1024) -> None:
+        self.symbol_index = symbol_index
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @property
+    def cache_file(self) -> Path:
+        root_key = hashlib.sha1(str(self.symbol_index.root).encode("utf-8")).hexdigest()[:16]
+        commit = head_commit(self.symbol_index.root)[:12]
+        return self.symbol_index.cache_dir / "repo_maps" / f"{root_key}-{commit}-{self.max_tokens}.json"
+
+    def render(self) -> str:
+        entries = self.symbol_index.entries()
+        digest = hashlib.sha1("\n".join(f"{rel}:{entry.blob}" for rel, entry in entries).encode("utf-8")).hexdigest()
+
+        with self._lock:
+            cache_file = self.cache_file
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached["digest"] == digest:
+                    return cached["map"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+            repo_map = build_repo_map(entries, self.max_tokens)
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    json.dump({"digest": digest, "map": repo_map}, f)
+                os.replace(tmp_file, cache_file)
+            except OSError as e:
+                if self.symbol_index.logger:
+                    self.symbol_index.logger.debug("Could not cache the repository map of %s: %s", self.symbol_index.root, e)
+            return repo_map
+
+
+def get_repo_map(cwd: Path, max_tokens: int = 1024, logger=None) -> str:
+    """
+    Returns the map of the repository containing `cwd`, with paths relative to the root of the repository.
+    """
+    return RepoMap(get_symbol_index(cwd, logger), max_tokens).render()
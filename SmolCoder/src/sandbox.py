@@ -0,0 +1,263 @@
+# Sandbox
+# Runs untrusted python code in a pool of warm worker processes. Every call is limited in cpu time, wall-clock time and
+# memory; a worker that crashes or exceeds a limit is killed and replaced. Requests and results are sent as
+# length-prefixed json over the pipes of the worker, its own stdin and stdout are redirected to /dev/null.
+
+import contextlib
+import io
+import json
+import math
+import os
+import queue
+import resource
+import select
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence
+
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+_HEADER = struct.Struct(">I")
+
+
+class Limits(NamedTuple):
+    cpu_seconds: int = 10
+    wall_seconds: float = 30.0
+    memory_mb: int = 2048       # address space, RLIMIT_RSS is not enforced by linux
+
+
+class SandboxResult(NamedTuple):
+    output: str                 # everything written to stdout and stderr
+    result: Optional[str]       # repr of `__result__`, None if the code did not assign it
+    error: Optional[str]        # the exception or the exceeded limit, None on success
+
+
+class SandboxError(Exception):
+    pass
+
+
+def send_message(stream, message: dict) -> None:
+    data = json.dumps(message).encode("utf-8")
+    stream.write(_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def _read_exactly(fd: int, size: int, deadline: Optional[float]) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or not select.select([fd], [], [], timeout)[0]:
+                raise TimeoutError
+        chunk = os.read(fd, remaining)
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def receive_message(fd: int, deadline: Optional[float] = None) -> dict:
+    (size,) = _HEADER.unpack(_read_exactly(fd, _HEADER.size, deadline))
+    return json.loads(_read_exactly(fd, size, deadline).decode("utf-8"))
+
+
+class _Worker:
+    def __init__(self, limits: Limits, preload: Sequence[str], generation: int = 0) -> None:
+        self.generation = generation
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(_REPO_ROOT), env.get("PYTHONPATH")]))
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", "-m", "SmolCoder.src.sandbox", json.dumps({"memory_mb": limits.memory_mb, "preload": list(preload)})],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, cwd=str(_REPO_ROOT),
+            start_new_session=True,
+        )
+
+    def run(self, code: str, cwd: Path, limits: Limits, sys_path: Sequence[str] = ()) -> SandboxResult:
+        send_message(self.process.stdin, {"code": code, "cwd": str(cwd), "cpu_seconds": limits.cpu_seconds, "sys_path": list(sys_path)})
+        reply = receive_message(self.process.stdout.fileno(), time.monotonic() + limits.wall_seconds)
+        return SandboxResult(reply["output"], reply["result"], reply["error"])
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            with contextlib.suppress(OSError):
+                stream.close()
+
+
+class WorkerPool:
+    """
+    A fixed number of worker processes, started right away so that the first calls do not wait for the interpreter.
+    `run` blocks while all workers are busy, so up to `size` calls run concurrently.
+    Workers keep the modules they imported, `recycle` replaces them after the code of the checkout changed.
+    """
+
+    def __init__(self, size: int = 2, limits: Limits = Limits(), preload: Sequence[str] = ()) -> None:
+        self.limits = limits
+        self.preload = tuple(preload)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._generation = 0
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.limits, self.preload, self._generation)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._workers.remove(worker)
+
+    def recycle(self, paths: Optional[List[Path]] = None) -> None:
+        """
+        Replaces all workers if one of the changed `paths` is a python file, busy ones once they are done.
+        """
+        if paths is not None and not any(str(path).endswith(".py") for path in paths):
+            return
+        with self._lock:
+            self._generation += 1
+        while not self._closed:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker.generation == self._generation:
+                # a replacement of this round
+                self._idle.put(worker)
+                return
+            self._retire(worker)
+            self._idle.put(self._spawn())
+
+    def run(self, code: str, cwd: Path, limits: Optional[Limits] = None, sys_path: Sequence[str] = ()) -> SandboxResult:
+        """
+        Executes `code` in a fresh namespace with `cwd` as working directory.
+        `cwd` and `sys_path` come first on the import path, so the checkout is imported instead of anything else.
+        """
+        if self._closed:
+            raise SandboxError("The worker pool is closed.")
+        limits = limits or self.limits
+        worker = self._idle.get()
+        try:
+            result = worker.run(code, cwd, limits, sys_path)
+        except TimeoutError:
+            result = SandboxResult("", None, f"The code did not finish within {limits.wall_seconds:g} seconds.")
+        except (EOFError, OSError, ValueError):
+            # the worker died: the cpu limit (SIGXCPU), the oom killer or the code itself, e.g. `os._exit`
+            worker.process.wait()
+            if worker.process.returncode == -signal.SIGXCPU:
+                result = SandboxResult("", None, f"The code exceeded the cpu time limit of {limits.cpu_seconds} seconds.")
+            else:
+                result = SandboxResult("", None, f"The worker process crashed (exit code {worker.process.returncode}).")
+        else:
+            if worker.generation == self._generation:
+                self._idle.put(worker)
+                return result
+
+        self._retire(worker)
+        if not self._closed:
+            self._idle.put(self._spawn())
+        return result
+
+    def close(self) -> None:
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.kill()
+
+
+class _CpuLimitExceeded(BaseException):
+    pass
+
+
+def _raise_cpu_limit_exceeded(signum, frame):
+    raise _CpuLimitExceeded
+
+
+def execute_request(request: dict, memory_mb: int) -> dict:
+    """
+    Executes the code of a request in a fresh namespace and returns the reply, used by the workers and the fork server.
+    """
+    # the cpu limit counts the whole lifetime of the process, the soft limit only sends SIGXCPU, which ends the code
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = math.ceil(usage.ru_utime + usage.ru_stime)
+    signal.signal(signal.SIGXCPU, _raise_cpu_limit_exceeded)
+    resource.setrlimit(resource.RLIMIT_CPU, (used + request["cpu_seconds"], resource.RLIM_INFINITY))
+
+    namespace = {"__name__": "__main__"}
+    output = io.StringIO()
+    error = None
+    # like `python` started in the checkout
+    sys_path = list(sys.path)
+    sys.path[:0] = [request["cwd"]] + [path for path in request.get("sys_path", []) if path != request["cwd"]]
+    try:
+        os.chdir(request["cwd"])
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            exec(compile(request["code"], "<code>", "exec"), namespace)
+    except _CpuLimitExceeded:
+        error = f"The code exceeded the cpu time limit of {request['cpu_seconds']} seconds."
+    except MemoryError:
+        error = f"MemoryError: the code exceeded the memory limit of {memory_mb} MB."
+    except BaseException as e:
+        # only the frames of the code itself
+        frames = traceback.extract_tb(e.__traceback__)
+        lines = [f"line {frame.lineno}" for frame in frames if frame.filename == "<code>"]
+        error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        if lines:
+            error += f" ({lines[-1]})"
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (resource.RLIM_INFINITY, resource.RLIM_INFINITY))
+        sys.path[:] = sys_path
+
+    result = None
+    if "__result__" in namespace:
+        try:
+            result = repr(namespace["__result__"])
+        except Exception as e:
+            result = f"<unrepresentable {type(namespace['__result__']).__name__}: {e}>"
+    return {"output": output.getvalue(), "result": result, "error": error}
+
+
+def _serve(config: dict) -> None:
+    """
+    The loop of a worker process.
+    """
+    # the pipes are only used for the protocol, the code itself gets /dev/null
+    commands = os.fdopen(os.dup(0), "rb")
+    replies = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    memory = config["memory_mb"] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    for module in config["preload"]:
+        with contextlib.suppress(Exception):
+            __import__(module)
+
+    while True:
+        try:
+            request = receive_message(commands.fileno())
+        except EOFError:
+            return
+        send_message(replies, execute_request(request, config["memory_mb"]))
+
+
+if __name__ == "__main__":
+    _serve(json.loads(sys.argv[1]))
@@ -0,0 +1,201 @@
+# Source Editing
+# Replaces methods by splicing the new source into the byte range of the old method, everything else in the file
+# (comments, formatting, blank lines) stays exactly as it was. Several edits are applied as one transaction.
+
+import ast
+import os
+import textwrap
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class EditError(Exception):
+    pass
+
+
+class MethodEdit(NamedTuple):
+    path: Path
+    class_name: str         # may be a qualified name of a nested class, e.g. `Outer.Inner`
+    method_name: str
+    new_method: str
+
+
+def _normalize_method(new_method: str) -> str:
+    """
+    Dedents the new method. The first line of an argument often lost its indentation while the others kept it,
+    so that case is tried as well.
+    """
+    text = new_method.strip("\n")
+    lines = text.splitlines()
+    candidates = [textwrap.dedent(text)]
+    if len(lines) > 1:
+        rest = "\n".join(lines[1:])
+        candidate = lines[0].strip() + "\n" + textwrap.indent(textwrap.dedent(rest), "    ")
+        rest_indent = min(len(line) - len(line.lstrip()) for line in lines[1:] if line.strip()) if rest.strip() else 0
+        if lines[0] == lines[0].lstrip() and rest_indent > 4:
+            candidates.insert(0, candidate)
+        else:
+            candidates.append(candidate)
+
+    for candidate in candidates:
+        try:
+            tree = ast.parse(candidate)
+        except SyntaxError:
+            continue
+        if tree.body and all(isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) for node in tree.body):
+            return candidate.rstrip()
+        raise EditError("The new method has to consist of function definitions only.")
+    raise EditError(f"The new method is not valid python: {_syntax_error(candidates[0])}")
+
+
+def _syntax_error(source: str) -> str:
+    try:
+        ast.parse(source)
+    except SyntaxError as e:
+        return f"{e.msg} (line {e.lineno})"
+    return ""
+
+
+def find_method(tree: ast.Module, class_name: str, method_name: str):
+    """
+    Returns the definition of `class_name.method_name`, the class may be nested in other classes or in `if` blocks.
+    """
+    scope = [tree]
+    for part in class_name.split("."):
+        matches = [node for body in scope for node in _statements(body) if isinstance(node, ast.ClassDef) and node.name == part]
+        if not matches:
+            return None
+        scope = matches
+
+    for class_node in scope:
+        for node in _statements(class_node):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == method_name:
+                return node
+    return None
+
+
+def _statements(node):
+    """The statements of a body, including the ones in `if`, `try` and similar blocks."""
+    for child in node.body:
+        yield child
+        if isinstance(child, (ast.If, ast.Try, ast.With, ast.AsyncWith, ast.For, ast.AsyncFor, ast.While)):
+            yield from _statements_of(child)
+
+
+def _statements_of(node):
+    for field in ("body", "orelse", "finalbody"):
+        for child in getattr(node, field, []):
+            yield child
+            if isinstance(child, (ast.If, ast.Try, ast.With, ast.AsyncWith, ast.For, ast.AsyncFor, ast.While)):
+                yield from _statements_of(child)
+    for handler in getattr(node, "handlers", []):
+        yield from handler.body
+
+
+def splice_method(source: bytes, class_name: str, method_name: str, new_method: str, filename: str = "<unknown>") -> bytes:
+    """
+    Returns `source` with the method (including its decorators) replaced by `new_method`,
+    indented like the method it replaces. Raises an EditError if the method is not found or the result does not parse.
+    """
+    try:
+        tree = ast.parse(source, filename=filename)
+    except SyntaxError as e:
+        raise EditError(f"Error parsing file '{filename}': {e}")
+
+    node = find_method(tree, class_name, method_name)
+    if node is None:
+        raise EditError(f"Method '{method_name}' not found in class '{class_name}' in file '{filename}'.")
+
+    # line offsets in bytes, the col offsets of the ast are byte offsets as well
+    line_starts = [0]
+    for line in source.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+
+    first_line = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+    start = line_starts[first_line - 1]
+    end = line_starts[node.end_lineno - 1] + node.end_col_offset
+    rest_of_line = source[end:line_starts[node.end_lineno]].rstrip(b"\r\n")
+    if rest_of_line.strip().startswith(b"#"):
+        # a comment behind the last statement belongs to the method
+        end += len(rest_of_line)
+    indent = source[start:start + node.col_offset].decode("utf-8", errors="replace")
+    if indent.strip():
+        # something else is in front of the method on its line, e.g. `class A: def f(self): ...`
+        raise EditError(f"Method '{method_name}' in class '{class_name}' does not start on its own line in file '{filename}'.")
+
+    replacement = textwrap.indent(_normalize_method(new_method), indent, lambda line: bool(line.strip()))
+    result = source[:start] + replacement.encode("utf-8") + source[end:]
+    try:
+        ast.parse(result, filename=filename)
+    except SyntaxError as e:
+        raise EditError(f"The file '{filename}' would not be valid python after the replacement: {e}")
+    return result
+
+
+def defined_functions(new_method: str) -> Tuple[str, ...]:
+    """The names of the functions `new_method` defines, i.e. the methods the class has after the replacement."""
+    tree = ast.parse(_normalize_method(new_method))
+    return tuple(node.name for node in tree.body)
+
+
+def apply_edits(edits: List[MethodEdit]) -> List[Path]:
+    """
+    Applies all edits or none of them: every file is read and edited in memory first, and only written once
+    all edits succeeded. If a write fails, the files written before it are restored.
+    Returns the changed files.
+    """
+    return write_edits(*prepare_edits(edits))
+
+
+def prepare_edits(edits: List[MethodEdit]) -> Tuple[Dict[Path, bytes], Dict[Path, bytes]]:
+    """
+    Reads the files and applies the edits in memory, nothing is written yet.
+    Returns the original and the edited content of every file.
+    """
+    originals: Dict[Path, bytes] = {}
+    contents: Dict[Path, bytes] = {}
+    for edit in edits:
+        path = Path(edit.path)
+        if path not in contents:
+            try:
+                with open(path, "rb") as f:
+                    originals[path] = contents[path] = f.read()
+            except OSError as e:
+                raise EditError(f"Could not read '{path}': {e}")
+        contents[path] = splice_method(contents[path], edit.class_name, edit.method_name, edit.new_method, path.name)
+    return originals, contents
+
+
+def write_edits(originals: Dict[Path, bytes], contents: Dict[Path, bytes]) -> List[Path]:
+    """Writes the changed files of `prepare_edits`, restoring the ones written already if a write fails."""
+    written: List[Path] = []
+    try:
+        for path, content in contents.items():
+            if content != originals[path]:
+                _write(path, content)
+                written.append(path)
+    except OSError as e:
+        failed = path
+        for path in written:
+            try:
+                _write(path, originals[path])
+            except OSError:
+                pass
+        raise EditError(f"Could not write '{failed}', all edits were rolled back: {e}")
+    return written
+
+
+def _write(path: Path, content: bytes) -> None:
+    tmp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(content)
+        try:
+            os.chmod(tmp_file, os.stat(path).st_mode & 0o7777)
+        except OSError:
+            pass
+        os.replace(tmp_file, path)
+    except OSError:
+        if tmp_file.exists():
+            tmp_file.unlink()
+        raise
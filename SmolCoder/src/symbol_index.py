@@ -0,0 +1,929 @@
+# Repository Symbol Index
+# Keeps the classes, methods and top-level functions of a working directory in memory and on disk,
+# so that the AST tools can answer their queries with dictionary lookups instead of walking and parsing the whole tree.
+
+import ast
+import builtins
+import hashlib
+import mmap
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from SmolCoder.src.cancellation import check_cancelled, wait_for
+from SmolCoder.src.fuzzy import FuzzyIndex
+
+# Bump this whenever the layout of `Symbol` or `FileEntry` changes, so old pickles get ignored.
+INDEX_VERSION = 5
+
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache"}
+
+# Below this many files to parse, starting worker processes costs more than it saves.
+PARALLEL_THRESHOLD = 64
+
+
+class Symbol(NamedTuple):
+    kind: str                   # "class", "method" or "function"
+    name: str
+    qualname: str               # e.g. `Outer.Inner.method`
+    class_name: Optional[str]   # the directly enclosing class of a method
+    lineno: int
+    end_lineno: int
+    signature: str
+    docstring: Optional[str]
+    start: int = 0              # byte offset of the first line
+    end: int = 0                # byte offset after the last line
+
+
+class FileEntry(NamedTuple):
+    mtime_ns: int
+    size: int
+    blob: str                   # git blob hash of the content
+    symbols: Tuple[Symbol, ...]
+    error: Optional[str]        # set if the file could not be parsed
+    imports: Tuple[str, ...] = ()   # imported modules, relative imports keep their leading dots
+    references: Tuple["Reference", ...] = ()
+
+
+class Reference(NamedTuple):
+    name: str                   # the last component, `b` for `a.b()`
+    lineno: int
+    kind: str                   # "call", "attribute", "name" or "import"
+
+
+class BuildStats(NamedTuple):
+    files: int          # number of python files in the index
+    parsed: int         # files that had to be parsed
+    cache_hits: int     # changed files whose symbols were found in the blob cache
+    removed: int
+    workers: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Files per second that were brought up to date."""
+        return (self.parsed + self.cache_hits) / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.files} files, {self.parsed} parsed, {self.cache_hits} from cache, {self.removed} removed "
+                f"in {self.seconds:.3f}s with {self.workers} worker(s) ({self.throughput:.0f} files/s)")
+
+
+def default_cache_dir() -> Path:
+    return Path(os.environ.get("SMOLCODER_CACHE_DIR", Path.home() / ".cache" / "smolcoder"))
+
+
+def default_workers() -> int:
+    workers = os.environ.get("SMOLCODER_INDEX_WORKERS")
+    if workers:
+        return max(1, int(workers))
+    return os.cpu_count() or 1
+
+
+def git_blob_hash(data: bytes) -> str:
+    """
+    The same hash git uses for blobs, so it matches the output of `git hash-object` and `git ls-files -s`.
+    """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def head_commit(root: Path) -> str:
+    """
+    The commit checked out in `root`, or "worktree" if it is not a git repository.
+    """
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return "worktree"
+    return result.stdout.strip() if result.returncode == 0 else "worktree"
+
+
+class BlobCache:
+    """
+    Content-addressed store of parsed symbol tables, keyed by the git blob hash of a file.
+    It is shared by all checkouts and runs, so moving a repository to another commit only parses the changed blobs.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, bytes] = {}
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, version INTEGER NOT NULL, payload BLOB NOT NULL)"
+            )
+
+    def get(self, blob: str) -> Optional[Tuple[Tuple[Symbol, ...], Optional[str], Tuple[str, ...], Tuple[Reference, ...]]]:
+        with self._lock:
+            payload = self._pending.get(blob)
+            if payload is None:
+                row = self._connection.execute(
+                    "SELECT payload FROM blobs WHERE sha = ? AND version = ?", (blob, INDEX_VERSION)
+                ).fetchone()
+                payload = row[0] if row else None
+
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return pickle.loads(payload)
+
+    def put(self, blob: str, symbols: Tuple[Symbol, ...], error: Optional[str], imports: Tuple[str, ...] = (),
+            references: Tuple[Reference, ...] = ()) -> None:
+        with self._lock:
+            self._pending[blob] = pickle.dumps((symbols, error, imports, references), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            rows = [(blob, INDEX_VERSION, payload) for blob, payload in self._pending.items()]
+            self._pending = {}
+            try:
+                with self._connection:
+                    self._connection.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)", rows)
+            except sqlite3.Error:
+                # the cache is only an accelerator, losing some entries is fine
+                pass
+
+
+_BLOB_CACHES: Dict[Path, BlobCache] = {}
+_BLOB_CACHES_LOCK = threading.Lock()
+
+
+def get_blob_cache(cache_dir: Path) -> BlobCache:
+    path = Path(cache_dir) / "blobs.sqlite3"
+    with _BLOB_CACHES_LOCK:
+        if path not in _BLOB_CACHES:
+            _BLOB_CACHES[path] = BlobCache(path)
+        return _BLOB_CACHES[path]
+
+
+def _signature(node) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = ", ".join(ast.unparse(base) for base in node.bases)
+        return f"{node.name}({bases})" if bases else node.name
+
+    signature = f"{node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+
+def parse_symbols(source: Union[str, bytes], filename: str = "<unknown>") -> List[Symbol]:
+    """
+    Extracts all classes (including nested ones), their methods and the top-level functions of a python source.
+    Raises a SyntaxError if the source can not be parsed.
+    """
+    data = source.encode("utf-8") if isinstance(source, str) else source
+    return _symbols(ast.parse(data, filename=filename), _line_starts(data))
+
+
+def _line_starts(data: bytes) -> List[int]:
+    """The byte offset of every line, plus the length of the data."""
+    starts = [0]
+    position = data.find(b"\n")
+    while position != -1:
+        starts.append(position + 1)
+        position = data.find(b"\n", position + 1)
+    if starts[-1] != len(data):
+        starts.append(len(data))
+    return starts
+
+
+def parse_imports(source: Union[str, bytes], filename: str = "<unknown>") -> List[str]:
+    """
+    Returns the modules a python source imports, anywhere in the file.
+    `from a import b` yields both `a` and `a.b`, since `b` might be a submodule. Relative imports keep their dots.
+    """
+    return _imports(ast.parse(source, filename=filename))
+
+
+def _imports(tree: ast.AST) -> List[str]:
+    return _names(tree)[0]
+
+
+# Names that are used everywhere and would only bloat the reference index.
+_IGNORED_REFERENCES = {"self", "cls"} | set(dir(builtins))
+
+
+def parse_references(source: Union[str, bytes], filename: str = "<unknown>") -> List[Reference]:
+    """
+    Returns the call sites, attribute accesses, imports and other uses of names in a python source.
+    Every name is recorded at most once per line and kind, uses of builtins, `self` and `cls` are left out.
+    """
+    return _references(ast.parse(source, filename=filename))
+
+
+def _references(tree: ast.AST) -> List[Reference]:
+    return _names(tree)[1]
+
+
+def _names(tree: ast.AST) -> Tuple[List[str], List[Reference]]:
+    """
+    Collects the imports and the references of a module in a single walk over the tree.
+    """
+    imports = []
+    references = set()
+    called = set()
+    # ast.walk is breadth first, so every call is seen before the expression it calls
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            called.add(id(node.func))
+            if isinstance(node.func, ast.Name):
+                references.add((node.func.id, node.func.lineno, "call"))
+            elif isinstance(node.func, ast.Attribute):
+                references.add((node.func.attr, node.func.end_lineno, "call"))
+        elif isinstance(node, ast.Attribute):
+            if id(node) not in called:
+                references.add((node.attr, node.end_lineno, "attribute"))
+        elif isinstance(node, ast.Name):
+            if id(node) not in called and isinstance(node.ctx, ast.Load):
+                references.add((node.id, node.lineno, "name"))
+        elif isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+            references.update((alias.name.split(".")[-1], node.lineno, "import") for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            if node.module:
+                imports.append(module)
+            separator = "." if node.module else ""
+            imports.extend(module + separator + alias.name for alias in node.names if alias.name != "*")
+            references.update((alias.name, node.lineno, "import") for alias in node.names if alias.name != "*")
+
+    references = [Reference._make(reference) for reference in sorted(references) if reference[0] not in _IGNORED_REFERENCES]
+    return list(dict.fromkeys(imports)), references
+
+
+def _symbols(tree: ast.AST, line_starts: List[int]) -> List[Symbol]:
+    symbols = []
+
+    def span(node) -> Tuple[int, int]:
+        return line_starts[node.lineno - 1], line_starts[min(node.end_lineno, len(line_starts) - 1)]
+
+    def visit(body, scope: List[str], enclosing_class: Optional[str]):
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                symbols.append(Symbol("class", node.name, ".".join(scope + [node.name]), enclosing_class,
+                                      node.lineno, node.end_lineno, _signature(node), ast.get_docstring(node), *span(node)))
+                visit(node.body, scope + [node.name], node.name)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if enclosing_class is not None:
+                    kind = "method"
+                elif not scope:
+                    kind = "function"
+                else:
+                    kind = None
+
+                if kind is not None:
+                    symbols.append(Symbol(kind, node.name, ".".join(scope + [node.name]), enclosing_class,
+                                          node.lineno, node.end_lineno, _signature(node), ast.get_docstring(node), *span(node)))
+                # classes defined inside of functions are still classes the agent might ask for
+                visit(node.body, scope + [node.name], None)
+            elif isinstance(node, (ast.If, ast.Try, ast.With, ast.AsyncWith, ast.For, ast.AsyncFor, ast.While)):
+                for field in ("body", "orelse", "finalbody"):
+                    visit(getattr(node, field, []), scope, enclosing_class)
+                for handler in getattr(node, "handlers", []):
+                    visit(handler.body, scope, enclosing_class)
+
+    visit(tree.body, [], None)
+    return symbols
+
+
+def _parse_chunk(root: str, rels: List[str], serialize: bool = True):
+    """
+    Reads and parses a chunk of files, this runs inside of the worker processes.
+    The symbols are returned as plain tuples, which keeps the pickled result small.
+    """
+    results = []
+    for rel in rels:
+        try:
+            with open(os.path.join(root, rel), "rb") as f:
+                data = f.read()
+                stat = os.fstat(f.fileno())
+        except OSError as e:
+            results.append((rel, 0, 0, "", (), str(e), (), ()))
+            continue
+
+        try:
+            tree = ast.parse(data, filename=rel)
+            imports, references = _names(tree)
+            symbols = tuple(tuple(symbol) for symbol in _symbols(tree, _line_starts(data)))
+            references = tuple(tuple(reference) for reference in references)
+            error, imports = None, tuple(imports)
+        except (SyntaxError, ValueError) as e:
+            symbols, error, imports, references = (), str(e), (), ()
+        results.append((rel, stat.st_mtime_ns, stat.st_size, git_blob_hash(data), symbols, error, imports, references))
+
+    return pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL) if serialize else results
+
+
+class SymbolIndex:
+    """
+    Symbol table of all python files below `root`.
+    Every file is stored together with its mtime and size, a file is only parsed again if one of them changed.
+    """
+
+    def __init__(self, root: Path, cache_dir: Optional[Path] = None, logger=None, workers: Optional[int] = None) -> None:
+        self.root = Path(root).resolve()
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        self.logger = logger
+        self.blob_cache = get_blob_cache(self.cache_dir)
+        self.workers = workers if workers is not None else default_workers()
+        self.last_build: Optional[BuildStats] = None
+
+        self._files: Dict[str, FileEntry] = {}
+        self._classes: Dict[str, List[Tuple[str, Symbol]]] = {}     # class name -> classes
+        self._members: Dict[str, List[Tuple[str, Symbol]]] = {}     # class name -> methods of the class
+        self._functions: Dict[str, List[Tuple[str, Symbol]]] = {}   # function name -> top-level functions
+        self._references: Dict[str, Dict[str, List[Reference]]] = {}  # name -> file -> uses of the name
+        self._class_fuzzy: Optional[FuzzyIndex] = None              # built on the first misspelled class name
+        self._lock = threading.RLock()
+        self._dirty = False
+
+        # listeners get called with the paths of all files whose entries changed
+        self._listeners: List[Callable[[List[Path]], None]] = []
+        self._events = set()
+        self._watcher: Optional["IndexWatcher"] = None
+
+    @property
+    def cache_file(self) -> Path:
+        key = hashlib.sha1(str(self.root).encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / "indexes" / f"{key}.pickle"
+
+    # ---------------------------------------------------------------- persistence
+
+    def load(self) -> bool:
+        try:
+            with open(self.cache_file, "rb") as f:
+                version, root, files = pickle.load(f)
+        except Exception:
+            return False
+
+        if version != INDEX_VERSION or root != str(self.root):
+            return False
+
+        with self._lock:
+            self._files = {}
+            self._classes, self._members, self._functions, self._references = {}, {}, {}, {}
+            for rel, entry in files.items():
+                self._set_entry(rel, entry)
+            self._dirty = False
+            self._events = set()
+        return True
+
+    def save(self) -> None:
+        with self._lock:
+            payload = pickle.dumps((INDEX_VERSION, str(self.root), self._files), protocol=pickle.HIGHEST_PROTOCOL)
+            self._dirty = False
+
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_file, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            if self.logger:
+                self.logger.debug("Could not persist the symbol index of %s: %s", self.root, e)
+
+    # ---------------------------------------------------------------- building
+
+    def _walk(self) -> Iterator[Tuple[str, os.stat_result]]:
+        stack = [self.root]
+        while stack:
+            check_cancelled()
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS:
+                                stack.append(Path(entry.path))
+                        elif entry.name.endswith(".py") and entry.is_file():
+                            yield os.path.relpath(entry.path, self.root), entry.stat()
+            except OSError:
+                continue
+
+    def refresh(self) -> int:
+        """
+        Walks the directory once and reparses every file whose mtime or size changed since it was indexed.
+        Files that are not in the blob cache are parsed by a process pool if there are enough of them.
+        Returns the number of files that were (re)parsed or removed, `last_build` holds the timings.
+        """
+        start = time.perf_counter()
+        seen = set()
+
+        with self._lock:
+            stale = []
+            for rel, stat in self._walk():
+                seen.add(rel)
+                entry = self._files.get(rel)
+                if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                    stale.append((rel, stat))
+
+            removed = [rel for rel in self._files if rel not in seen]
+            for rel in removed:
+                self._remove_entry(rel)
+
+            to_parse = []
+            for rel, stat in stale:
+                entry = self._cached_entry(self.root / rel, stat, self._files.get(rel))
+                if entry is None:
+                    to_parse.append(rel)
+                else:
+                    self._set_entry(rel, entry)
+
+            workers = min(self.workers, max(1, len(to_parse) // PARALLEL_THRESHOLD))
+            for rel, mtime_ns, size, blob, symbols, error, imports, references in self._parse_files(to_parse, workers):
+                symbols = tuple(Symbol._make(symbol) for symbol in symbols)
+                references = tuple(Reference._make(reference) for reference in references)
+                if blob:
+                    self.blob_cache.put(blob, symbols, error, imports, references)
+                self._set_entry(rel, FileEntry(mtime_ns, size, blob, symbols, error, imports, references))
+
+            changed = len(stale) + len(removed)
+            if changed:
+                self._dirty = True
+                self.blob_cache.flush()
+            if self._dirty:
+                self.save()
+
+            self.last_build = BuildStats(len(seen), len(to_parse), len(stale) - len(to_parse), len(removed),
+                                         workers, time.perf_counter() - start)
+
+        if self.logger and changed:
+            self.logger.info("Refreshed symbol index of %s: %s", self.root, self.last_build)
+        self._notify()
+        return changed
+
+    def update_file(self, path: Path) -> bool:
+        """
+        Write-through update for a single file the agent just modified (or deleted).
+        Returns False if the file is not part of this index.
+        """
+        rel = self._relative(Path(path))
+        if rel is None or not rel.endswith(".py"):
+            return False
+
+        with self._lock:
+            # no mtime check here, a rewrite within the mtime granularity must not be missed
+            try:
+                stat = os.stat(self.root / rel)
+            except OSError:
+                self._remove_entry(rel)
+            else:
+                self._index_file(rel, stat)
+                self.blob_cache.flush()
+        self._notify()
+        return True
+
+    # ---------------------------------------------------------------- change notification
+
+    def add_listener(self, listener: Callable[[List[Path]], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[List[Path]], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self) -> None:
+        with self._lock:
+            if not self._events:
+                return
+            paths = [self.root / rel for rel in sorted(self._events)]
+            self._events = set()
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(paths)
+            except Exception as e:
+                if self.logger:
+                    self.logger.debug("Symbol index listener %s failed: %s", listener, e)
+
+    def start_watching(self, interval: float = 1.0) -> "IndexWatcher":
+        """
+        Starts a background thread that re-indexes files changed outside of the agent, e.g. by executed code or a human.
+        """
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = IndexWatcher(self, interval)
+                self._watcher.start()
+            return self._watcher
+
+    def stop_watching(self) -> None:
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.stop()
+
+    def _parse_files(self, rels: List[str], workers: int) -> List[tuple]:
+        if workers <= 1:
+            return _parse_chunk(str(self.root), rels, serialize=False)
+
+        # a few chunks per worker, so that one big file does not leave the other workers idle at the end
+        chunk_size = max(1, -(-len(rels) // (workers * 4)))
+        chunks = [rels[i:i + chunk_size] for i in range(0, len(rels), chunk_size)]
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as executor:
+            for payload in executor.map(_parse_chunk, [str(self.root)] * len(chunks), chunks):
+                results.extend(pickle.loads(payload))
+        return results
+
+    def _cached_entry(self, path: Path, stat: os.stat_result, previous: Optional[FileEntry] = None) -> Optional[FileEntry]:
+        """
+        Builds the entry of a file without parsing it, if its content is already known. Returns None otherwise.
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            return FileEntry(stat.st_mtime_ns, stat.st_size, "", (), str(e))
+
+        blob = git_blob_hash(data)
+        if previous is not None and previous.blob == blob:
+            # only the mtime changed, e.g. after a `git reset`
+            return previous._replace(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+        cached = self.blob_cache.get(blob)
+        if cached is None:
+            return None
+        return FileEntry(stat.st_mtime_ns, stat.st_size, blob, *cached)
+
+    def _parse_file(self, path: Path, stat: os.stat_result, previous: Optional[FileEntry] = None) -> FileEntry:
+        entry = self._cached_entry(path, stat, previous)
+        if entry is not None:
+            return entry
+
+        [(_, mtime_ns, size, blob, symbols, error, imports, references)] = _parse_chunk(str(path.parent), [path.name], serialize=False)
+        symbols = tuple(Symbol._make(symbol) for symbol in symbols)
+        references = tuple(Reference._make(reference) for reference in references)
+        if error is not None and self.logger:
+            self.logger.debug("Failed to parse %s: %s", path, error)
+        if blob:
+            self.blob_cache.put(blob, symbols, error, imports, references)
+        return FileEntry(mtime_ns, size, blob, symbols, error, imports, references)
+
+    def _index_file(self, rel: str, stat: os.stat_result) -> FileEntry:
+        entry = self._parse_file(self.root / rel, stat, self._files.get(rel))
+        self._set_entry(rel, entry)
+        self._dirty = True
+        return entry
+
+    def _set_entry(self, rel: str, entry: FileEntry) -> None:
+        if rel in self._files:
+            self._remove_entry(rel)
+
+        self._files[rel] = entry
+        self._events.add(rel)
+        for symbol in entry.symbols:
+            if symbol.kind == "class":
+                if symbol.name not in self._classes:
+                    self._class_fuzzy = None
+                self._classes.setdefault(symbol.name, []).append((rel, symbol))
+            elif symbol.kind == "method":
+                self._members.setdefault(symbol.class_name, []).append((rel, symbol))
+            else:
+                self._functions.setdefault(symbol.name, []).append((rel, symbol))
+        for reference in entry.references:
+            self._references.setdefault(reference.name, {}).setdefault(rel, []).append(reference)
+
+    def _remove_entry(self, rel: str) -> None:
+        entry = self._files.pop(rel, None)
+        if entry is None:
+            return
+        self._events.add(rel)
+
+        for symbol in entry.symbols:
+            if symbol.kind == "class":
+                table, key = self._classes, symbol.name
+            elif symbol.kind == "method":
+                table, key = self._members, symbol.class_name
+            else:
+                table, key = self._functions, symbol.name
+
+            self._discard(table, key, rel)
+            if table is self._classes and key not in table:
+                self._class_fuzzy = None
+        # names like `append` are used in most files, so the uses are grouped by file to make this cheap
+        for name in {reference.name for reference in entry.references}:
+            uses = self._references.get(name)
+            if uses is not None:
+                uses.pop(rel, None)
+                if not uses:
+                    del self._references[name]
+        self._dirty = True
+
+    @staticmethod
+    def _discard(table: Dict[str, list], key: str, rel: str) -> None:
+        remaining = [item for item in table.get(key, []) if item[0] != rel]
+        if remaining:
+            table[key] = remaining
+        else:
+            table.pop(key, None)
+
+    def _ensure_fresh(self, rel: str) -> bool:
+        """
+        Checks a single indexed file against the disk, returns True if the entry had to be updated.
+        """
+        try:
+            stat = os.stat(self.root / rel)
+        except OSError:
+            self._remove_entry(rel)
+            return True
+
+        entry = self._files.get(rel)
+        if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+            self._index_file(rel, stat)
+            self.blob_cache.flush()
+            return True
+        return False
+
+    # ---------------------------------------------------------------- queries
+
+    def _relative(self, path: Path) -> Optional[str]:
+        try:
+            rel = os.path.relpath(Path(path).resolve(), self.root)
+        except ValueError:
+            return None
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return None
+        return rel
+
+    def _prefix(self, within: Optional[Path]) -> Optional[str]:
+        if within is None:
+            return ""
+        prefix = self._relative(within)
+        if prefix is None:
+            return None
+        return "" if prefix == os.curdir else prefix + os.sep
+
+    def _lookup(self, table: Dict[str, List[Tuple[str, Symbol]]], key: str, within: Optional[Path]) -> List[Tuple[Path, Symbol]]:
+        prefix = self._prefix(within)
+        if prefix is None:
+            return []
+
+        with self._lock:
+            # Every hit is checked against the disk before it is returned, that way edits are never missed.
+            for _ in range(2):
+                hits = [(rel, symbol) for rel, symbol in table.get(key, []) if rel.startswith(prefix)]
+                stale = [rel for rel in {rel for rel, _ in hits} if self._ensure_fresh(rel)]
+                if not stale:
+                    break
+
+        self._notify()
+        return [(self.root / rel, symbol) for rel, symbol in sorted(hits, key=lambda item: (item[0], item[1].lineno))]
+
+    def find_classes(self, class_name: str, within: Optional[Path] = None) -> List[Tuple[Path, Symbol]]:
+        return self._lookup(self._classes, class_name, within)
+
+    def find_methods(self, class_name: str, method_name: Optional[str] = None, within: Optional[Path] = None) -> List[Tuple[Path, Symbol]]:
+        methods = self._lookup(self._members, class_name, within)
+        if method_name is None:
+            return methods
+        return [(path, symbol) for path, symbol in methods if symbol.name == method_name]
+
+    def find_functions(self, function_name: str, within: Optional[Path] = None) -> List[Tuple[Path, Symbol]]:
+        return self._lookup(self._functions, function_name, within)
+
+    def resolve(self, dotted_name: str, within: Optional[Path] = None) -> List[Tuple[Path, Symbol]]:
+        """
+        Returns the methods and top-level functions a dotted name refers to. The name may start with any tail of the
+        module path, so `pkg.mod.Class.method`, `mod.Class.method`, `Class.method`, `Outer.Inner.method` and
+        `function` all work.
+        """
+        parts = [part for part in dotted_name.strip().split(".") if part]
+        if not parts:
+            return []
+
+        candidates = self.find_functions(parts[-1], within)
+        if len(parts) > 1:
+            candidates += self.find_methods(parts[-2], parts[-1], within)
+
+        matches = []
+        for path, symbol in candidates:
+            module = os.path.relpath(path, self.root)[:-len(".py")].replace(os.sep, ".")
+            full_names = [f"{module}.{symbol.qualname}"]
+            if module.endswith("__init__"):
+                full_names.append(f"{module[:-len('.__init__')]}.{symbol.qualname}")
+            if any(name == ".".join(parts) or name.endswith("." + ".".join(parts)) for name in full_names):
+                matches.append((path, symbol))
+        return matches
+
+    def source(self, path: Path, symbol: Symbol) -> Optional[str]:
+        """
+        Reads the source of a symbol by its byte offsets, without reading or decoding the rest of the file.
+        Returns None if the file changed since it was indexed, the symbol has to be looked up again then.
+        """
+        rel = self._relative(path)
+        with self._lock:
+            entry = self._files.get(rel) if rel is not None else None
+        if entry is None or symbol.end <= symbol.start:
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_mtime_ns != entry.mtime_ns or stat.st_size != entry.size or symbol.end > stat.st_size:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    data = mapped[symbol.start:symbol.end]
+        except (OSError, ValueError):
+            return None
+        return "\n".join(data.decode("utf-8", errors="replace").splitlines())
+
+    def find_references(self, name: str, within: Optional[Path] = None) -> List[Tuple[Path, Reference]]:
+        """
+        Returns all uses of `name` (calls, attribute accesses, imports and plain uses), for `a.b` the uses of `b`.
+        """
+        prefix = self._prefix(within)
+        if prefix is None:
+            return []
+
+        name = name.split(".")[-1]
+        with self._lock:
+            for _ in range(2):
+                files = [rel for rel in self._references.get(name, {}) if rel.startswith(prefix)]
+                if not [rel for rel in files if self._ensure_fresh(rel)]:
+                    break
+            uses = self._references.get(name, {})
+            hits = [(self.root / rel, reference) for rel in sorted(uses) if rel.startswith(prefix) for reference in uses[rel]]
+
+        self._notify()
+        return hits
+
+    def suggest_class(self, class_name: str, within: Optional[Path] = None) -> Optional[str]:
+        """
+        Returns the class name that `class_name` is a near-miss of, if there is exactly one similar enough.
+        """
+        with self._lock:
+            if self._class_fuzzy is None:
+                self._class_fuzzy = FuzzyIndex(list(self._classes))
+            fuzzy = self._class_fuzzy
+
+        match = fuzzy.match(class_name)
+        if match is None or match.name == class_name or not self.find_classes(match.name, within):
+            return None
+        return match.name
+
+    def suggest_method(self, class_name: str, method_name: str, within: Optional[Path] = None) -> Optional[str]:
+        """
+        Returns the method of `class_name` that `method_name` is a near-miss of, if there is exactly one similar enough.
+        """
+        names = {symbol.name for _, symbol in self.find_methods(class_name, within=within)}
+        match = FuzzyIndex(names).match(method_name) if names else None
+        if match is None or match.name == method_name:
+            return None
+        return match.name
+
+    def file_entry(self, path: Path) -> FileEntry:
+        """
+        Returns the symbols of a single file, files that are not part of the index are parsed without being cached.
+        """
+        path = Path(path)
+        rel = self._relative(path)
+        if rel is None or not rel.endswith(".py"):
+            return self._parse_file(path, os.stat(path))
+
+        with self._lock:
+            self._ensure_fresh(rel)
+            entry = self._files.get(rel)
+        self._notify()
+
+        if entry is None:
+            raise FileNotFoundError(path)
+        return entry
+
+    def entries(self) -> List[Tuple[str, FileEntry]]:
+        """
+        Snapshot of all indexed files and their entries, with paths relative to the root.
+        """
+        with self._lock:
+            return sorted(self._files.items())
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+class IndexWatcher(threading.Thread):
+    """
+    Polls the files of an index and re-indexes the ones that changed.
+    Only the changed files are parsed again, so a poll of an unchanged checkout is a single walk over the directory.
+    """
+
+    def __init__(self, index: SymbolIndex, interval: float = 1.0) -> None:
+        super().__init__(name=f"IndexWatcher({index.root})", daemon=True)
+        self.index = index
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.index.refresh()
+            except Exception as e:
+                if self.index.logger:
+                    self.index.logger.debug("Watching %s failed: %s", self.index.root, e)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+_INDEXES: Dict[Path, SymbolIndex] = {}
+# indexes that are being built, the lock is only held to look them up, not while building
+_BUILDING: Dict[Path, "Future[SymbolIndex]"] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def find_index_root(cwd: Path) -> Path:
+    # Moving around inside of a checkout should not create a new index, so we use the root of the repository if possible.
+    for directory in [cwd, *cwd.parents]:
+        if (directory / ".git").exists():
+            return directory
+    return cwd
+
+
+def get_symbol_index(cwd: Path, logger=None, cache_dir: Optional[Path] = None, workers: Optional[int] = None) -> SymbolIndex:
+    """
+    Returns the symbol index covering `cwd`, the index is only built (or loaded from disk) the first time.
+    """
+    cwd = Path(cwd).resolve()
+
+    while True:
+        with _REGISTRY_LOCK:
+            for root, index in _INDEXES.items():
+                if root == cwd or root in cwd.parents:
+                    return index
+
+            root = find_index_root(cwd)
+            building = _BUILDING.get(root)
+            if building is None:
+                building = _BUILDING[root] = Future()
+                break
+
+        # another agent builds the same index, if its build fails (e.g. it was cancelled) the next one tries again
+        try:
+            return wait_for(building)
+        except Exception:
+            check_cancelled()
+
+    try:
+        index = SymbolIndex(root, cache_dir=cache_dir, logger=logger, workers=workers)
+        index.load()
+        index.refresh()
+    except BaseException as e:
+        with _REGISTRY_LOCK:
+            del _BUILDING[root]
+        building.set_exception(e)
+        raise
+
+    with _REGISTRY_LOCK:
+        # an index of a parent directory makes the ones of its subdirectories obsolete
+        for other in [other for other in _INDEXES if root in other.parents]:
+            _INDEXES.pop(other).stop_watching()
+        _INDEXES[root] = index
+        del _BUILDING[root]
+    building.set_result(index)
+    return index
+
+
+def find_symbol_index(cwd: Path) -> Optional[SymbolIndex]:
+    """
+    Returns the symbol index covering `cwd` if there already is one, without building it.
+    """
+    cwd = Path(cwd).resolve()
+    with _REGISTRY_LOCK:
+        for root, index in _INDEXES.items():
+            if root == cwd or root in cwd.parents:
+                return index
+    return None
+
+
+def refresh_symbol_index(cwd: Path) -> None:
+    """
+    Brings an already existing index up to date, e.g. after the checkout was reset to another commit.
+    """
+    cwd = Path(cwd).resolve()
+    with _REGISTRY_LOCK:
+        indexes = [index for root, index in _INDEXES.items() if root == cwd or root in cwd.parents or cwd in root.parents]
+    for index in indexes:
+        index.refresh()
@@ -1,6 +1,7 @@
 from enum import Enum
 from typing import Dict, List, Optional, Set
 
+from SmolCoder.src.fuzzy import DEFAULT_THRESHOLD, FuzzyIndex
 from SmolCoder.src.tools.tool import Tool
 
 class SearchMode(Enum):
@@ -8,8 +9,9 @@ class SearchMode(Enum):
     FUZZY = "fuzzy"
 
 class Toolkit:
-    def __init__(self, tools:List[Tool]) -> None:
+    def __init__(self, tools:List[Tool], fuzzy_threshold:float = DEFAULT_THRESHOLD) -> None:
         self._tools = self._construct_tools(tools)
+        self._fuzzy_index = FuzzyIndex(self._tools, threshold=fuzzy_threshold)
     
     def _construct_tools(self, tools:List[Tool]) -> Dict[str, Tool]:
         return {tool.name.lower(): tool for tool in tools}
@@ -20,7 +22,11 @@ class Toolkit:
         if mode == SearchMode.EXACT:
             return self._tools.get(normalized_query)
         elif mode == SearchMode.FUZZY:
-            raise NotImplementedError
+            tool = self._tools.get(normalized_query)
+            if tool is None:
+                match = self._fuzzy_index.match(normalized_query)
+                tool = self._tools[match.name] if match is not None else None
+            return tool
         else:
             return None
 
@@ -1,10 +1,29 @@
-import io
-import sys
-from typing import List
+import math
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
 
+from SmolCoder.src.fork_server import get_fork_server, top_level_packages
+from SmolCoder.src.sandbox import Limits, SandboxError, WorkerPool
+from SmolCoder.src.symbol_index import SymbolIndex, get_symbol_index
 from SmolCoder.src.tools.tool import Tool
 
 class ExecutePythonCode(Tool):
+    """
+    Runs the code in a pool of sandboxed worker processes, see `SmolCoder.src.sandbox`.
+    The pool is started with the first call and reused by all later ones, its workers are replaced when the symbol index
+    of the checkout sees a python file change, as they may have imported the old version.
+    With `fork_server` the code runs in a fork of a process that has the checkout already imported instead.
+    """
+
+    def __init__(self, workers: int = 2, limits: Limits = Limits(), preload: Sequence[str] = (), fork_server: bool = False) -> None:
+        self.workers = workers
+        self.fork_server = fork_server
+        self.limits = limits
+        self.preload = tuple(preload)
+        self._pool: Optional[WorkerPool] = None
+        self._lock = threading.Lock()
+        self._watched: Dict[Path, SymbolIndex] = {}
 
     @property
     def name(self) -> str:
@@ -22,24 +41,62 @@ class ExecutePythonCode(Tool):
     def example(self) -> str:
         return f'{self.name}[python_code]'
 
-    def __call__(self, input_variables: List[str]) -> str:
-        python_code = input_variables[0]
-        
-        # Create a new namespace for the code to be executed in
-        exec_namespace = {}
+    @property
+    def deadline(self) -> float:
+        # the sandbox enforces the limits itself and recycles the process
+        return math.inf
+
+    @property
+    def pool(self) -> WorkerPool:
+        with self._lock:
+            if self._pool is None:
+                self._pool = WorkerPool(self.workers, self.limits, self.preload)
+            return self._pool
 
-        # Capture the standard output
-        old_stdout = sys.stdout
-        new_stdout = io.StringIO()
-        sys.stdout = new_stdout
+    def __call__(self, input_variables: List[str], cwd: Path, logger=None) -> str:
+        python_code = input_variables[0]
 
         try:
-            exec(python_code, exec_namespace)
-        except Exception as e:
-            output = str(e)
-        else:
-            output = new_stdout.getvalue()
-        finally:
-            sys.stdout = old_stdout
-
-        return output if output else "No output found"
+            if self.fork_server:
+                result = get_fork_server(cwd, self.limits, logger).run(python_code, Path(cwd).resolve())
+            else:
+                symbol_index = self._watch(cwd, logger)
+                sys_path, _ = top_level_packages(symbol_index.root)
+                result = self.pool.run(python_code, Path(cwd).resolve(), sys_path=sys_path)
+        except SandboxError as e:
+            return f"Error: {e}"
+        if result.error and logger:
+            logger.debug("Execute_Code failed: %s", result.error)
+
+        parts = [result.output.rstrip("\n")] if result.output.strip() else []
+        if result.result is not None:
+            parts.append(f"__result__ = {result.result}")
+        if result.error:
+            parts.append(f"Error: {result.error}")
+        return "\n".join(parts) if parts else "No output found"
+
+    def _watch(self, cwd: Path, logger=None) -> SymbolIndex:
+        symbol_index = get_symbol_index(cwd, logger)
+        with self._lock:
+            known_index = self._watched.get(symbol_index.root)
+            if known_index is not symbol_index:
+                if known_index is not None:
+                    known_index.remove_listener(self._recycle)
+                symbol_index.add_listener(self._recycle)
+                self._watched[symbol_index.root] = symbol_index
+        return symbol_index
+
+    def _recycle(self, paths: List[Path]) -> None:
+        with self._lock:
+            pool = self._pool
+        if pool is not None:
+            pool.recycle(paths)
+
+    def close(self) -> None:
+        with self._lock:
+            for symbol_index in self._watched.values():
+                symbol_index.remove_listener(self._recycle)
+            self._watched.clear()
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
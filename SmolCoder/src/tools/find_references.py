@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+from typing import Dict, List
+
+from SmolCoder.src.pagination import continuation, paginate, parse_page
+from SmolCoder.src.symbol_index import get_symbol_index
+from SmolCoder.src.tools.tool import Tool
+
+class FindReferences(Tool):
+    def __init__(self, max_tokens: int = 800, max_line_length: int = 120) -> None:
+        """
+        Args:
+            max_tokens (int): budget of one page of references
+        """
+        self.max_tokens = max_tokens
+        self.max_line_length = max_line_length
+
+    @property
+    def name(self) -> str:
+        return "Find_References"
+
+    @property
+    def input_variables(self) -> List[str]:
+        return ["name", "page"]
+
+    @property
+    def desc(self) -> str:
+        return ("lists where `name` is called, accessed as an attribute or imported in the whole repository, as file:line. "
+                "Long lists are split into pages, `page` is optional and selects one.")
+
+    @property
+    def example(self) -> str:
+        return f"{self.name}[get_system_call_names] or {self.name}[get_system_call_names, page=2]"
+
+    @property
+    def read_only(self) -> bool:
+        return True
+
+    @property
+    def uses_symbol_index(self) -> bool:
+        return True
+
+    @property
+    def required_input_variables(self) -> List[str]:
+        return self.input_variables[:1]
+
+    def valid_params(self, input_variables) -> bool:
+        if len(input_variables) == 1:
+            return bool(input_variables[0].strip())
+        return len(input_variables) == 2 and bool(input_variables[0].strip()) and parse_page(input_variables[1]) is not None
+
+    def __call__(self, input_variables: List[str], cwd: Path, logger=None) -> str:
+        """
+        Looks the name up in the reference index, which is built together with the symbol index,
+        and reads every file with a reference once to show the lines.
+        """
+        name = input_variables[0].strip()
+        page = parse_page(input_variables[1]) if len(input_variables) > 1 else 1
+
+        # call sites outside of the current working directory break just as well, so the whole repository is searched
+        references = get_symbol_index(cwd, logger).find_references(name)
+        if not references:
+            return f"No references to `{name}` found."
+
+        lines: Dict[Path, List[str]] = {}
+        output = []
+        for path, reference in references:
+            if path not in lines:
+                try:
+                    with open(path, "r", encoding="utf-8", errors="replace") as f:
+                        lines[path] = f.read().splitlines()
+                except OSError:
+                    lines[path] = []
+
+            line = lines[path][reference.lineno - 1].strip() if reference.lineno <= len(lines[path]) else ""
+            if len(line) > self.max_line_length:
+                line = line[:self.max_line_length] + "..."
+            output.append(f"{os.path.relpath(path, Path(cwd).resolve())}:{reference.lineno}: ({reference.kind}) {line}")
+
+        output, pages = paginate(output, page, self.max_tokens)
+        if not output:
+            return f"There are only {pages} page(s) of references to `{name}`."
+        more = continuation(self.name, [name], page, pages)
+        header = f"References to `{name}` ({len(references)} in total):"
+        return "\n".join([header] + output + ([more] if more else []))
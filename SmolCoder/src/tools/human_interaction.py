@@ -1,9 +1,19 @@
-import sys
-from typing import List
+from typing import List, Optional
 
+from SmolCoder.src.human_channel import HumanChannel, default_channel
 from SmolCoder.src.tools.tool import Tool
 
 class HumanInteraction(Tool):
+    def __init__(self, channel: Optional[HumanChannel] = None, timeout: float = 600.0, fallback: Optional[str] = None) -> None:
+        """
+        Args:
+            channel (HumanChannel): where the questions go, see `default_channel` if None
+            timeout (float): seconds to wait for an answer
+            fallback (str): the observation if nobody answered in time
+        """
+        self.channel = channel if channel is not None else default_channel()
+        self.timeout = timeout
+        self.fallback = fallback
 
     @property
     def name(self) -> str:
@@ -21,11 +31,27 @@ class HumanInteraction(Tool):
     def example(self) -> str:
         return f'{self.name}[asking_for_help_message]'
 
+    @property
+    def deadline(self) -> float:
+        # the channel gives up after `timeout` and returns the fallback, this only catches channels that hang
+        return self.timeout + 10.0
+
     def __call__(self, input_variables: List[str], cwd, logger) -> str:
-        
+        if self.channel is None:
+            return self._fallback("No human is available to answer questions in this run.")
+
         try:
-            human_help = input(input_variables[0])
+            human_help = self.channel.ask(input_variables[0], self.timeout)
         except Exception as e:
             return f"an error has occured while trying to get help from the human: {str(e)}"
 
+        if human_help is None:
+            if logger:
+                logger.debug("No answer from the human within %ss", self.timeout)
+            return self._fallback(f"No human answered within {self.timeout:g} seconds.")
         return human_help
+
+    def _fallback(self, reason: str) -> str:
+        if self.fallback is not None:
+            return self.fallback
+        return f"{reason} Continue on your own with the information you have."
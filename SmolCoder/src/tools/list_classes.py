@@ -1,8 +1,8 @@
-import ast
 from pathlib import Path
 from typing import List
 import os 
 
+from SmolCoder.src.symbol_index import get_symbol_index
 from SmolCoder.src.tools.tool import Tool
 
 class ListClasses(Tool):
@@ -22,6 +22,14 @@ class ListClasses(Tool):
     def example(self):
         return f"{self.name}[test.py]"
 
+    @property
+    def read_only(self) -> bool:
+        return True
+
+    @property
+    def uses_symbol_index(self) -> bool:
+        return True
+
     def __call__(self, input_variables: List[str], cwd: Path, logger) -> str:
         file_name = input_variables[0]
         
@@ -40,20 +48,18 @@ class ListClasses(Tool):
             return f'The specified path is not a file: {file_path}'
         
         try:
-            with file_path.open('r', encoding='utf-8') as f:
-                file_content = f.read()
-            
-            tree = ast.parse(file_content)
-            class_entries = []
+            entry = get_symbol_index(cwd, logger).file_entry(file_path)
+            if entry.error is not None:
+                return f'An error occurred while processing the file: {entry.error}'
 
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    class_name = node.name
-                    docstring = ast.get_docstring(node)
+            class_entries = []
+            for symbol in entry.symbols:
+                if symbol.kind == "class":
+                    docstring = symbol.docstring
                     if not docstring:
                         docstring = "No docstring provided"
 
-                    class_entries.append((class_name, docstring))
+                    class_entries.append((symbol.name, docstring))
             
             if class_entries:
                 result = ", ".join([f"`{name}` with docstring `{doc}`" for name, doc in class_entries])
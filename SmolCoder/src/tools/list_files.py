@@ -1,29 +1,78 @@
 from pathlib import Path
-from typing import List
-import os 
+from typing import Dict, List, Optional
+from SmolCoder.src.file_tree import FileTree
+from SmolCoder.src.pagination import continuation, paginate, parse_page
 from SmolCoder.src.tools.tool import Tool
 
 class ListFiles(Tool):
+    def __init__(self, max_tokens: int = 500, depth: int = 2) -> None:
+        """
+        Args:
+            max_tokens (int): budget of one page of entries
+            depth (int): how many levels of subfolders are listed if the agent does not say otherwise
+        """
+        self.max_tokens = max_tokens
+        self.depth = depth
+
     @property
     def name(self) -> str:
         return "List_Files"
 
     @property
     def input_variables(self) -> List[str]:
-        return ["folder"]
+        return ["folder", "depth", "pattern", "page"]
 
     @property
     def desc(self) -> str:
-        return "lists all the files and subfolder that are in the current folder."
+        return (f"lists the files and subfolders of a folder as a tree, {self.depth} levels deep. Files ignored by git are left out. "
+                "`depth=N`, a glob `pattern=*.py` and `page=N` are optional, long lists are split into pages.")
     
     @property 
     def example(self):
-        return f"{self.name}[some_dir] or {self.name}[.] to list the files of the current directory"
+        return f"{self.name}[.] to list the current directory, {self.name}[src, depth=3, pattern=*.py] for the python files below `src`, {self.name}[., page=2] for the second page"
+
+    @property
+    def read_only(self) -> bool:
+        return True
+
+    @staticmethod
+    def _parse_options(arguments: List[str]) -> Optional[Dict[str, str]]:
+        """
+        `depth=N`, `pattern=GLOB` and `page=N`, a bare number is the page and any other bare argument the pattern.
+        None if an argument is invalid.
+        """
+        options = {}
+        for argument in arguments:
+            key, _, value = argument.strip().partition("=")
+            key = key.strip().lower()
+            if not value:
+                key, value = ("page", argument) if parse_page(argument) is not None else ("pattern", argument)
+            value = value.strip()
+            if key == "glob":
+                key = "pattern"
+            if key not in ("depth", "pattern", "page") or key in options or not value:
+                return None
+            if key == "depth" and not value.isdigit():
+                return None
+            if key == "page" and parse_page(value) is None:
+                return None
+            options[key] = value
+        return options
+
+    @property
+    def required_input_variables(self) -> List[str]:
+        return self.input_variables[:1]
+
+    def valid_params(self, input_variables) -> bool:
+        return 1 <= len(input_variables) <= 4 and self._parse_options(input_variables[1:]) is not None
 
     def __call__(self, input_variables: List[str], cwd: Path, logger=None) -> str:
+        options = self._parse_options(input_variables[1:]) or {}
+        page = parse_page(options.get("page", "1"))
+        depth = int(options.get("depth", self.depth))
+        pattern = options.get("pattern")
         try:
-            folder_path = Path(input_variables[0])
-            full_path = cwd if folder_path == "." else cwd / folder_path
+            full_path = (Path(cwd) / input_variables[0].strip()).resolve()
             
             if logger is not None: 
                 logger.debug("ListFiles with the path in: %s", full_path)
@@ -37,19 +86,20 @@ class ListFiles(Tool):
             return f'The specified path is not a folder: {full_path}'
         
         try:
-            entries = []
-            for entry in full_path.iterdir():
-                entry_suffix = '/' if entry.is_dir() else ''
-                entries.append(f"{entry.name}{entry_suffix}")
-            
-            # If the agent gives this tool as input something else as "." ignore it
-            # but give a message back
-            if input_variables[0] != ".":
-                output = f"The List_File tool got '{str(full_path)}' as input, but only takes '.' as input, the entries of the current working directory are: \n"
-            else:
-                output = f"The entries of the current working directory `{str(full_path)}` are:\n"
-
-            return output + "\n".join(entries)
+            lines = FileTree(full_path, depth=depth, pattern=pattern).render()
+            if not lines:
+                if pattern is not None:
+                    return f"No files in `{str(full_path)}` match `{pattern}`."
+                return f"The folder `{str(full_path)}` is empty."
+
+            lines, pages = paginate(lines, page, self.max_tokens)
+            if not lines:
+                return f"The entries of `{str(full_path)}` fit on {pages} page(s)."
+
+            arguments = [input_variables[0]] + [f"{key}={options[key]}" for key in ("depth", "pattern") if key in options]
+            more = continuation(self.name, arguments, page, pages)
+            output = f"The entries of `{str(full_path)}` are:\n"
+            return output + "\n".join(lines) + (f"\n{more}" if more else "")
 
         except PermissionError:
             return f'Permission denied: Unable to access the folder: {full_path}'
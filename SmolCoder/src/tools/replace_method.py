@@ -1,23 +1,25 @@
 import os
-import ast
 from pathlib import Path
-from typing import List
+from typing import List, Tuple, Union
 
+from SmolCoder.src.lint import LintIssue, lint_replacement
+from SmolCoder.src.source_edit import EditError, MethodEdit, defined_functions, prepare_edits, write_edits
+from SmolCoder.src.symbol_index import SymbolIndex, get_symbol_index
 from SmolCoder.src.tools.tool import Tool
 
 class ReplaceMethod(Tool):
     @property
     def name(self) -> str:
         return "Replace_Method"
-    
-    @property 
+
+    @property
     def example(self):
         new_method = """
 def do_stuff():
     test = 5 + 3
 
     print("test: " + str(test))
-    
+
     return test
 """
         return f"{self.name}[do_stuff, {new_method}]"
@@ -30,40 +32,118 @@ def do_stuff():
     def desc(self) -> str:
         return "replaces the specified method `method_name` in the `class_name` with `new_method`."
 
+    @property
+    def transactional(self) -> bool:
+        # a step that replaces several methods must not leave the files half edited if one of them is rejected
+        return True
+
     def __call__(self, input_variables:List[str], cwd:Path, logger) -> str:
         class_name, method_name, new_method = input_variables[0], input_variables[1], input_variables[2]
-        # TODO: Enable this when implemented
-        # assert(self._lint(new_method))
-        for filename in os.listdir(cwd):
-            full_path = os.path.join(cwd, filename)
+        return self.replace_many([(class_name, method_name, new_method)], cwd, logger)
+
+    def call_many(self, input_variables_list: List[List[str]], cwd: Path, logger) -> str:
+        return self.replace_many([tuple(input_variables) for input_variables in input_variables_list], cwd, logger)
+
+    def replace_many(self, replacements: List[Tuple[str, str, str]], cwd: Path, logger=None) -> str:
+        """
+        Replaces several methods, possibly in different files, as one transaction:
+        either all of them are replaced or none is, and every file is written only once.
+
+        Parameters:
+        replacements: (class_name, method_name, new_method) for every method to replace.
+        cwd (str): The classes are looked up in all python files below this directory.
+        """
+        index = get_symbol_index(cwd, logger)
+        cwd = Path(cwd).resolve()
+
+        edits, notes = [], []
+        for class_name, method_name, new_method in replacements:
+            resolved = self._resolve(index, class_name, method_name, cwd)
+            if isinstance(resolved, str):
+                return resolved
+            edit, note = resolved
+            edits.append(edit._replace(new_method=new_method))
+            if note:
+                notes.append(note)
 
+        try:
+            originals, contents = prepare_edits(edits)
+            warnings = []
+            for edit in edits:
+                issues = self._lint(edit, contents[Path(edit.path)])
+                errors = [str(issue) for issue in issues if issue.severity == "error"]
+                if errors:
+                    raise EditError(f"The new method '{edit.method_name}' of class '{edit.class_name}' was rejected. " + " ".join(errors))
+                warnings.extend(f"({issue} in '{edit.method_name}'.)" for issue in issues)
+            written = write_edits(originals, contents)
+        except EditError as e:
             if logger:
-                logger.debug("ReplaceMethod opening the file %s", full_path)
-
-            if os.path.isfile(full_path) and full_path.endswith(".py"):
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    try:
-                        tree = ast.parse(content, filename)
-                        for node in tree.body:
-                            if isinstance(node, ast.ClassDef) and node.name == class_name:
-                                for class_node in node.body:
-                                    if isinstance(class_node, ast.FunctionDef) and class_node.name == method_name:
-
-                                        if logger:
-                                            logger.debug("Found the to be replaced method.")
-
-                                        # Remove the existing method
-                                        node.body.remove(class_node)
-                                        # Add the new method
-                                        node.body.extend(ast.parse(new_method).body)
-                                        modified_code = ast.unparse(tree)
-                                        with open(full_path, 'w', encoding='utf-8') as f:
-                                            f.write(modified_code)
-                                        return f"Method '{method_name}' in class '{class_name}' replaced successfully in file '{filename}'."
-                    except SyntaxError as e:
-                        return f"Error parsing file '{filename}': {e}"
-        return f"Error: Class '{class_name}' not found in any Python files in the directory '{cwd}'."
-
-    def _lint(self, method:str) -> str:
-        raise NotImplementedError
+                logger.debug("ReplaceMethod failed: %s", e)
+            return f"Error: {e}" + (" No method was replaced." if len(edits) > 1 else "")
+
+        # write-through, so that the other tools see the new methods right away
+        for path in written:
+            index.update_file(path)
+
+        results = [f"Method '{edit.method_name}' in class '{edit.class_name}' replaced successfully in file '{os.path.relpath(edit.path, cwd)}'."
+                   for edit in edits]
+        return " ".join(notes + results + warnings)
+
+    def _resolve(self, index: SymbolIndex, class_name: str, method_name: str, cwd: Path) -> Union[Tuple[MethodEdit, str], str]:
+        """
+        Finds the file and qualified name of the class that defines the method, in any subdirectory of `cwd`.
+        Returns an error message if there is no such class or more than one.
+        """
+        note = ""
+        classes = self._find_classes(index, class_name, cwd)
+        if not classes:
+            corrected = index.suggest_class(class_name, within=cwd)
+            if corrected is None:
+                return f"Error: Class '{class_name}' not found in any Python files in the directory '{cwd}'."
+            note = f"(There is no class `{class_name}`, used `{corrected}` instead.)"
+            class_name = corrected
+            classes = self._find_classes(index, class_name, cwd)
+
+        candidates = self._with_method(index, classes, method_name, cwd)
+        if not candidates:
+            corrected = index.suggest_method(class_name.split(".")[-1], method_name, within=cwd)
+            if corrected is not None:
+                note += f"(There is no method `{method_name}`, replaced `{corrected}` instead.)"
+                method_name = corrected
+                candidates = self._with_method(index, classes, method_name, cwd)
+        if not candidates:
+            return f"Error: Method '{method_name}' not found in class '{class_name}' in the directory '{cwd}'."
+
+        # a class in the current working directory itself wins over ones in its subdirectories
+        if len(candidates) > 1:
+            candidates = [candidate for candidate in candidates if candidate[0].parent == cwd] or candidates
+        if len(candidates) > 1:
+            locations = ", ".join(f"`{qualname}` in '{os.path.relpath(path, cwd)}'" for path, qualname in candidates)
+            return f"Error: The method '{method_name}' is defined in several classes named '{class_name}': {locations}. Use Move_to_Folder to select one."
+
+        [(path, qualname)] = candidates
+        return MethodEdit(path, qualname, method_name, ""), note
+
+    @staticmethod
+    def _find_classes(index: SymbolIndex, class_name: str, cwd: Path) -> List[Tuple[Path, str]]:
+        # `Inner` finds `Outer.Inner` as well, `Outer.Inner` only that one
+        classes = index.find_classes(class_name.split(".")[-1], within=cwd)
+        return list(dict.fromkeys((path, symbol.qualname) for path, symbol in classes
+                                  if symbol.qualname == class_name or symbol.qualname.endswith("." + class_name)))
+
+    @staticmethod
+    def _with_method(index: SymbolIndex, classes: List[Tuple[Path, str]], method_name: str, cwd: Path) -> List[Tuple[Path, str]]:
+        candidates = []
+        for path, qualname in classes:
+            methods = index.find_methods(qualname.split(".")[-1], method_name, within=cwd)
+            if any(method_path == path and symbol.qualname == f"{qualname}.{method_name}" for method_path, symbol in methods):
+                candidates.append((path, qualname))
+        return candidates
+
+    @staticmethod
+    def _lint(edit: MethodEdit, content: bytes) -> List[LintIssue]:
+        """
+        Checks the edited file before it is written: it has to compile, the new method must still belong to the class
+        and must not use undefined names. Unused imports are only warnings.
+        """
+        return lint_replacement(content, edit.class_name, defined_functions(edit.new_method), Path(edit.path).name)
@@ -0,0 +1,92 @@
+import math
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from SmolCoder.src.impact_analysis import get_impact_index, modified_files, run_tests
+from SmolCoder.src.tools.tool import Tool
+
+class RunTests(Tool):
+    def __init__(self, python: str = sys.executable, timeout: float = 120.0, workers: Optional[int] = None,
+                 max_failures: int = 10, max_line_length: int = 200) -> None:
+        """
+        Args:
+            python (str): interpreter the tests are run with, it needs pytest and the dependencies of the repository
+            timeout (float): seconds after which a shard of the tests is killed
+            workers (int): number of parallel pytest processes, by default one per CPU
+        """
+        self.python = python
+        self.timeout = timeout
+        self.workers = workers
+        self.max_failures = max_failures
+        self.max_line_length = max_line_length
+
+    @property
+    def name(self) -> str:
+        return "Run_Tests"
+
+    @property
+    def input_variables(self) -> List[str]:
+        return ["files"]
+
+    @property
+    def deadline(self) -> float:
+        # every shard is killed after `timeout` already
+        return math.inf
+
+    @property
+    def desc(self) -> str:
+        return ("runs only the tests that import the python files you modified and returns how many passed and failed. "
+                "`files` is optional, give it to check other files than the modified ones.")
+
+    @property
+    def example(self) -> str:
+        return f"{self.name}[] or {self.name}[src/module.py, src/other.py]"
+
+    @property
+    def read_only(self) -> bool:
+        # the tests are arbitrary code that can write files, caches or databases, so they neither run next to
+        # other actions nor are prefetched
+        return False
+
+    @property
+    def memoizable(self) -> bool:
+        # the tests may depend on more than the python files, e.g. data files or the environment
+        return False
+
+    def valid_params(self, input_variables) -> bool:
+        return all(variable.strip() for variable in input_variables)
+
+    def invalid_params_message(self, input_variables: List[str]) -> str:
+        # any number of files is fine, only empty ones are not
+        return f"The file names must not be empty, got {input_variables}. Use it like this: {self.example}"
+
+    def __call__(self, input_variables: List[str], cwd: Path, logger=None) -> str:
+        index = get_impact_index(cwd, logger)
+        root = index.symbol_index.root
+
+        if input_variables:
+            changed = [os.path.relpath((Path(cwd) / variable.strip()).resolve(), root) for variable in input_variables]
+        else:
+            changed = modified_files(root)
+            if not changed:
+                return "No modified python files found. Give the files whose tests should run, e.g. Run_Tests[src/module.py]."
+
+        tests = index.affected_tests(changed)
+        if not tests:
+            return f"No tests import {', '.join(changed)}."
+
+        if logger:
+            logger.info("Running %d test files affected by %s", len(tests), changed)
+        report = run_tests(root, tests, python=self.python, timeout=self.timeout, workers=self.workers)
+
+        counts = ", ".join(f"{count} {outcome}" for outcome, count in report.counts.items()) or "no tests collected"
+        output = [f"Ran {len(tests)} test file(s) affected by {', '.join(changed)} in {report.seconds:.1f}s: {counts}."]
+        for line in report.failures[:self.max_failures]:
+            output.append(line if len(line) <= self.max_line_length else line[:self.max_line_length] + "...")
+        if len(report.failures) > self.max_failures:
+            output.append(f"... and {len(report.failures) - self.max_failures} more failures.")
+        if report.timed_out:
+            output.append(f"Timed out after {self.timeout:.0f}s: {', '.join(report.timed_out)}")
+        return "\n".join(output)
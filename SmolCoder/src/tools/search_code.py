@@ -0,0 +1,69 @@
+import os
+import re
+from pathlib import Path
+from typing import List
+
+from SmolCoder.src.trigram_index import MAX_MATCHES, get_trigram_index
+from SmolCoder.src.tools.tool import Tool
+
+class SearchCode(Tool):
+    def __init__(self, max_results: int = 20, max_line_length: int = 160) -> None:
+        self.max_results = max_results
+        self.max_line_length = max_line_length
+
+    @property
+    def name(self) -> str:
+        return "Search_Code"
+
+    @property
+    def input_variables(self) -> List[str]:
+        return ["query"]
+
+    @property
+    def desc(self) -> str:
+        return ("searches all files in the current working directory for the text `query` and returns the matching lines as file:line. "
+                "Wrap the query in slashes to search for a regular expression. The search ignores case if the query is lowercase.")
+
+    @property
+    def example(self) -> str:
+        return f"{self.name}[def get_system_call_names] or {self.name}[/class \\w+Error/]"
+
+    @property
+    def read_only(self) -> bool:
+        return True
+
+    def valid_params(self, input_variables) -> bool:
+        return len(input_variables) == 1 and bool(input_variables[0].strip())
+
+    def __call__(self, input_variables: List[str], cwd: Path, logger=None) -> str:
+        query = input_variables[0].strip()
+        regex = len(query) > 2 and query.startswith("/") and query.endswith("/")
+        if regex:
+            query = query[1:-1]
+
+        index = get_trigram_index(cwd, logger)
+        try:
+            hits, total = index.search(query, regex=regex, within=cwd, max_results=self.max_results)
+        except re.error as e:
+            return f"The regular expression `{query}` is invalid: {e}"
+
+        if logger:
+            logger.debug("Search_Code for %s found %d matches", query, total)
+
+        if not hits:
+            return f"No matches found for `{query}` in `{cwd}`."
+
+        lines = []
+        for hit in hits:
+            line = hit.line
+            if len(line) > self.max_line_length:
+                line = line[:self.max_line_length] + "..."
+            lines.append(f"{os.path.relpath(hit.path, Path(cwd).resolve())}:{hit.lineno}: {line}")
+
+        if total >= MAX_MATCHES:
+            header = f"Found more than {MAX_MATCHES} matches for `{query}`, showing {len(hits)} of them. Use a more specific query.\n"
+        elif total > len(hits):
+            header = f"Found {total} matches for `{query}`, showing the {len(hits)} most relevant:\n"
+        else:
+            header = f"Found {total} matches for `{query}`:\n"
+        return header + "\n".join(lines)
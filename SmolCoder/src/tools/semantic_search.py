@@ -0,0 +1,52 @@
+from pathlib import Path
+from typing import List
+
+from SmolCoder.src.embeddings import format_symbol_hits, get_semantic_index
+from SmolCoder.src.tools.tool import Tool
+
+class SemanticSearch(Tool):
+    def __init__(self, k: int = 10, embedder=None) -> None:
+        self.k = k
+        self.embedder = embedder
+
+    @property
+    def name(self) -> str:
+        return "Semantic_Search"
+
+    @property
+    def input_variables(self) -> List[str]:
+        return ["query"]
+
+    @property
+    def desc(self) -> str:
+        return ("describes in natural language what you are looking for and returns the classes, methods and functions "
+                "in the current working directory whose code is the most similar to the description.")
+
+    @property
+    def example(self) -> str:
+        return f"{self.name}[the code that parses the command line arguments]"
+
+    @property
+    def read_only(self) -> bool:
+        return True
+
+    @property
+    def uses_symbol_index(self) -> bool:
+        return True
+
+    def valid_params(self, input_variables) -> bool:
+        return len(input_variables) == 1 and bool(input_variables[0].strip())
+
+    def __call__(self, input_variables: List[str], cwd: Path, logger=None) -> str:
+        query = input_variables[0].strip()
+        try:
+            hits = get_semantic_index(cwd, embedder=self.embedder, logger=logger).search(query, k=self.k * 2)
+        except ValueError as e:
+            return f"The semantic search is not available: {e}"
+
+        # the index covers the whole repository, only show what is below the current working directory
+        cwd = Path(cwd).resolve()
+        hits = [hit for hit in hits if cwd == hit.path.parent or cwd in hit.path.parents][:self.k]
+        if not hits:
+            return f"No code found for `{query}` in `{cwd}`."
+        return f"The code most similar to `{query}`:\n" + format_symbol_hits(hits, cwd)
@@ -1,12 +1,7 @@
-import ast
-import os
 from pathlib import Path
 from typing import List
-import inspect 
-import importlib 
-import sys 
-import textwrap
 
+from SmolCoder.src.symbol_index import get_symbol_index
 from SmolCoder.src.tools.tool import Tool
 
 class ShowMethodBody(Tool):
@@ -20,38 +15,73 @@ class ShowMethodBody(Tool):
     
     @property 
     def example(self):
-        return f'{self.name}[class_name, method_name]'
+        return f'{self.name}[class_name, method_name], {self.name}[package.module.Class.method] or {self.name}[function_name]'
+
+    @property
+    def read_only(self) -> bool:
+        return True
+
+    @property
+    def uses_symbol_index(self) -> bool:
+        return True
 
     @property
     def desc(self) -> str:
-        return "returns a formatted String of the method body from the specified class and method name in `class_name` and `method_name`."
+        return ("returns a formatted String of the method body from the specified class and method name in `class_name` and `method_name`. "
+                "A single dotted path to a method or the name of a top-level function works as well.")
+
+    @property
+    def required_input_variables(self) -> List[str]:
+        return self.input_variables[:1]
+
+    def valid_params(self, input_variables) -> bool:
+        return len(input_variables) in (1, 2)
 
     def __call__(self, input_variables: List[str], cwd: Path, logger) -> str:
-        class_name, method_name = input_variables[0], input_variables[1]
-        for root, _, files in os.walk(cwd):
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        try:
-                            file_content = f.read()
-                            tree = ast.parse(file_content, filename=file_path)
-                            
-                            for node in ast.walk(tree):
-                                if isinstance(node, ast.ClassDef) and node.name == class_name:
-                                    if logger:
-                                        logger.log(f"Found the correct class {class_name} in the file {file_path}")
-                                    
-                                    for class_node in node.body:
-                                        if isinstance(class_node, ast.FunctionDef) and class_node.name == method_name:
-                                            if logger:
-                                                logger.log(f"Found the correct method {method_name} in the class {class_name}")
-                                            
-                                            # Retrieve the source code of the method
-                                            method_source_lines = file_content.splitlines()[class_node.lineno-1:class_node.end_lineno]
-                                            method_source = '\n'.join(method_source_lines)
-                                            return f"```\n{method_source.strip()}\n```"
-                        except Exception as e:
-                            print(f"Failed to parse {file_path}: {e}")
+        if len(input_variables) == 2:
+            class_name, method_name = input_variables[0].strip(), input_variables[1].strip()
+            dotted_name = f"{class_name}.{method_name}"
+        else:
+            dotted_name = input_variables[0].strip()
+            class_name, _, method_name = dotted_name.rpartition(".")
+        index = get_symbol_index(cwd, logger)
+
+        note = ""
+        if not index.resolve(dotted_name, within=cwd) and class_name:
+            corrected_class, corrected_method, note = self._correct(index, class_name.split(".")[-1], method_name, cwd)
+            if note:
+                dotted_name = f"{corrected_class}.{corrected_method}"
+
+        # The offsets of a symbol are only valid for the content it was indexed from. If the file changes in between,
+        # the second lookup gets the new offsets.
+        for _ in range(2):
+            for file_path, symbol in index.resolve(dotted_name, within=cwd):
+                if logger:
+                    logger.debug(f"Found `{dotted_name}` in the file {file_path}")
+
+                method_source = index.source(file_path, symbol)
+                if method_source is None:
+                    if logger:
+                        logger.debug(f"{file_path} changed since it was indexed")
+                    continue
+                return f"{note}```\n{method_source.strip()}\n```"
         
-        return f"Class {class_name} with method {method_name} not found in any module in {cwd}"
+        if len(input_variables) == 2:
+            return f"Class {class_name} with method {method_name} not found in any module in {cwd}"
+        return f"No method or function `{dotted_name}` found in any module in {cwd}"
+
+    @staticmethod
+    def _correct(index, class_name: str, method_name: str, cwd: Path):
+        """
+        Resolves near-misses of the class and method name, returns the names to use and a note for the agent.
+        """
+        corrected_class = class_name
+        if not index.find_classes(class_name, within=cwd):
+            corrected_class = index.suggest_class(class_name, within=cwd) or class_name
+        corrected_method = method_name
+        if not index.find_methods(corrected_class, method_name, within=cwd):
+            corrected_method = index.suggest_method(corrected_class, method_name, within=cwd) or method_name
+
+        if (corrected_class, corrected_method) == (class_name, method_name):
+            return class_name, method_name, ""
+        return corrected_class, corrected_method, f"(Showing `{corrected_class}.{corrected_method}`, as there is no `{class_name}.{method_name}`.)\n"
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, List
+from typing import Any, List, Optional
 
 class Tool(ABC):
     @property
@@ -22,15 +22,58 @@ class Tool(ABC):
     def example(self) -> str:
         pass
     
+    @property
+    def deadline(self) -> Optional[float]:
+        # seconds the agent waits for the tool, None for the default of the AgentComputerInterface, math.inf for no limit
+        return None
+
+    @property
+    def read_only(self) -> bool:
+        # tools that change neither files nor the state of the agent can run concurrently within one step
+        return False
+
+    @property
+    def memoizable(self) -> bool:
+        # the observation only depends on the arguments and the files, so it can be reused until a file changes
+        return self.read_only
+
+    @property
+    def uses_symbol_index(self) -> bool:
+        # the tool builds the symbol index of the checkout anyway, other tools should not make it build one
+        return False
+
+    @property
+    def transactional(self) -> bool:
+        # several calls of one step have to succeed or fail together, they are made with `call_many`
+        return False
+
+    def call_many(self, input_variables_list: List[List[str]], cwd, logger) -> str:
+        """One observation for all calls, only used for transactional tools."""
+        raise NotImplementedError
+
     @property
     def short_desc(self) -> str:
         return f'{self.name}[{",".join(self.input_variables)}]'
     
+    @property
+    def required_input_variables(self) -> List[str]:
+        # the leading input variables that have to be given, the ones after them are optional
+        return self.input_variables
+
     def valid_params(self, input_variables) -> bool:
         return len(self.input_variables) == len(input_variables)
 
     def number_of_input_variables(self) -> int:
         return len(self.input_variables)
+
+    def invalid_params_message(self, input_variables: List[str]) -> str:
+        """The observation for parameters that `valid_params` rejected."""
+        required, expected = len(self.required_input_variables), self.number_of_input_variables()
+        if required <= len(input_variables) <= expected:
+            return f"The parameters {input_variables} are not valid for the tool {self.name}. Use it like this: {self.example}"
+        count = str(expected) if required == expected else f"{required} to {expected}"
+        return (f"The tool expected {count} parameters, but got {len(input_variables)}.\n"
+                f"The parameters that the tool {self.name} needs are {self.input_variables}")
     
     @abstractmethod
     def __call__(self, input_variables:List[str], *args: Any, **kwds: Any) -> str:
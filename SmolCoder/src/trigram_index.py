@@ -0,0 +1,452 @@
+# Trigram Index
+# Inverted index from every three-character sequence to the files containing it.
+# A search only scans the few files that contain all trigrams of the query, instead of every file of the repository.
+# The index is kept up to date by the change events of the symbol index, which sees the edits of the tools and, if it
+# is watching, external changes of python files. The files a search looks at are always checked against the disk.
+
+import os
+import re
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from SmolCoder.src.cancellation import check_cancelled, wait_for
+from SmolCoder.src.symbol_index import SKIP_DIRS, SymbolIndex, find_index_root, find_symbol_index
+
+MAX_FILE_SIZE = 1024 * 1024
+# A search stops after this many matching lines, queries like `.*` would otherwise scan the whole repository.
+MAX_MATCHES = 1000
+
+_DEFINITION = re.compile(r"^\s*(async\s+def|def|class)\s")
+
+
+class SearchHit(NamedTuple):
+    path: Path
+    lineno: int
+    line: str
+
+
+def trigrams(text: str) -> Set[str]:
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+
+def required_literals(pattern: str) -> List[str]:
+    """
+    Returns substrings that every match of the regular expression must contain.
+    This is conservative: an empty list means the search has to scan all files.
+    """
+    # alternation on the top level means none of the literals is required
+    if _has_top_level_alternation(pattern):
+        return []
+
+    literals = []
+    current = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            escaped = pattern[i + 1:i + 2]
+            i += 2
+            if not escaped or escaped.isalnum():
+                # character classes like \w and back references
+                literals.append(current)
+                current = ""
+                continue
+            atom = escaped
+        elif char in "[(":
+            i = _skip_group(pattern, i)
+            literals.append(current)
+            current = ""
+            continue
+        elif char in ".^$*+?":
+            i += 1
+            literals.append(current)
+            current = ""
+            continue
+        elif char == "{":
+            i = pattern.find("}", i) + 1 or len(pattern)
+            literals.append(current)
+            current = ""
+            continue
+        else:
+            atom = char
+            i += 1
+
+        following = pattern[i:i + 1]
+        if following in ("*", "?", "{"):
+            # the atom is optional
+            literals.append(current)
+            current = ""
+        elif following == "+":
+            literals.append(current + atom)
+            current = ""
+        else:
+            current += atom
+
+    literals.append(current)
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def _skip_group(pattern: str, i: int) -> int:
+    """
+    Returns the position after the character class or (nested) group starting at `i`.
+    """
+    if pattern[i] == "[":
+        i += 1
+        if pattern[i:i + 1] == "]":
+            i += 1
+        while i < len(pattern) and pattern[i] != "]":
+            i += 2 if pattern[i] == "\\" else 1
+        return i + 1
+
+    depth = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            i = _skip_group(pattern, i)
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+class TrigramIndex:
+    """
+    Keeps the content of every text file below `root` in memory, together with a trigram -> files mapping.
+    """
+
+    def __init__(self, root: Path, logger=None) -> None:
+        self.root = Path(root).resolve()
+        self.logger = logger
+
+        self._files: Dict[str, Tuple[int, int, int]] = {}   # path -> (mtime_ns, size, file id)
+        self._paths: Dict[int, str] = {}                     # file id -> path
+        self._contents: Dict[int, str] = {}
+        self._lowered: Dict[int, str] = {}                   # for case-insensitive scans
+        self._postings: Dict[str, Set[int]] = {}
+        self._next_id = 0
+        self._symbol_index: Optional[SymbolIndex] = None
+        self._lock = threading.RLock()
+
+    def _walk(self):
+        stack = [self.root]
+        while stack:
+            check_cancelled()
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS:
+                                stack.append(Path(entry.path))
+                        elif entry.is_file(follow_symlinks=False):
+                            yield os.path.relpath(entry.path, self.root), entry.stat()
+            except OSError:
+                continue
+
+    def refresh(self) -> int:
+        """
+        Re-indexes all files whose mtime or size changed, returns the number of changed files.
+        """
+        changed = 0
+        with self._lock:
+            seen = set()
+            for rel, stat in self._walk():
+                seen.add(rel)
+                known = self._files.get(rel)
+                if known is None or known[0] != stat.st_mtime_ns or known[1] != stat.st_size:
+                    self._index_file(rel, stat)
+                    changed += 1
+
+            for rel in [rel for rel in self._files if rel not in seen]:
+                self._remove_file(rel)
+                changed += 1
+
+        if self.logger and changed:
+            self.logger.debug("Refreshed trigram index of %s: %d files changed", self.root, changed)
+        return changed
+
+    def _index_file(self, rel: str, stat: os.stat_result) -> None:
+        self._remove_file(rel)
+
+        content = None
+        if stat.st_size <= MAX_FILE_SIZE:
+            try:
+                with open(self.root / rel, "rb") as f:
+                    data = f.read()
+                if b"\0" not in data[:8192]:
+                    content = data.decode("utf-8", errors="replace")
+            except OSError:
+                pass
+
+        # binary and huge files are remembered, so that they are not read again on every refresh
+        file_id = self._next_id
+        self._next_id += 1
+        self._files[rel] = (stat.st_mtime_ns, stat.st_size, file_id)
+        self._paths[file_id] = rel
+        if content is None:
+            return
+
+        self._contents[file_id] = content
+        self._lowered[file_id] = content.lower()
+        for trigram in trigrams(self._lowered[file_id]):
+            self._postings.setdefault(trigram, set()).add(file_id)
+
+    def _remove_file(self, rel: str) -> None:
+        known = self._files.pop(rel, None)
+        if known is None:
+            return
+
+        file_id = known[2]
+        del self._paths[file_id]
+        self._contents.pop(file_id, None)
+        lowered = self._lowered.pop(file_id, None)
+        if lowered is None:
+            return
+
+        for trigram in trigrams(lowered):
+            posting = self._postings.get(trigram)
+            if posting is not None:
+                posting.discard(file_id)
+                if not posting:
+                    del self._postings[trigram]
+
+    def _ensure_fresh(self, rel: str) -> None:
+        try:
+            stat = os.stat(self.root / rel)
+        except OSError:
+            self._remove_file(rel)
+            return
+
+        known = self._files.get(rel)
+        if known is None or known[0] != stat.st_mtime_ns or known[1] != stat.st_size:
+            self._index_file(rel, stat)
+
+    def update_files(self, paths: List[Path]) -> None:
+        """
+        Re-indexes the given files, adds new ones and drops removed ones. Listens to the symbol index.
+        """
+        with self._lock:
+            for path in paths:
+                rel = os.path.relpath(path, self.root)
+                if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+                    continue
+                # like the symbol index without a mtime check, a rewrite within the mtime granularity must not be missed
+                try:
+                    self._index_file(rel, os.stat(self.root / rel))
+                except OSError:
+                    self._remove_file(rel)
+
+    def _watch(self) -> None:
+        # the symbol index may only be built after this index, e.g. by the first `Show_Method_Body`
+        if self._symbol_index is not None:
+            return
+        symbol_index = find_symbol_index(self.root)
+        if symbol_index is None:
+            return
+        with self._lock:
+            if self._symbol_index is not None:
+                return
+            self._symbol_index = symbol_index
+        symbol_index.add_listener(self.update_files)
+
+    def stop_watching(self) -> None:
+        with self._lock:
+            symbol_index, self._symbol_index = self._symbol_index, None
+        if symbol_index is not None:
+            symbol_index.remove_listener(self.update_files)
+
+    def _candidates(self, literals: List[str]) -> Set[int]:
+        postings = []
+        for literal in literals:
+            for trigram in trigrams(literal.lower()):
+                posting = self._postings.get(trigram)
+                if posting is None:
+                    return set()
+                postings.append(posting)
+
+        if not postings:
+            return set(self._contents)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, query: str, regex: bool = False, within: Optional[Path] = None,
+               max_results: int = 20, max_per_file: int = 5) -> Tuple[List[SearchHit], int]:
+        """
+        Searches all indexed files below `within` for `query`.
+        The search is case-insensitive if the query is all lowercase.
+        Returns the best hits (files with more and definition hits first) and the total number of matching lines,
+        which stops counting at `MAX_MATCHES`.
+        Raises re.error for invalid regular expressions.
+        """
+        ignore_case = query == query.lower()
+        pattern = re.compile(query if regex else re.escape(query), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        literals = required_literals(query) if regex else [query]
+        # queries shorter than a trigram can not narrow the candidates down, all files are scanned line by line
+        literals = [literal for literal in literals if trigrams(literal.lower())]
+
+        prefix = ""
+        if within is not None:
+            prefix = os.path.relpath(Path(within).resolve(), self.root)
+            prefix = "" if prefix == os.curdir else prefix + os.sep
+
+        self._watch()
+
+        with self._lock:
+            candidates = [self._paths[file_id] for file_id in self._candidates(literals)]
+            candidates = [rel for rel in candidates if rel.startswith(prefix)]
+            # the literal with the rarest trigram is the one that has to be looked at the least often
+            needle = min(literals, key=lambda literal: min(len(self._postings.get(trigram, ())) for trigram in trigrams(literal.lower())), default=None)
+
+            ranked = []
+            total = 0
+            for rel in candidates:
+                check_cancelled()
+                self._ensure_fresh(rel)
+                known = self._files.get(rel)
+                if known is None or known[2] not in self._contents:
+                    continue
+
+                file_id = known[2]
+                haystack = self._contents[file_id]
+                if ignore_case:
+                    # positions in the lowered content only match the original one if lowering kept the length,
+                    # which it does not for e.g. `İ`, such files are scanned line by line
+                    lowered = self._lowered[file_id]
+                    haystack = lowered if len(lowered) == len(haystack) else None
+                hits = [SearchHit(self.root / rel, lineno, line.strip())
+                        for lineno, line in self._matching_lines(self._contents[file_id], haystack, pattern, needle, regex, ignore_case)]
+
+                if hits:
+                    total += len(hits)
+                    definitions = sum(1 for hit in hits if _DEFINITION.match(hit.line))
+                    score = len(hits) + 5 * definitions + (1 if rel.endswith(".py") else 0)
+                    ranked.append((-score, rel, hits))
+                    if total >= MAX_MATCHES:
+                        break
+
+        ranked.sort()
+        results = []
+        for _, _, hits in ranked:
+            results.extend(hits[:max_per_file])
+            if len(results) >= max_results:
+                break
+        return results[:max_results], total
+
+
+    @staticmethod
+    def _matching_lines(content: str, haystack: Optional[str], pattern, needle: Optional[str], regex: bool, ignore_case: bool):
+        """
+        Yields (line number, line) of all matching lines. Instead of running the pattern over the whole file,
+        only the lines containing the required literal `needle` are looked at, which are found with `str.find`
+        in `haystack`, the content itself or its lowered version with the same length.
+        """
+        if not needle or haystack is None:
+            lines = content.splitlines()
+            for lineno, line in enumerate(lines, start=1):
+                if pattern.search(line):
+                    yield lineno, line
+            return
+
+        if ignore_case:
+            needle = needle.lower()
+
+        lineno, counted_until = 1, 0
+        position = haystack.find(needle)
+        while position != -1:
+            lineno += content.count("\n", counted_until, position)
+            counted_until = position
+            line_start = content.rfind("\n", 0, position) + 1
+            line_end = content.find("\n", position)
+            if line_end == -1:
+                line_end = len(content)
+
+            line = content[line_start:line_end]
+            if not regex or pattern.search(line):
+                yield lineno, line
+            position = haystack.find(needle, line_end)
+
+
+_INDEXES: Dict[Path, TrigramIndex] = {}
+# like the registry of the symbol index, indexes are built outside of the lock
+_BUILDING: Dict[Path, "Future[TrigramIndex]"] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_trigram_index(cwd: Path, logger=None) -> TrigramIndex:
+    """
+    Returns the trigram index covering `cwd`, it is built the first time it is needed.
+    """
+    cwd = Path(cwd).resolve()
+
+    while True:
+        with _REGISTRY_LOCK:
+            for root, index in _INDEXES.items():
+                if root == cwd or root in cwd.parents:
+                    return index
+
+            root = find_index_root(cwd)
+            building = _BUILDING.get(root)
+            if building is None:
+                building = _BUILDING[root] = Future()
+                break
+
+        try:
+            return wait_for(building)
+        except Exception:
+            check_cancelled()
+
+    try:
+        index = TrigramIndex(root, logger=logger)
+        index.refresh()
+    except BaseException as e:
+        with _REGISTRY_LOCK:
+            del _BUILDING[root]
+        building.set_exception(e)
+        raise
+
+    with _REGISTRY_LOCK:
+        for other in [other for other in _INDEXES if root in other.parents]:
+            _INDEXES.pop(other).stop_watching()
+        _INDEXES[root] = index
+        del _BUILDING[root]
+    building.set_result(index)
+    return index
@@ -25,6 +25,10 @@ from SmolCoder.src.tools.execute_python import ExecutePythonCode
 from SmolCoder.src.tools.show_method import ShowMethodBody
 from SmolCoder.src.tools.move_folder import MoveFolder
 from SmolCoder.src.tools.human_interaction import HumanInteraction
+from SmolCoder.src.tools.search_code import SearchCode
+from SmolCoder.src.tools.find_references import FindReferences
+from SmolCoder.src.tools.run_tests import RunTests
+from SmolCoder.src.human_channel import MailboxChannel
 
 
 # Tool Definition
@@ -37,8 +41,11 @@ execute_python = ExecutePythonCode()
 show_method = ShowMethodBody()
 move_folder = MoveFolder()
 human_interaction = HumanInteraction()
+search_code = SearchCode()
+find_references = FindReferences()
+run_tests = RunTests()
 
-toolkit = Toolkit([list_classes, list_files, replace_method, show_method, move_folder, finish])
+toolkit = Toolkit([list_classes, list_files, search_code, find_references, replace_method, run_tests, show_method, move_folder, finish])
 
 resume_index = 0
 
@@ -54,10 +61,16 @@ if __name__ == "__main__":
     parser.add_argument('--working_directory', type=str, default="repos", help="Working directory of the Agent, here the github repository will be downloaded to.")
     parser.add_argument('--openai_key', type=str, default=None, help="Set it to your openai key, if you want to use it.")
     parser.add_argument('--dummy_model', type=bool, default=False, help="If this is activated runs the script with a stub/dummy as Model.")
+    parser.add_argument('--human_mailbox', type=str, default=None, help="Folder the agent writes its questions to, answers are read from there as well. Enables the Human_Interaction tool.")
+    parser.add_argument('--human_timeout', type=float, default=600.0, help="Seconds the agent waits for an answer in the human mailbox.")
     parser.add_argument('--n_samples', type=int, default=500, help="Number of Samples the program should be tested on, if not set uses the whole dataset.")
 
     args = parser.parse_args()
 
+    if args.human_mailbox:
+        human_interaction = HumanInteraction(channel=MailboxChannel(args.human_mailbox), timeout=args.human_timeout)
+        toolkit = Toolkit([list_classes, list_files, search_code, find_references, replace_method, run_tests, show_method, move_folder, human_interaction, finish])
+
     # df = pd.read_json(os.path.abspath(args.dataset_location))
     df = pd.read_parquet(os.path.abspath(args.dataset_location))
 
@@ -0,0 +1,17 @@
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+@pytest.fixture
+def codebase(tmp_path, monkeypatch):
+    """
+    An empty repository in `tmp_path`, the caches of the symbol index are kept next to it instead of in the home folder.
+    Test modules override this fixture to add their files.
+    """
+    monkeypatch.setenv("SMOLCODER_CACHE_DIR", str(tmp_path / "cache"))
+    root = tmp_path / "repo"
+    root.mkdir()
+    return root
@@ -0,0 +1,77 @@
+import math
+import threading
+import time
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.cancellation import Cancelled, DeadlineExceeded, check_cancelled, run_with_deadline
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.tools.tool import Tool
+
+class SlowTool(Tool):
+    name = "Slow"
+    input_variables = ["seconds"]
+    desc = "waits"
+    example = "Slow[1]"
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def __call__(self, input_variables, cwd, logger):
+        end = time.monotonic() + float(input_variables[0])
+        try:
+            while time.monotonic() < end:
+                check_cancelled()
+                time.sleep(0.01)
+        except Cancelled:
+            self.cancelled.set()
+            raise
+        return "slept"
+
+class UnreachableTool(Tool):
+    name = "Unreachable"
+    input_variables = ["host"]
+    desc = "connects to the host"
+    example = "Unreachable[localhost]"
+
+    def __call__(self, input_variables, cwd, logger):
+        raise TimeoutError("timed out")
+
+def test_run_with_deadline():
+    assert run_with_deadline(lambda: 1, 1.0) == 1
+    assert run_with_deadline(lambda: 2, math.inf) == 2
+    with pytest.raises(ZeroDivisionError):
+        run_with_deadline(lambda: 1 / 0, 1.0)
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline(lambda: time.sleep(1), 0.05)
+    check_cancelled()   # no-op outside of a call
+
+def test_aci_cancels_slow_tools(tmp_path):
+    tool = SlowTool()
+    aci = AgentComputerInterface(tmp_path, Toolkit([tool, Finish()]), logger=None, tool_timeout=0.2)
+
+    assert aci.get_observation("Slow", ["0"]).startswith("slept")
+
+    start = time.monotonic()
+    obs = aci.get_observation("Slow", ["30"])
+    assert time.monotonic() - start < 1
+    assert obs.startswith("The tool Slow did not finish within 0.2 seconds and was cancelled.")
+    assert tool.cancelled.wait(1)
+
+def test_per_tool_timeouts(tmp_path):
+    aci = AgentComputerInterface(tmp_path, Toolkit([SlowTool(), Finish()]), logger=None, tool_timeout=0.1, tool_timeouts={"Slow": 2})
+    assert aci.get_observation("Slow", ["0.3"]).startswith("slept")
+
+def test_timeouts_of_the_tool_itself_are_not_deadline_overruns(tmp_path):
+    aci = AgentComputerInterface(tmp_path, Toolkit([UnreachableTool(), Finish()]), logger=None, tool_timeout=5)
+    with pytest.raises(TimeoutError, match="timed out"):
+        aci.get_observation("Unreachable", ["localhost"])
+
+if __name__ == "__main__":
+    pytest.main()
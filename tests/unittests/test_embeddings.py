@@ -0,0 +1,112 @@
+import os
+import shutil
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("requests")
+
+import SmolCoder.src.embeddings as im_embeddings
+from SmolCoder.src.localization import tokenize
+from SmolCoder.src.symbol_index import SymbolIndex
+from SmolCoder.src.tools.semantic_search import SemanticSearch
+
+test_codebase = Path(os.path.dirname(__file__)) / '../test_codebase'
+
+class HashingEmbedder:
+    """Bag of words embedder, so that the tests do not need an Ollama server."""
+    model = "hashing-test"
+
+    def __init__(self, dim=64):
+        self.dim = dim
+        self.calls = 0
+        self.texts = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for term in tokenize(text):
+                vectors[i, sum(map(ord, term)) % self.dim] += 1.0
+        return vectors
+
+@pytest.fixture
+def codebase(codebase):
+    (codebase / "pkg").mkdir()
+    shutil.copy(test_codebase / "test.py", codebase / "pkg" / "test.py")
+    (codebase / "pkg" / "network.py").write_text(
+        "class Downloader:\n"
+        "    def download_archive(self, url):\n"
+        "        \"\"\"Fetches the archive from the url.\"\"\"\n"
+        "        pass\n"
+    )
+    return codebase
+
+def test_search_finds_similar_symbols(codebase):
+    index = SymbolIndex(codebase)
+    index.refresh()
+    semantic = im_embeddings.SemanticIndex(index, embedder=HashingEmbedder())
+
+    hits = semantic.search("download the archive from an url", k=2)
+    assert hits[0].symbol.qualname == "Downloader.download_archive"
+    assert hits[0].path == codebase.resolve() / "pkg" / "network.py"
+
+def test_embeddings_are_cached_by_blob(codebase, tmp_path):
+    index = SymbolIndex(codebase)
+    index.refresh()
+    embedder = HashingEmbedder()
+    im_embeddings.SemanticIndex(index, embedder=embedder).ensure_current()
+    assert embedder.texts == 5
+
+    # a second checkout with one changed file only embeds the symbols of that file
+    other = tmp_path / "other_checkout"
+    shutil.copytree(codebase, other)
+    (other / "pkg" / "network.py").write_text("def upload(path):\n    pass\n")
+    other_index = SymbolIndex(other)
+    other_index.refresh()
+
+    embedder = HashingEmbedder()
+    store = im_embeddings.SemanticIndex(other_index, embedder=embedder).ensure_current()
+    assert embedder.texts == 1
+    assert len(store.rows) == 4
+
+def test_store_is_rebuilt_after_edits(codebase):
+    index = SymbolIndex(codebase)
+    index.refresh()
+    embedder = HashingEmbedder()
+    semantic = im_embeddings.SemanticIndex(index, embedder=embedder)
+    first = semantic.ensure_current()
+    assert semantic.ensure_current() is first
+
+    (codebase / "pkg" / "network.py").write_text("def parse_config(path):\n    pass\n")
+    index.refresh()
+    hits = semantic.search("parse the config", k=1)
+    assert hits[0].symbol.qualname == "parse_config"
+
+def test_ivf_search_matches_exact_search(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+    rows = [("file.py", i) for i in range(len(vectors))]
+
+    exact = im_embeddings.VectorStore.write(tmp_path / "exact.f32", vectors, rows, "digest", "test")
+    monkeypatch.setattr(im_embeddings, "IVF_THRESHOLD", 100)
+    ivf = im_embeddings.VectorStore.write(tmp_path / "ivf.f32", vectors, rows, "digest", "test")
+    assert exact.ivf is None and ivf.ivf is not None
+
+    query = vectors[42]
+    assert exact.search(query, k=1)[0][0] == 42
+    assert ivf.search(query, k=1)[0][0] == 42
+    assert ivf.search(query, k=5, n_probe=len(ivf.ivf[0])) == exact.search(query, k=5)
+
+def test_semantic_search_tool(codebase):
+    tool = SemanticSearch(k=1, embedder=HashingEmbedder())
+    result = tool(["download an archive"], cwd=codebase / "pkg", logger=None)
+    assert result == "The code most similar to `download an archive`:\nnetwork.py:2: method `Downloader.download_archive` - download_archive(self, url)"
+
+if __name__ == "__main__":
+    pytest.main()
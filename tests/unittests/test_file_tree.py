@@ -0,0 +1,85 @@
+import os
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+import SmolCoder.src.file_tree as file_tree
+from SmolCoder.src.file_tree import FileTree, IgnoreRules, parse_gitignore, scan_directory
+from SmolCoder.src.tools.list_files import ListFiles
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("# build output\nbuild/\n*.log\n!keep.log\n/docs/generated\n")
+    for rel in ["README.md", "run.log", "keep.log", "src/pkg/__init__.py", "src/pkg/core.py", "src/pkg/sub/deep.py",
+                "src/pkg/__pycache__/core.cpython-311.pyc", "build/lib/pkg.py", "docs/index.md", "docs/generated/api.md",
+                "tests/test_core.py", "tests/data/sample.txt"]:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+    (tmp_path / "tests" / ".gitignore").write_text("data/\n")
+    return tmp_path
+
+def test_gitignore_rules():
+    rules = IgnoreRules().with_folder("", parse_gitignore("*.log\n!keep.log\nbuild/\n/top.txt\ndocs/**/tmp\n"))
+    assert rules.is_ignored("a/b/run.log", False)
+    assert not rules.is_ignored("a/keep.log", False)
+    assert rules.is_ignored("x/build", True) and not rules.is_ignored("x/build", False)
+    assert rules.is_ignored("top.txt", False) and not rules.is_ignored("a/top.txt", False)
+    assert rules.is_ignored("docs/tmp", True) and rules.is_ignored("docs/a/b/tmp", True)
+
+    nested = rules.with_folder("tests", parse_gitignore("data/\n"))
+    assert nested.is_ignored("tests/data", True) and not nested.is_ignored("data", True)
+
+def test_tree(repo):
+    assert FileTree(repo, depth=2).render() == [
+        "docs/",
+        "  index.md",
+        "src/pkg/",
+        "  sub/ (1 entry)",
+        "  __init__.py",
+        "  core.py",
+        "tests/",
+        "  .gitignore",
+        "  test_core.py",
+        ".gitignore",
+        "README.md",
+        "keep.log",
+    ]
+    assert FileTree(repo, depth=1).render()[:3] == ["docs/ (1 entry)", "src/pkg/ (3 entries)", "tests/ (2 entries)"]
+
+def test_tree_pattern(repo):
+    assert FileTree(repo, depth=5, pattern="*.py").render() == [
+        "src/pkg/", "  sub/", "    deep.py", "  __init__.py", "  core.py", "tests/", "  test_core.py"]
+    assert FileTree(repo, depth=5, pattern="src/*/core.py").render() == ["src/pkg/", "  core.py"]
+
+def test_tree_below_root(repo):
+    # the rules of the root still apply
+    assert FileTree(repo / "docs").render() == ["index.md"]
+
+def test_snapshots_follow_directory_mtime(repo):
+    first = scan_directory(repo / "docs")
+    assert scan_directory(repo / "docs") is first
+    (repo / "docs" / "new.md").write_text("")
+    os.utime(repo / "docs", ns=(0, os.stat(repo / "docs").st_mtime_ns + 1))
+    assert "new.md" in [entry.name for entry in scan_directory(repo / "docs")]
+
+def test_list_files_tool(repo):
+    tool = ListFiles()
+    output = tool(["src", "depth=3"], cwd=repo)
+    assert output == f"The entries of `{repo / 'src'}` are:\npkg/\n  sub/\n    deep.py\n  __init__.py\n  core.py"
+    assert tool([".", "pattern=*.md"], cwd=repo).endswith("docs/\n  index.md\nREADME.md")
+    assert tool([".", "*.rs"], cwd=repo) == f"No files in `{repo}` match `*.rs`."
+    assert tool.valid_params([".", "depth=2", "*.py", "3"])
+    assert not tool.valid_params([".", "depth=deep"])
+    assert not tool.valid_params([".", "1", "2"])
+
+def test_list_files_pages_keep_options(repo):
+    output = ListFiles(max_tokens=5)([".", "depth=1"], cwd=repo)
+    assert output.endswith("use List_Files[., depth=1, 2] to see more.)")
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,74 @@
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.symbol_index import Reference, SymbolIndex, parse_references
+from SmolCoder.src.tools.find_references import FindReferences
+
+@pytest.fixture
+def codebase(codebase):
+    (codebase / "pkg").mkdir()
+    (codebase / "pkg" / "core.py").write_text(
+        "class Engine:\n"
+        "    def run(self):\n"
+        "        return self.step()\n"
+        "    def step(self):\n"
+        "        pass\n"
+    )
+    (codebase / "pkg" / "cli.py").write_text(
+        "from pkg.core import Engine\n"
+        "\n"
+        "def main():\n"
+        "    engine = Engine()\n"
+        "    engine.step()\n"
+        "    return engine.step\n"
+    )
+    return codebase
+
+def test_parse_references():
+    source = "import os.path\nx = foo(bar)\nobj.method(\n    len(x)).attr\nprint(self.value)\n"
+    assert parse_references(source) == [
+        Reference("attr", 4, "attribute"),
+        Reference("bar", 2, "name"),
+        Reference("foo", 2, "call"),
+        Reference("method", 3, "call"),
+        Reference("obj", 3, "name"),
+        Reference("path", 1, "import"),
+        Reference("value", 5, "attribute"),
+        Reference("x", 4, "name"),
+    ]
+
+def test_index_tracks_references(codebase):
+    index = SymbolIndex(codebase)
+    index.refresh()
+
+    hits = [(path.name, reference.lineno, reference.kind) for path, reference in index.find_references("Engine.step")]
+    assert hits == [("cli.py", 5, "call"), ("cli.py", 6, "attribute"), ("core.py", 3, "call")]
+
+    (codebase / "pkg" / "cli.py").write_text("def main():\n    pass\n")
+    index.update_file(codebase / "pkg" / "cli.py")
+    assert [path.name for path, _ in index.find_references("step")] == ["core.py"]
+    assert index.find_references("Engine") == []
+
+def test_find_references_tool(codebase):
+    tool = FindReferences(max_tokens=20)
+    cwd = codebase / "pkg"
+
+    result = tool(["step"], cwd=cwd, logger=None)
+    assert result == (
+        "References to `step` (3 in total):\n"
+        "cli.py:5: (call) engine.step()\n"
+        "cli.py:6: (attribute) return engine.step\n"
+        "(Page 1 of 2, use Find_References[step, 2] to see more.)"
+    )
+    assert tool(["step", "2"], cwd=cwd, logger=None) == "References to `step` (3 in total):\ncore.py:3: (call) return self.step()"
+    assert tool(["step", "page=2"], cwd=cwd, logger=None) == tool(["step", "2"], cwd=cwd, logger=None)
+    assert tool(["step", "3"], cwd=cwd, logger=None) == "There are only 2 page(s) of references to `step`."
+    assert tool(["missing"], cwd=cwd, logger=None) == "No references to `missing` found."
+    assert not tool.valid_params(["step", "two"])
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,89 @@
+import os
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.fork_server import get_fork_server, top_level_packages
+from SmolCoder.src.sandbox import Limits
+from SmolCoder.src.symbol_index import get_symbol_index
+from SmolCoder.src.tools.execute_python import ExecutePythonCode
+from SmolCoder.src.tools.replace_method import ReplaceMethod
+
+PACKAGE = '''import itertools
+
+IMPORTS = itertools.count()
+
+
+class Greeter:
+    def greet(self):
+        return "hello"
+'''
+
+@pytest.fixture
+def checkout(codebase):
+    (codebase / ".git").mkdir()
+    (codebase / "greetings").mkdir()
+    (codebase / "greetings" / "__init__.py").write_text(PACKAGE)
+    (codebase / "tests").mkdir()
+    (codebase / "tests" / "__init__.py").write_text("")
+    return codebase
+
+def test_top_level_packages(checkout):
+    (checkout / "src" / "other").mkdir(parents=True)
+    (checkout / "src" / "other" / "__init__.py").write_text("")
+    assert top_level_packages(checkout) == ([str(checkout), str(checkout / "src")], ["greetings", "other"])
+
+def test_code_runs_in_forks_of_the_preloaded_server(checkout):
+    server = get_fork_server(checkout, Limits(cpu_seconds=1, wall_seconds=3))
+    try:
+        code = "import greetings\n__result__ = (next(greetings.IMPORTS), greetings.Greeter().greet())"
+        # every fork starts from the state of the server
+        assert server.run(code, checkout).result == "(0, 'hello')"
+        assert server.run(code, checkout).result == "(0, 'hello')"
+        assert server.imported == ["greetings"]
+
+        assert "did not finish within 3 seconds" in server.run("import time\ntime.sleep(60)", checkout).error
+        assert "cpu time limit" in server.run("while True:\n    pass", checkout).error
+        assert server.run("__result__ = 1", checkout).result == "1"
+    finally:
+        server.close()
+
+def test_edits_invalidate_the_server(checkout):
+    tool = ExecutePythonCode(fork_server=True)
+    code = ["import greetings\n__result__ = greetings.Greeter().greet()"]
+    try:
+        assert tool(code, cwd=checkout) == "__result__ = 'hello'"
+        process = get_fork_server(checkout)._process
+
+        result = ReplaceMethod()(["Greeter", "greet", "def greet(self):\n    return 'bye'\n"], cwd=checkout, logger=None)
+        assert "replaced successfully" in result
+        assert get_fork_server(checkout)._process is None
+        assert tool(code, cwd=checkout) == "__result__ = 'bye'"
+        assert get_fork_server(checkout)._process is not process
+    finally:
+        get_fork_server(checkout).close()
+
+def test_touching_a_file_keeps_the_server(checkout):
+    tool = ExecutePythonCode(fork_server=True)
+    path = checkout / "greetings" / "__init__.py"
+    try:
+        assert tool(["__result__ = 1"], cwd=checkout) == "__result__ = 1"
+        process = get_fork_server(checkout)._process
+
+        # e.g. a `git checkout` that restores the same content
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        get_symbol_index(checkout).update_file(path)
+        assert get_fork_server(checkout)._process is process
+
+        path.write_text(path.read_text() + "\nEXTRA = 1\n")
+        get_symbol_index(checkout).update_file(path)
+        assert get_fork_server(checkout)._process is None
+    finally:
+        get_fork_server(checkout).close()
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,90 @@
+import os
+import random
+import shutil
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.fuzzy import BKTree, FuzzyIndex, levenshtein
+from SmolCoder.src.toolkit import SearchMode, Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.tools.list_files import ListFiles
+from SmolCoder.src.tools.list_methods import ListMethods
+from SmolCoder.src.tools.show_method import ShowMethodBody
+
+test_codebase = Path(os.path.dirname(__file__)) / '../test_codebase'
+
+@pytest.fixture
+def codebase(codebase):
+    shutil.copy(test_codebase / "test.py", codebase / "test.py")
+    return codebase
+
+def _levenshtein_table(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+def test_levenshtein():
+    assert levenshtein("kitten", "sitting") == 3
+    assert levenshtein("", "abc") == 3
+    assert levenshtein("list_file", "list_files") == 1
+
+    rng = random.Random(0)
+    for _ in range(1000):
+        a = "".join(rng.choice("abc") for _ in range(rng.randint(0, 10)))
+        b = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 80)))
+        assert levenshtein(a, b) == _levenshtein_table(a, b)
+
+def test_bk_tree():
+    words = ["list_files", "list_classes", "list_methods", "show_method_body", "replace_method", "finish"]
+    tree = BKTree(words)
+    assert len(tree) == len(words)
+    assert tree.search("list_file", 1) == [(1, "list_files")]
+    assert tree.search("list_method", 2) == [(1, "list_methods")]
+    assert tree.search("xyz", 2) == []
+
+def test_fuzzy_index():
+    index = FuzzyIndex(["List_Files", "List_Classes", "List_Methods", "Show_Method_Body", "Finish"])
+    assert index.match("List_File").name == "List_Files"
+    assert index.match("ListFiles").distance == 0
+    assert index.match("Show_Method").name == "Show_Method_Body"
+    assert index.match("List") is None           # ambiguous prefix
+    assert index.match("Search_Code") is None    # not similar enough
+    assert FuzzyIndex(["List_Cats", "List_Bats"]).match("List_Hats") is None
+
+def test_toolkit_fuzzy_search():
+    toolkit = Toolkit([ListFiles(), ListMethods(), ShowMethodBody(), Finish()])
+    assert toolkit.find_tool("List_File") is None
+    assert toolkit.find_tool("List_File", mode=SearchMode.FUZZY).name == "List_Files"
+    assert toolkit.find_tool("show_method", mode=SearchMode.FUZZY).name == "Show_Method_Body"
+
+def test_aci_corrects_tool_names(codebase):
+    aci = AgentComputerInterface(codebase, Toolkit([ListMethods(), Finish()]), logger=None)
+    obs = aci.get_observation("List_Method", ["MyClass"])
+    assert obs.startswith("(There is no tool `List_Method`, used `List_Methods` instead.)\nMethod `do_stuff(self) -> str`")
+
+    # the tokenizer splits the arguments of unknown tools at commas
+    obs = aci.get_observation("Finsh", ["done", " all good"])
+    assert obs == "(There is no tool `Finsh`, used `Finish` instead.)\ndone,  all good"
+    assert aci.finished
+
+def test_tools_correct_symbol_names(codebase):
+    result = ListMethods()(["MyClas"], cwd=codebase, logger=None)
+    assert result.startswith("(There is no class `MyClas`, showing `MyClass` instead.)\nMethod `do_stuff(self) -> str`")
+
+    result = ShowMethodBody()(["myclass", "do_stuf"], cwd=codebase, logger=None)
+    assert result.startswith("(Showing `MyClass.do_stuff`, as there is no `myclass.do_stuf`.)\n```\ndef do_stuff(self) -> str:")
+
+    result = ShowMethodBody()(["MyClass", "something_else"], cwd=codebase, logger=None)
+    assert result.startswith("Class MyClass with method something_else not found")
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,95 @@
+import io
+import os
+import threading
+import time
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.cancellation import run_with_deadline
+from SmolCoder.src.output_capture import _ContextStream
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.human_channel import ConsoleChannel, MailboxChannel, QueueChannel, default_channel
+from SmolCoder.src.tools.human_interaction import HumanInteraction
+
+def answer_later(channel, answer, delay=0.1):
+    def run():
+        for _ in range(50):
+            pending = channel.pending()
+            if pending:
+                channel.answer(pending[0].id, answer)
+                return
+            time.sleep(delay)
+    threading.Thread(target=run, daemon=True).start()
+
+def test_queue_channel():
+    channel = QueueChannel()
+    answer_later(channel, "use the other branch")
+    assert channel.ask("which branch?", timeout=5) == "use the other branch"
+    assert channel.pending() == []
+
+    start = time.monotonic()
+    assert channel.ask("anyone?", timeout=0.3) is None
+    assert time.monotonic() - start < 2
+    # the question is closed, a late answer is rejected
+    question = channel.questions.get_nowait()
+    assert question.text == "which branch?"
+    assert not channel.answer(channel.questions.get_nowait().id, "late")
+
+def test_mailbox_channel(tmp_path):
+    channel = MailboxChannel(tmp_path / "mailbox")
+    answer_later(channel, "yes")
+    assert channel.ask("may I delete the file?", timeout=5) == "yes"
+    assert channel.ask("still there?", timeout=0.3) is None
+    # questions and answers are cleaned up
+    assert os.listdir(tmp_path / "mailbox") == []
+
+def test_console_channel():
+    stdout = io.StringIO()
+    channel = ConsoleChannel(stdin=io.StringIO("the answer\n"), stdout=stdout)
+    assert channel.ask("question?", timeout=5) == "the answer"
+    assert stdout.getvalue() == "question?\n> "
+    # stdin is closed now
+    assert channel.ask("again?", timeout=5) is None
+
+def test_console_question_reaches_the_terminal_through_the_aci(tmp_path, monkeypatch):
+    terminal = io.StringIO()
+    # the ACI captures the output of tools, the question has to get past that
+    monkeypatch.setattr(sys, "stdout", _ContextStream(terminal))
+    tool = HumanInteraction(channel=ConsoleChannel(stdin=io.StringIO("ask the maintainer\n")), timeout=5)
+    aci = AgentComputerInterface(tmp_path, Toolkit([tool, Finish()]), logger=None)
+
+    obs = aci.get_observation("Human_Interaction", ["what should I do?"])
+    assert obs.startswith("ask the maintainer\n")
+    assert terminal.getvalue() == "what should I do?\n> "
+
+def test_default_channel(tmp_path, monkeypatch):
+    monkeypatch.setenv("SMOLCODER_HUMAN_MAILBOX", str(tmp_path))
+    assert isinstance(default_channel(), MailboxChannel)
+    monkeypatch.delenv("SMOLCODER_HUMAN_MAILBOX")
+    monkeypatch.setattr(sys, "stdin", io.StringIO())
+    assert default_channel() is None
+
+def test_tool_falls_back():
+    tool = HumanInteraction(channel=QueueChannel(), timeout=0.2)
+    assert tool(["help?"], cwd=None, logger=None) == "No human answered within 0.2 seconds. Continue on your own with the information you have."
+    tool = HumanInteraction(channel=QueueChannel(), timeout=0.2, fallback="Do not wait for help.")
+    assert tool(["help?"], cwd=None, logger=None) == "Do not wait for help."
+
+def test_cancelled_wait_returns():
+    channel = QueueChannel()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        run_with_deadline(lambda: channel.ask("help?", timeout=60), timeout=0.3)
+    time.sleep(0.5)
+    # the abandoned wait noticed the cancellation and closed its question
+    assert channel.pending() == []
+    assert time.monotonic() - start < 5
+
+if __name__ == "__main__":
+    pytest.main()
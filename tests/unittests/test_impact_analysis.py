@@ -0,0 +1,75 @@
+import os
+import subprocess
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.impact_analysis import ImpactIndex, modified_files, run_tests
+from SmolCoder.src.symbol_index import SymbolIndex
+from SmolCoder.src.tools.run_tests import RunTests
+
+@pytest.fixture
+def codebase(codebase):
+    (codebase / "pkg").mkdir()
+    (codebase / "tests").mkdir()
+    (codebase / "pkg" / "__init__.py").write_text("")
+    (codebase / "pkg" / "core.py").write_text("def add(a, b):\n    return a + b\n")
+    (codebase / "pkg" / "util.py").write_text("from pkg.core import add\n\ndef double(x):\n    return add(x, x)\n")
+    (codebase / "pkg" / "other.py").write_text("def other():\n    return 1\n")
+    (codebase / "tests" / "test_core.py").write_text("from pkg.core import add\n\ndef test_add():\n    assert add(1, 2) == 3\n")
+    (codebase / "tests" / "test_util.py").write_text("from pkg import util\n\ndef test_double():\n    assert util.double(2) == 5\n")
+    (codebase / "tests" / "test_other.py").write_text("from pkg.other import other\n\ndef test_other():\n    assert other() == 1\n")
+    return codebase
+
+def test_affected_tests(codebase):
+    index = SymbolIndex(codebase)
+    index.refresh()
+    impact = ImpactIndex(index)
+
+    core, util, other = (os.path.join("pkg", name) for name in ("core.py", "util.py", "other.py"))
+    test_core, test_util, test_other = (os.path.join("tests", name) for name in ("test_core.py", "test_util.py", "test_other.py"))
+    assert impact.affected_tests([core]) == [test_core, test_util]
+    assert impact.affected_tests([util]) == [test_util]
+    assert impact.affected_tests([os.path.join("pkg", "__init__.py")]) == [test_core, test_other, test_util]
+    assert impact.affected_tests([test_other]) == [test_other]
+
+    (codebase / "tests" / "conftest.py").write_text("")
+    index.refresh()
+    assert impact.affected_tests([os.path.join("tests", "conftest.py")]) == [test_core, test_other, test_util]
+
+def test_modified_files(codebase):
+    def git(*args):
+        subprocess.run(["git", *args], cwd=codebase, check=True, capture_output=True)
+
+    assert modified_files(codebase) == []
+    git("init", "-q")
+    git("add", ".")
+    git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "initial")
+    assert modified_files(codebase) == []
+
+    (codebase / "pkg" / "core.py").write_text("def add(a, b):\n    return a - b\n")
+    (codebase / "pkg" / "new.py").write_text("")
+    assert modified_files(codebase) == [os.path.join("pkg", "core.py"), os.path.join("pkg", "new.py")]
+
+def test_run_tests(codebase):
+    report = run_tests(codebase, [os.path.join("tests", "test_core.py"), os.path.join("tests", "test_util.py")], workers=2)
+    assert report.counts == {"passed": 1, "failed": 1}
+    assert [line.split(" - ")[0] for line in report.failures] == ["FAILED tests/test_util.py::test_double"]
+    assert not report.ok
+
+def test_run_tests_tool(codebase):
+    result = RunTests(workers=1)(["pkg/other.py"], cwd=codebase, logger=None)
+    assert result.startswith(f"Ran 1 test file(s) affected by {os.path.join('pkg', 'other.py')} in ")
+    assert result.endswith("s: 1 passed.")
+
+    result = RunTests(timeout=0.01)(["pkg/other.py"], cwd=codebase, logger=None)
+    assert result.endswith(f"Timed out after 0s: {os.path.join('tests', 'test_other.py')}")
+
+    # the tests may write files, they must not run next to other actions or be prefetched
+    assert not RunTests().read_only and not RunTests().memoizable
+
+if __name__ == "__main__":
+    pytest.main()
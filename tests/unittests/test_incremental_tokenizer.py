@@ -0,0 +1,84 @@
+import random
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.meta_tokenizer import Action, IncrementalMetaTokenizer, MetaTokenizer, Observation, Thought
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+
+TRAJECTORY = (
+    "[Sysprompt]You answer questions.\n[Action] Tool[args][Sysprompt]"
+    "[Question] Where is the bug?\n"
+    "[Thought] I should look at the files first.\n"
+    "[Action] List_Files[.]\n"
+    "[Observation] The entries are:\nsrc/\nsetup.py\n(Current Working Directory: repo)\n"
+    "[Thought] Now both methods.\n"
+    "[Action] Show_Method_Body[A, run]\n[Action] Show_Method_Body[B, run]\n"
+    "[Observation] (1) ...\n(2) ...\n"
+    "[Thought] Done.\n"
+    "[Action] Finish[It is in `A.run`, line 3.]"
+)
+
+def describe(tokens):
+    return [(type(token).__name__, token.unparse()) for token in tokens]
+
+@pytest.fixture
+def tokenizer():
+    return MetaTokenizer(Toolkit([Finish()]))
+
+def test_same_tokens_as_full_tokenizer(tokenizer):
+    expected = describe(tokenizer.tokenize(TRAJECTORY))
+    assert len(expected) == 11
+
+    rng = random.Random(0)
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(TRAJECTORY)), 8))
+        stream = IncrementalMetaTokenizer(tokenizer)
+        previous = 0
+        for cut in cuts + [len(TRAJECTORY)]:
+            stream.feed(TRAJECTORY[previous:cut])
+            # every prefix tokenizes like the full tokenizer would
+            assert describe(stream.tokens) == describe(tokenizer.tokenize(TRAJECTORY[:cut]))
+            assert stream.is_valid() == tokenizer.is_valid_traj(TRAJECTORY[:cut])
+            previous = cut
+        assert describe(stream.tokens) == expected
+
+def test_sequence_view(tokenizer):
+    stream = IncrementalMetaTokenizer(tokenizer)
+    stream.feed(TRAJECTORY)
+    assert len(stream) == 11
+    assert isinstance(stream[-1], Action) and stream[-1].unpack() == ("Finish", ["It is in `A.run`, line 3."])
+    assert isinstance(stream[2], Thought)
+    with pytest.raises(IndexError):
+        stream[11]
+
+def test_invalid_steps_are_rolled_back(tokenizer):
+    stream = IncrementalMetaTokenizer(tokenizer)
+    stream.feed("[Sysprompt]s[Sysprompt][Question]q\n[Thought]t\n[Action]List_Files[.]\n")
+    assert stream.is_valid()
+    checkpoint = stream.checkpoint()
+
+    stream.feed("[Observation]obs\n[Action]Finish[x]")
+    assert not stream.is_valid()
+    stream.rollback(checkpoint)
+    assert stream.is_valid() and len(stream) == 4
+
+    stream.feed("[Observation]obs\n")
+    assert stream.is_valid() and isinstance(stream[-1], Observation)
+
+def test_without_sysprompt(tokenizer):
+    stream = IncrementalMetaTokenizer(tokenizer)
+    stream.feed("[Sys")
+    assert len(stream) == 0 and not stream.is_valid()
+    stream.feed("tem][Question]q")
+    assert describe(stream.tokens) == describe(tokenizer.tokenize("[System][Question]q")) == []
+    stream = IncrementalMetaTokenizer(tokenizer)
+    stream.feed("[Question]q[Thought]t")
+    assert len(stream) == 2 and not stream.is_valid()
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,93 @@
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+import SmolCoder.src.lint as im_lint
+from SmolCoder.src.lint import lint_replacement
+from SmolCoder.src.tools.replace_method import ReplaceMethod
+
+SOURCE = '''import os
+from typing import List
+
+LIMIT = 3
+
+
+class Greeter:
+    greeting = "hi"
+
+    def greet(self, names: List[str]) -> str:
+        return ", ".join(names[:LIMIT])
+
+    def path(self):
+        return os.getcwd()
+'''
+
+def _lint(source):
+    return lint_replacement(source.encode(), "Greeter", ("greet",), "greeter.py")
+
+def test_valid_method_has_no_issues():
+    assert _lint(SOURCE) == []
+
+def test_undefined_names_are_errors():
+    source = SOURCE.replace('", ".join(names[:LIMIT])', 'greeting + sep.join(names)')
+    assert [(issue.severity, issue.lineno, issue.message) for issue in _lint(source)] == [
+        ("error", 2, "undefined name `greeting`"),
+        ("error", 2, "undefined name `sep`"),
+    ]
+
+def test_local_bindings_are_known():
+    method = '''    def greet(self, names: List[str]) -> str:
+        sep = ", "
+        upper = [name.upper() for name in names if (n := len(name))]
+        try:
+            import json
+            return json.dumps(upper) + sep + str(n)
+        except ValueError as error:
+            return str(error) + __name__
+'''
+    source = SOURCE.replace('''    def greet(self, names: List[str]) -> str:
+        return ", ".join(names[:LIMIT])
+''', method)
+    assert _lint(source) == []
+
+def test_compile_and_indentation_errors():
+    source = SOURCE.replace('return ", ".join(names[:LIMIT])', 'yield 1\n        return\n        nonlocal x')
+    [issue] = _lint(source)
+    assert issue.severity == "error" and issue.lineno == 4 and "nonlocal" in issue.message
+
+    # the parser reports the line in the file, it is converted to the one in the method like above
+    source = SOURCE.replace('return ", ".join(names[:LIMIT])', 'sep = ", "\n        return sep.join(names[:LIMIT]')
+    [issue] = _lint(source)
+    assert issue.severity == "error" and issue.lineno == 3 and "never closed" in issue.message
+
+    # the method fell out of the class
+    assert "not a method of `Greeter`" in lint_replacement(SOURCE.replace("    def path", "def path").encode(), "Greeter", ("path",))[0].message
+
+def test_unused_imports_are_warnings():
+    source = SOURCE.replace('return ", ".join', 'import re\n        return ", ".join')
+    assert [(issue.severity, issue.message) for issue in _lint(source)] == [("warning", "`re` is imported but unused")]
+
+def test_results_are_memoized(monkeypatch):
+    source = SOURCE.replace("LIMIT = 3", "LIMIT = 4")
+    assert _lint(source) == []
+    monkeypatch.setattr(im_lint, "_lint", lambda *args: pytest.fail("not memoized"))
+    assert _lint(source) == []
+
+def test_replace_method_rejects_invalid_methods(codebase):
+    (codebase / "greeter.py").write_text(SOURCE)
+    tool = ReplaceMethod()
+
+    result = tool(["Greeter", "greet", "def greet(self, names):\n    return undefined_helper(names)\n"], cwd=codebase, logger=None)
+    assert result == ("Error: The new method 'greet' of class 'Greeter' was rejected. "
+                      "Error in line 2 of the new method: undefined name `undefined_helper`")
+    assert (codebase / "greeter.py").read_text() == SOURCE
+
+    result = tool(["Greeter", "greet", "def greet(self, names):\n    import re\n    return str(names)\n"], cwd=codebase, logger=None)
+    assert result.startswith("Method 'greet' in class 'Greeter' replaced successfully")
+    assert result.endswith("(Warning in line 2 of the new method: `re` is imported but unused in 'greet'.)")
+
+if __name__ == "__main__":
+    pytest.main()
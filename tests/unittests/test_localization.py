@@ -0,0 +1,40 @@
+import pytest
+
+from pathlib import Path 
+import sys 
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+np = pytest.importorskip("numpy")
+
+import SmolCoder.src.localization as im_localization
+
+def test_tokenize():
+    assert im_localization.tokenize("ListMethods crashes in get_class_summary") == [
+        "listmethods", "list", "methods", "crashes", "get_class_summary", "get", "summary"
+    ]
+
+def test_bm25_ranks_matching_documents_first():
+    index = im_localization.BM25Index({
+        "a.py": ["parser", "token", "token"],
+        "b.py": ["lexer", "token"],
+        "c.py": ["render", "html"],
+    })
+
+    assert [path for path, _ in index.top_k(["token"], 5)] == ["a.py", "b.py"]
+    assert [path for path, _ in index.top_k(["html", "token"], 1)] == ["c.py"]
+    assert index.top_k(["unknown"], 5) == []
+
+def test_localizer(codebase):
+    (codebase / "src").mkdir()
+    (codebase / "src" / "parser.py").write_text("class SqlParser:\n    def parse_statement(self):\n        pass\n")
+    (codebase / "src" / "render.py").write_text("class HtmlRenderer:\n    def render(self):\n        pass\n")
+
+    candidates = im_localization.get_localizer(codebase).localize("SqlParser.parse_statement fails on nested statements", k=1)
+
+    assert [candidate.path.name for candidate in candidates] == ["parser.py"]
+    assert candidates[0].symbols == ["SqlParser", "SqlParser.parse_statement"]
+    assert im_localization.format_candidates(candidates, codebase).endswith("- src/parser.py (`SqlParser`, `SqlParser.parse_statement`)")
+
+if __name__ == "__main__":
+    pytest.main()
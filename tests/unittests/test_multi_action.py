@@ -0,0 +1,90 @@
+import threading
+import time
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.meta_tokenizer import Action, MetaTokenizer
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.tools.replace_method import ReplaceMethod
+from SmolCoder.src.tools.tool import Tool
+
+class Recorder(Tool):
+    input_variables = ["text"]
+    desc = "records the call"
+    example = "Record[text]"
+
+    def __init__(self, name, read_only, log):
+        self._name, self._read_only, self.log = name, read_only, log
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def read_only(self):
+        return self._read_only
+
+    def __call__(self, input_variables, cwd, logger):
+        self.log.append(("start", input_variables[0], threading.get_ident()))
+        time.sleep(0.2)
+        self.log.append(("end", input_variables[0], threading.get_ident()))
+        return f"{self.name} {input_variables[0]}"
+
+def test_tokenizer_accepts_several_actions():
+    tokenizer = MetaTokenizer(Toolkit([Finish()]))
+    trajectory = ("[Sysprompt]sys[Sysprompt][Question]q\n[Thought]look at both\n"
+                  "[Action]Show_Method_Body[A, f]\n[Action]Show_Method_Body[B, g]\n[Observation]")
+    tokens = tokenizer.tokenize(trajectory)
+    assert [type(token).__name__ for token in tokens] == ["SysPrompt", "Question", "Thought", "Action", "Action"]
+    assert tokens[3] == Action("Show_Method_Body", ["A", "f"])
+    assert tokens[4] == Action("Show_Method_Body", ["B", "g"])
+    assert tokenizer.is_valid_traj(trajectory + "both[Thought]done[Action]Finish[yes]")
+    assert not tokenizer.is_valid_traj("[Sysprompt]sys[Sysprompt][Question]q[Action]Finish[x]")
+
+def test_read_only_actions_run_concurrently(tmp_path):
+    log = []
+    aci = AgentComputerInterface(tmp_path, Toolkit([Recorder("Read", True, log), Recorder("Write", False, log), Finish()]), logger=None)
+
+    start = time.monotonic()
+    obs = aci.get_observations([("Read", ["a"]), ("Read", ["b"]), ("Write", ["c"]), ("Read", ["d"])])
+    assert time.monotonic() - start < 0.75
+    assert obs.startswith("(1) Read: Read a\n(2) Read: Read b\n(3) Write: Write c\n(4) Read: Read d\n")
+    assert obs.count("Current Working Directory") == 1
+
+    # a and b overlap, the write waits for both and d waits for the write
+    events = [(kind, text) for kind, text, _ in log]
+    assert set(events[:2]) == {("start", "a"), ("start", "b")}
+    assert events[4:] == [("start", "c"), ("end", "c"), ("start", "d"), ("end", "d")]
+
+def test_actions_after_finish_are_skipped(tmp_path):
+    log = []
+    aci = AgentComputerInterface(tmp_path, Toolkit([Recorder("Write", False, log), Finish()]), logger=None)
+    obs = aci.get_observations([("Finish", ["done"]), ("Write", ["x"])])
+    assert obs == "(1) Finish: done\n(2) Write: Skipped, as the task was finished before."
+    assert aci.finished and log == []
+
+def test_replacements_of_one_step_are_one_transaction(codebase):
+    source = "class A:\n    def f(self):\n        return 1\n\n    def g(self):\n        return 2\n"
+    (codebase / "a.py").write_text(source)
+    aci = AgentComputerInterface(codebase, Toolkit([ReplaceMethod(), Finish()]), logger=None)
+
+    obs = aci.get_observations([("Replace_Method", ["A", "f", "def f(self):\n    return 10"]),
+                                ("Replace_Method", ["A", "g", "def g(self):\n    return undefined_name"])])
+    assert "(1) Replace_Method: Error: The new method 'g' of class 'A' was rejected." in obs
+    assert "No method was replaced." in obs
+    assert "(2) Replace_Method: Done together with (1), see there." in obs
+    assert (codebase / "a.py").read_text() == source
+
+    obs = aci.get_observations([("Replace_Method", ["A", "f", "def f(self):\n    return 10"]),
+                                ("Replace_Method", ["A", "g", "def g(self):\n    return 20"])])
+    assert "Method 'f' in class 'A' replaced successfully" in obs and "Method 'g' in class 'A' replaced successfully" in obs
+    assert "return 10" in (codebase / "a.py").read_text() and "return 20" in (codebase / "a.py").read_text()
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,62 @@
+import logging
+import sys
+import threading
+import pytest
+
+from pathlib import Path
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.meta_tokenizer import MetaTokenizer
+from SmolCoder.src.output_capture import capture_output
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.tools.tool import Tool
+
+class PrintingTool(Tool):
+    name = "Print"
+    input_variables = ["text"]
+    desc = "prints the text"
+    example = "Print[text]"
+
+    def __call__(self, input_variables, cwd, logger):
+        print(input_variables[0])
+        return "done"
+
+def test_threads_capture_their_own_output():
+    barrier = threading.Barrier(8)
+    captured = {}
+
+    def work(i):
+        with capture_output() as output:
+            barrier.wait()
+            for _ in range(100):
+                print(i)
+        captured[i] = output.getvalue()
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert captured == {i: f"{i}\n" * 100 for i in range(8)}
+
+def test_aci_logs_the_output_of_tools(tmp_path, caplog, capsys):
+    logger = logging.getLogger("test_aci_logs_the_output_of_tools")
+    aci = AgentComputerInterface(tmp_path, Toolkit([PrintingTool(), Finish()]), logger=logger)
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        assert aci.get_observation("Print", ["hello"]).startswith("done")
+    assert "Output of Print: hello" in caplog.text
+    assert "hello" not in capsys.readouterr().out
+
+def test_tokenizer_logs_instead_of_printing(caplog, capsys):
+    logger = logging.getLogger("test_tokenizer_logs_instead_of_printing")
+    tokenizer = MetaTokenizer(Toolkit([Finish()]), logger)
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        assert not tokenizer.is_valid_traj([])
+    assert "the trajectory was empty" in caplog.text
+    assert capsys.readouterr().out == ""
+
+if __name__ == "__main__":
+    pytest.main()
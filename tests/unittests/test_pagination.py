@@ -0,0 +1,80 @@
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.pagination import continuation, paginate, parse_page, truncate
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.tools.list_files import ListFiles
+from SmolCoder.src.tools.list_methods import ListMethods
+from SmolCoder.src.tools.tool import Tool
+
+def test_parse_page():
+    assert parse_page("2") == 2
+    assert parse_page(" page=3 ") == 3
+    assert parse_page("Page: 4") == 4
+    assert parse_page("two") is None
+
+def test_paginate():
+    items = [f"item {i:02}" for i in range(10)]     # 7 characters each
+    page, pages = paginate(items, 1, max_tokens=4)   # 16 characters, two items per page
+    assert page == ["item 00", "item 01"] and pages == 5
+    assert paginate(items, 5, max_tokens=4)[0] == ["item 08", "item 09"]
+    assert paginate(items, 6, max_tokens=4) == ([], 5)
+    assert paginate(["x" * 100], 1, max_tokens=4)[0] == ["x" * 16 + "..."]
+    assert continuation("List_Files", ["."], 1, 5) == "(Page 1 of 5, use List_Files[., 2] to see more.)"
+    assert continuation("List_Files", ["."], 5, 5) == ""
+
+def test_truncate():
+    text = "\n".join(f"line {i}" for i in range(100))
+    assert truncate(text, 1000) == text
+    short = truncate(text, 10)
+    assert short.startswith("line 0\nline 1\n") and "\nline 4\n(The observation was cut off after 34 of 789 characters." in short
+
+def test_list_files_pages(tmp_path):
+    for i in range(30):
+        (tmp_path / f"file_{i:02}.py").write_text("")
+    tool = ListFiles(max_tokens=20)
+    first = tool(["."], cwd=tmp_path)
+    assert "file_00.py\n" in first and first.endswith("(Page 1 of 5, use List_Files[., 2] to see more.)")
+    last = tool([".", "page=5"], cwd=tmp_path)
+    assert last.endswith("file_29.py")
+    assert tool([".", "6"], cwd=tmp_path) == f"The entries of `{tmp_path}` fit on 5 page(s)."
+
+def test_list_methods_pages(codebase):
+    (codebase / "big.py").write_text("class Big:\n" + "".join(f"    def method_{i}(self):\n        pass\n" for i in range(20)))
+    tool = ListMethods(max_tokens=50)
+    first = tool(["Big"], cwd=codebase, logger=None)
+    assert first.startswith("Method `method_0(self)`") and first.endswith("use List_Methods[Big, 2] to see more.)")
+    last = tool(["Big", "7"], cwd=codebase, logger=None)
+    assert last.endswith("Method `method_19(self)` with docstring `{ None }`")
+    assert tool(["Big", "8"], cwd=codebase, logger=None) == "The methods of `Big` fit on 7 page(s)."
+    assert not tool.valid_params(["Big", "next"])
+
+def test_optional_parameters_in_the_error(codebase):
+    aci = AgentComputerInterface(codebase, Toolkit([ListMethods(), Finish()]), logger=None)
+    assert aci.get_observation("List_Methods", ["Big", "2", "3"]).startswith("The tool expected 1 to 2 parameters, but got 3.")
+    assert aci.get_observation("List_Methods", ["Big", "next"]).startswith(
+        "The parameters ['Big', 'next'] are not valid for the tool List_Methods. Use it like this: List_Methods[MyClass] or List_Methods[MyClass, 2]")
+
+class Loud(Tool):
+    name = "Loud"
+    input_variables = ["n"]
+    desc = "returns n lines"
+    example = "Loud[3]"
+
+    def __call__(self, input_variables, cwd, logger):
+        return "\n".join("x" * 30 for _ in range(int(input_variables[0])))
+
+def test_aci_caps_observations(tmp_path):
+    aci = AgentComputerInterface(tmp_path, Toolkit([Loud(), Finish()]), logger=None, max_observation_tokens=100)
+    assert "cut off" not in aci.get_observation("Loud", ["5"])
+    obs = aci.get_observation("Loud", ["100"])
+    assert "(The observation was cut off after" in obs and len(obs) < 600
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,74 @@
+import time
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.prefetch import Prefetcher
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.tools.tool import Tool
+
+class Counter(Tool):
+    input_variables = ["text"]
+    desc = "counts its calls"
+    example = "Count[text]"
+
+    def __init__(self, name, read_only, seconds=0.0):
+        self._name, self._read_only, self.seconds = name, read_only, seconds
+        self.calls = []
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def read_only(self):
+        return self._read_only
+
+    def __call__(self, input_variables, cwd, logger):
+        self.calls.append(input_variables[0])
+        time.sleep(self.seconds)
+        return f"{self.name} {input_variables[0]} #{len(self.calls)}"
+
+def test_prefetched_observation_is_used(tmp_path):
+    read = Counter("Read", True, seconds=0.3)
+    aci = AgentComputerInterface(tmp_path, Toolkit([read, Finish()]), logger=None)
+    prefetcher = Prefetcher(aci)
+
+    # streamed in chunks, the action is only complete once something follows it
+    prefetcher("[Thought]look[Action]Read[a")
+    prefetcher("[Thought]look[Action]Read[a]")
+    assert read.calls == []
+    prefetcher("[Thought]look[Action]Read[a]\n[Action]Rea")
+    assert prefetcher.started == 1
+
+    time.sleep(0.4)
+    start = time.monotonic()
+    assert aci.get_observation("Read", ["a"]).startswith("Read a #1")
+    assert time.monotonic() - start < 0.2
+    assert read.calls == ["a"] and aci.memo_stats.prefetched == 1
+
+def test_prefetch_stops_at_mutating_actions(tmp_path):
+    read, write = Counter("Read", True), Counter("Write", False)
+    aci = AgentComputerInterface(tmp_path, Toolkit([read, write, Finish()]), logger=None)
+    prefetcher = Prefetcher(aci)
+    prefetcher("[Action]Write[x]\n[Action]Read[a]\n[Observation]")
+    assert prefetcher.started == 0
+    time.sleep(0.1)
+    assert write.calls == [] and read.calls == []
+
+def test_outdated_prefetches_are_discarded(tmp_path):
+    read, write = Counter("Read", True), Counter("Write", False)
+    aci = AgentComputerInterface(tmp_path, Toolkit([read, write, Finish()]), logger=None)
+    assert aci.prefetch("Read", ["a"])
+    time.sleep(0.1)
+    aci.get_observation("Write", ["x"])
+    assert aci.get_observation("Read", ["a"]).startswith("Read a #2")
+    assert aci.memo_stats.prefetched == 0
+
+if __name__ == "__main__":
+    pytest.main()
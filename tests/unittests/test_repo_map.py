@@ -0,0 +1,76 @@
+import os
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+import SmolCoder.src.repo_map as im_repo_map
+from SmolCoder.src.meta_tokenizer import MetaTokenizer, SysPrompt
+from SmolCoder.src.prompting_strategy import ReAct
+from SmolCoder.src.symbol_index import SymbolIndex, parse_imports
+from SmolCoder.src.toolkit import Toolkit
+
+@pytest.fixture
+def codebase(codebase):
+    (codebase / "src" / "pkg").mkdir(parents=True)
+    (codebase / "src" / "pkg" / "__init__.py").write_text("from .core import Engine\n")
+    (codebase / "src" / "pkg" / "core.py").write_text(
+        "class Engine:\n"
+        "    def run(self, steps: int) -> None:\n"
+        "        pass\n"
+        "    def _helper(self):\n"
+        "        pass\n"
+    )
+    (codebase / "src" / "pkg" / "cli.py").write_text("from pkg.core import Engine\nfrom . import util\n\ndef main(argv):\n    pass\n")
+    (codebase / "src" / "pkg" / "util.py").write_text("import os\nfrom .core import Engine\n\ndef helper(x):\n    pass\n")
+    return codebase
+
+def test_parse_imports():
+    source = "import os, a.b\nfrom c import d\nfrom . import e\nfrom ..f import g\ndef h():\n    import i\n"
+    assert parse_imports(source) == ["os", "a.b", "c", "c.d", ".e", "..f", "..f.g", "i"]
+
+def test_files_are_ranked_by_importers(codebase):
+    index = SymbolIndex(codebase)
+    index.refresh()
+
+    ranked = im_repo_map.rank_files(index.entries())
+    assert ranked[0] == (os.path.join("src", "pkg", "core.py"), 3)
+    assert dict(ranked)[os.path.join("src", "pkg", "util.py")] == 1
+
+def test_map_respects_budget(codebase):
+    index = SymbolIndex(codebase)
+    index.refresh()
+
+    full = im_repo_map.build_repo_map(index.entries(), max_tokens=1000)
+    assert full.splitlines()[:3] == [f"{os.path.join('src', 'pkg', 'core.py')}:", "  class Engine", "    def run(self, steps: int) -> None"]
+    assert "_helper" not in full
+
+    small = im_repo_map.build_repo_map(index.entries(), max_tokens=10)
+    assert len(small) <= 40
+    assert small.startswith(os.path.join("src", "pkg", "core.py"))
+
+def test_map_is_cached(codebase):
+    index = SymbolIndex(codebase)
+    index.refresh()
+    repo_map = im_repo_map.RepoMap(index)
+
+    first = repo_map.render()
+    assert repo_map.cache_file.exists()
+    assert repo_map.render() == first
+
+    (codebase / "src" / "pkg" / "new.py").write_text("from .core import Engine\n\nclass Plugin:\n    pass\n")
+    index.refresh()
+    assert "class Plugin" in repo_map.render()
+
+def test_map_is_part_of_the_sysprompt():
+    toolkit = Toolkit([])
+    react = ReAct("ReAct", lm=None, toolkit=toolkit, mode=0, repo_map="pkg/core.py:\n  class Engine")
+
+    [sysprompt] = MetaTokenizer(toolkit).tokenize(react.sysprompt)
+    assert isinstance(sysprompt, SysPrompt)
+    assert "pkg/core.py:\n  class Engine\n" in sysprompt.content
+
+if __name__ == "__main__":
+    pytest.main()
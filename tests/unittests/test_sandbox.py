@@ -0,0 +1,98 @@
+import threading
+import time
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.sandbox import Limits, WorkerPool
+from SmolCoder.src.symbol_index import get_symbol_index
+from SmolCoder.src.tools.execute_python import ExecutePythonCode
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(size=2, limits=Limits(cpu_seconds=1, wall_seconds=4, memory_mb=1024))
+    yield pool
+    pool.close()
+
+def test_result_and_output(pool, tmp_path):
+    (tmp_path / "data.txt").write_text("42")
+    result = pool.run("print('hello')\n__result__ = int(open('data.txt').read()) + 1", tmp_path)
+    assert result == ("hello\n", "43", None)
+
+def test_exceptions_are_reported(pool, tmp_path):
+    result = pool.run("a = 1\nraise ValueError('bad value')", tmp_path)
+    assert result.error == "ValueError: bad value (line 2)"
+
+    result = pool.run("import sys\nsys.exit(3)", tmp_path)
+    assert result.error.startswith("SystemExit: 3")
+
+def test_namespaces_are_fresh(pool, tmp_path):
+    pool.run("x = 1", tmp_path)
+    assert pool.run("__result__ = 'x' in globals()", tmp_path).result == "False"
+
+def test_limits_recycle_the_worker(pool, tmp_path):
+    assert "did not finish within 4 seconds" in pool.run("import time\ntime.sleep(60)", tmp_path).error
+    assert "cpu time limit" in pool.run("while True:\n    pass", tmp_path).error
+    assert "memory limit" in pool.run("x = bytearray(2 * 1024 ** 3)", tmp_path).error
+    assert "crashed" in pool.run("import os\nos._exit(1)", tmp_path).error
+
+    # the pool still works afterwards
+    assert pool.run("__result__ = 1 + 1", tmp_path).result == "2"
+    assert len(pool._workers) == 2
+
+def test_calls_run_concurrently(pool, tmp_path):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.run("import time\ntime.sleep(1)\n__result__ = 1", tmp_path)))
+               for _ in range(2)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start < 1.9
+    assert [result.result for result in results] == ["1", "1"]
+
+def test_execute_code_tool(tmp_path):
+    tool = ExecutePythonCode(workers=1)
+    try:
+        assert tool(["a = 10\nb = 20\n__result__ = a + b"], cwd=tmp_path) == "__result__ = 30"
+        assert tool(["print('hi')"], cwd=tmp_path) == "hi"
+        assert tool(["pass"], cwd=tmp_path) == "No output found"
+        assert tool(["1 / 0"], cwd=tmp_path) == "Error: ZeroDivisionError: division by zero (line 1)"
+    finally:
+        tool.close()
+
+def test_execute_code_imports_the_checkout_and_sees_edits(codebase):
+    (codebase / ".git").mkdir()
+    (codebase / "src" / "shapes").mkdir(parents=True)
+    (codebase / "src" / "shapes" / "__init__.py").write_text("SIDES = 3\n")
+    (codebase / "tests").mkdir()
+
+    tool = ExecutePythonCode(workers=1)
+    try:
+        # from a subfolder, the `src` layout is on the path like in an installed checkout
+        assert tool(["import shapes\n__result__ = shapes.SIDES"], cwd=codebase / "tests") == "__result__ = 3"
+
+        (codebase / "src" / "shapes" / "__init__.py").write_text("SIDES = 4\n")
+        get_symbol_index(codebase).update_file(codebase / "src" / "shapes" / "__init__.py")
+        assert tool(["import shapes\n__result__ = shapes.SIDES"], cwd=codebase / "tests") == "__result__ = 4"
+    finally:
+        tool.close()
+
+def test_recycle_ignores_other_files(tmp_path):
+    pool = WorkerPool(size=1)
+    try:
+        [worker] = pool._workers
+        pool.recycle([tmp_path / "README.md"])
+        assert pool._workers == [worker]
+        pool.recycle([tmp_path / "module.py"])
+        assert pool._workers != [worker]
+        assert pool.run("__result__ = 1", tmp_path).result == "1"
+    finally:
+        pool.close()
+
+if __name__ == "__main__":
+    pytest.main()
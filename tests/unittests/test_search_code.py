@@ -0,0 +1,112 @@
+import os
+import shutil
+import pytest
+
+from pathlib import Path 
+import sys 
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+import SmolCoder.src.trigram_index as im_trigram_index
+from SmolCoder.src.tools.search_code import SearchCode
+from SmolCoder.src.meta_tokenizer import Action
+from SmolCoder.src.symbol_index import get_symbol_index
+
+test_codebase = Path(os.path.dirname(__file__)) / '../test_codebase'
+
+@pytest.fixture
+def codebase(codebase):
+    (codebase / "pkg").mkdir()
+    (codebase / ".git").mkdir()
+    (codebase / ".git" / "config").write_text("class MyClass: hidden")
+    shutil.copy(test_codebase / "test.py", codebase / "pkg" / "test.py")
+    (codebase / "pkg" / "other.py").write_text("from test import MyClass\n\nx = MyClass()\n")
+    return codebase
+
+def test_required_literals():
+    assert im_trigram_index.required_literals(r"def foo\(") == ["def foo("]
+    assert im_trigram_index.required_literals(r"class \w+Error") == ["class ", "Error"]
+    assert im_trigram_index.required_literals(r"colou?r_value") == ["colo", "r_value"]
+    assert im_trigram_index.required_literals(r"foo|bar") == []
+
+def test_search_ranks_definitions_first(codebase):
+    index = im_trigram_index.TrigramIndex(codebase)
+    index.refresh()
+
+    hits, total = index.search("MyClass")
+    assert total == 4
+    assert [(hit.path.name, hit.lineno) for hit in hits] == [("test.py", 1), ("test.py", 13), ("other.py", 1), ("other.py", 3)]
+
+    hits, total = index.search(r"class \w+2", regex=True)
+    assert [(hit.path.name, hit.line) for hit in hits] == [("test.py", "class MyClass2:")]
+
+def test_search_notices_edits(codebase):
+    index = im_trigram_index.TrigramIndex(codebase)
+    index.refresh()
+    assert index.search("changed_value") == ([], 0)
+
+    with open(codebase / "pkg" / "other.py", "a") as f:
+        f.write("y = 'changed_value'\n")
+    index.refresh()
+    hits, _ = index.search("changed_value")
+    assert [(hit.path.name, hit.lineno) for hit in hits] == [("other.py", 4)]
+
+def test_search_follows_the_symbol_index(codebase, monkeypatch):
+    index = im_trigram_index.TrigramIndex(codebase)
+    index.refresh()
+    symbol_index = get_symbol_index(codebase)
+    # searches do not walk the repository again
+    monkeypatch.setattr(index, "refresh", None)
+    assert index.search("new_function") == ([], 0)
+
+    path = codebase / "pkg" / "new.py"
+    path.write_text("def new_function():\n    pass\n")
+    symbol_index.update_file(path)
+    hits, _ = index.search("new_function")
+    assert [(hit.path.name, hit.lineno) for hit in hits] == [("new.py", 1)]
+
+    path.unlink()
+    symbol_index.update_file(path)
+    assert index.search("new_function") == ([], 0)
+    index.stop_watching()
+
+def test_search_in_files_whose_lowered_content_is_longer(codebase):
+    # `İ`.lower() has two characters, positions in the lowered content are off by one for each of them
+    (codebase / "pkg" / "cities.py").write_text("# " + "İ" * 40 + "\nx = 1\nvalue = 2\ny = 3\n")
+    index = im_trigram_index.TrigramIndex(codebase)
+    index.refresh()
+    hits, total = index.search("value")
+    assert [(hit.path.name, hit.lineno, hit.line) for hit in hits] == [("cities.py", 3, "value = 2")]
+    assert total == 1
+
+def test_short_queries_scan_all_files(codebase):
+    index = im_trigram_index.TrigramIndex(codebase)
+    index.refresh()
+    hits, total = index.search("x")
+    assert ("other.py", 3) in [(hit.path.name, hit.lineno) for hit in hits]
+    assert total > 0
+    assert index.search("zq") == ([], 0)
+
+    # no literal of three characters in the regular expression
+    hits, _ = index.search(r"x = \w+", regex=True)
+    assert [(hit.path.name, hit.lineno) for hit in hits] == [("other.py", 3)]
+
+def test_search_code_tool(codebase):
+    tool = SearchCode()
+    result = tool(["does stuff"], cwd=codebase / "pkg")
+    assert result == "Found 1 matches for `does stuff`:\ntest.py:8: This method does stuff."
+
+    assert tool(["if"], cwd=codebase) == f"No matches found for `if` in `{codebase}`."
+    assert tool(["do"], cwd=codebase / "pkg") == ("Found 4 matches for `do`:\ntest.py:3: Class Docstring\n"
+                                                  "test.py:6: def do_stuff(self) -> str:\ntest.py:8: This method does stuff.\n"
+                                                  "test.py:15: Another class Docstring")
+
+    result = tool(["/MyClass(/"], cwd=codebase)
+    assert result.startswith("The regular expression `MyClass(` is invalid")
+
+def test_search_query_is_not_split():
+    action, _ = Action.match("[Action] Search_Code[foo(a, b)]")
+    assert action.input_variables == ["foo(a, b)"]
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,142 @@
+import os
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+import SmolCoder.src.source_edit as im_source_edit
+from SmolCoder.src.meta_tokenizer import Action, IncrementalMetaTokenizer, MetaTokenizer
+from SmolCoder.src.source_edit import EditError, MethodEdit, apply_edits, splice_method
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.tools.replace_method import ReplaceMethod
+
+SOURCE = '''import os  # keep this comment
+
+
+class Outer:
+    """Docstring."""
+
+    x = {"a": 1,
+         "b": 2}
+
+    @staticmethod
+    @property
+    def first(  a,
+                b ):   # odd formatting
+        return a+b
+
+    class Inner:
+        def second(self):
+            return 2  # trailing comment
+
+    def third(self): return 3
+
+
+def function():
+    pass
+'''
+
+@pytest.fixture
+def codebase(codebase):
+    (codebase / "pkg" / "sub").mkdir(parents=True)
+    (codebase / "pkg" / "sub" / "outer.py").write_text(SOURCE)
+    (codebase / "pkg" / "other.py").write_text("class Other:\n    def run(self):\n        return 1\n")
+    return codebase
+
+def test_splice_keeps_the_rest_of_the_file():
+    result = splice_method(SOURCE.encode(), "Outer", "first", "def first(a, b):\n    return a - b\n").decode()
+    assert result == SOURCE.replace(
+        "    @staticmethod\n    @property\n    def first(  a,\n                b ):   # odd formatting\n        return a+b\n",
+        "    def first(a, b):\n        return a - b\n")
+
+def test_splice_nested_and_single_line_methods():
+    result = splice_method(SOURCE.encode(), "Outer.Inner", "second", "    def second(self):\n        return 'two'").decode()
+    assert "            return 'two'\n\n    def third(self): return 3\n" in result
+    assert "# trailing comment" not in result
+    assert "import os  # keep this comment" in result
+
+    result = splice_method(SOURCE.encode(), "Outer", "third", "def third(self):\n    return 33\n").decode()
+    assert result.endswith("    def third(self):\n        return 33\n\n\ndef function():\n    pass\n")
+
+def test_splice_errors():
+    with pytest.raises(EditError, match="not found"):
+        splice_method(SOURCE.encode(), "Outer", "missing", "def missing(self):\n    pass\n")
+    with pytest.raises(EditError, match="not valid python"):
+        splice_method(SOURCE.encode(), "Outer", "third", "def third(self)\n    pass\n")
+    with pytest.raises(EditError, match="function definitions"):
+        splice_method(SOURCE.encode(), "Outer", "third", "x = 1\n")
+
+def test_first_line_without_indentation():
+    # the tokenizer strips the argument, so the first line loses its indentation
+    result = splice_method(SOURCE.encode(), "Outer", "third", "def third(self):\n        return 3 + 0\n").decode()
+    assert "    def third(self):\n        return 3 + 0\n" in result
+
+def test_transaction_is_all_or_nothing(codebase):
+    outer, other = codebase / "pkg" / "sub" / "outer.py", codebase / "pkg" / "other.py"
+    with pytest.raises(EditError):
+        apply_edits([
+            MethodEdit(other, "Other", "run", "def run(self):\n    return 2\n"),
+            MethodEdit(outer, "Outer", "missing", "def missing(self):\n    pass\n"),
+        ])
+    assert other.read_text() == "class Other:\n    def run(self):\n        return 1\n"
+
+    assert apply_edits([
+        MethodEdit(outer, "Outer", "first", "def first(a, b):\n    return 0\n"),
+        MethodEdit(outer, "Outer", "third", "def third(self):\n    return 0\n"),
+        MethodEdit(other, "Other", "run", "def run(self):\n    return 2\n"),
+    ]) == [outer, other]
+    assert outer.read_text().count("return 0") == 2
+    assert other.read_text() == "class Other:\n    def run(self):\n        return 2\n"
+
+def test_transaction_rolls_back_failed_writes(codebase, monkeypatch):
+    outer, other = codebase / "pkg" / "sub" / "outer.py", codebase / "pkg" / "other.py"
+    write = im_source_edit._write
+
+    def failing_write(path, content):
+        if path == other and b"return 2" in content:
+            raise OSError("disk full")
+        write(path, content)
+
+    monkeypatch.setattr(im_source_edit, "_write", failing_write)
+    with pytest.raises(EditError, match="rolled back"):
+        apply_edits([
+            MethodEdit(outer, "Outer", "third", "def third(self):\n    return 0\n"),
+            MethodEdit(other, "Other", "run", "def run(self):\n    return 2\n"),
+        ])
+    assert outer.read_text() == SOURCE
+
+def test_replace_method_finds_classes_in_subdirectories(codebase):
+    tool = ReplaceMethod()
+    result = tool(["Inner", "second", "def second(self):\n    return 22\n"], cwd=codebase, logger=None)
+    assert result == f"Method 'second' in class 'Outer.Inner' replaced successfully in file '{os.path.join('pkg', 'sub', 'outer.py')}'."
+
+    result = tool.replace_many([("Other", "run", "def run(self):\n    return 3\n"),
+                                ("Outer", "missing", "def missing(self):\n    pass\n")], cwd=codebase)
+    assert result.startswith("Error: Method 'missing' not found")
+    assert "return 1" in (codebase / "pkg" / "other.py").read_text()
+
+def test_code_argument_is_not_split_at_commas():
+    action, _ = Action.match("[Action]Replace_Method[MyClass, do_stuff, def do_stuff(self, a, b):\n    return a, b\n]")
+    assert action.input_variables == ["MyClass", "do_stuff", "def do_stuff(self, a, b):\n    return a, b"]
+
+def test_code_argument_keeps_its_newlines_in_the_trajectory():
+    trajectory = ("[Sysprompt]You fix bugs.[Sysprompt]\n[Question] Fix it.\n[Thought] Replace the method.\n"
+                  "[Action] Replace_Method[MyClass, do_stuff, def do_stuff(self, a, b):\n    if a:\n        return b[0]\n    return a, b\n]\n"
+                  "[Observation] Done.\n")
+    expected = ("Replace_Method", ["MyClass", "do_stuff", "def do_stuff(self, a, b):\n    if a:\n        return b[0]\n    return a, b"])
+
+    tokenizer = MetaTokenizer(Toolkit([ReplaceMethod(), Finish()]))
+    [action] = [token for token in tokenizer.tokenize(trajectory) if isinstance(token, Action)]
+    assert action.unpack() == expected
+
+    stream = IncrementalMetaTokenizer(tokenizer)
+    for line in trajectory.splitlines(keepends=True):
+        stream.feed(line)
+    assert stream.is_valid()
+    assert [token.unpack() for token in stream if isinstance(token, Action)] == [expected]
+
+if __name__ == "__main__":
+    pytest.main()
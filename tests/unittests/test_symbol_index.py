@@ -0,0 +1,201 @@
+import os
+import shutil
+import threading
+import time
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+import SmolCoder.src.symbol_index as im_symbol_index
+from SmolCoder.src.tools.list_methods import ListMethods
+from SmolCoder.src.tools.list_classes import ListClasses
+from SmolCoder.src.tools.show_method import ShowMethodBody
+from SmolCoder.src.tools.replace_method import ReplaceMethod
+
+test_codebase = Path(os.path.dirname(__file__)) / '../test_codebase'
+
+@pytest.fixture
+def codebase(codebase):
+    (codebase / "pkg").mkdir()
+    shutil.copy(test_codebase / "test.py", codebase / "pkg" / "test.py")
+    return codebase
+
+def test_parse_symbols():
+    source = (test_codebase / "test.py").read_text()
+    symbols = im_symbol_index.parse_symbols(source)
+
+    assert [(s.kind, s.qualname) for s in symbols] == [
+        ("class", "MyClass"),
+        ("method", "MyClass.do_stuff"),
+        ("class", "MyClass2"),
+    ]
+    assert symbols[1].signature == "do_stuff(self) -> str"
+    assert symbols[1].docstring == "This method does stuff."
+    assert (symbols[1].lineno, symbols[1].end_lineno) == (6, 10)
+
+def test_index_is_persisted(codebase):
+    index = im_symbol_index.SymbolIndex(codebase)
+    assert index.refresh() == 1
+
+    loaded = im_symbol_index.SymbolIndex(codebase)
+    assert loaded.load()
+    assert loaded.refresh() == 0
+    assert [s.name for _, s in loaded.find_methods("MyClass")] == ["do_stuff"]
+
+def test_index_notices_changed_files(codebase):
+    index = im_symbol_index.get_symbol_index(codebase)
+    assert index.find_classes("NewClass") == []
+
+    with open(codebase / "pkg" / "test.py", "a") as f:
+        f.write("\n\nclass MyClass3:\n    def new_method(self):\n        pass\n")
+    assert [s.name for _, s in index.find_methods("MyClass")] == ["do_stuff"]
+    assert [s.name for _, s in index.find_methods("MyClass3")] == ["new_method"]
+
+def test_git_blob_hash():
+    # `echo 'hello' | git hash-object --stdin`
+    assert im_symbol_index.git_blob_hash(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+def test_blob_cache_is_shared_between_checkouts(codebase, tmp_path):
+    other = tmp_path / "other_checkout"
+    shutil.copytree(codebase, other)
+    (other / "pkg" / "changed.py").write_text("def changed():\n    pass\n")
+
+    im_symbol_index.SymbolIndex(codebase).refresh()
+    blob_cache = im_symbol_index.get_blob_cache(tmp_path / "cache")
+    hits, misses = blob_cache.hits, blob_cache.misses
+
+    index = im_symbol_index.SymbolIndex(other)
+    assert index.refresh() == 2
+    # only the new blob had to be parsed
+    assert blob_cache.hits - hits == 1
+    assert blob_cache.misses - misses == 1
+    assert [s.name for _, s in index.find_functions("changed")] == ["changed"]
+
+def test_parallel_build(codebase, monkeypatch):
+    monkeypatch.setattr(im_symbol_index, "PARALLEL_THRESHOLD", 4)
+    for i in range(16):
+        (codebase / "pkg" / f"module_{i}.py").write_text(f"class Generated{i}:\n    def method_{i}(self):\n        pass\n")
+
+    index = im_symbol_index.SymbolIndex(codebase, workers=2)
+    index.refresh()
+
+    assert index.last_build.workers == 2
+    assert index.last_build.files == 17
+    assert index.last_build.parsed == 17
+    assert index.last_build.throughput > 0
+    assert [s.qualname for _, s in index.find_methods("Generated7")] == ["Generated7.method_7"]
+
+def test_a_build_does_not_block_other_repositories(codebase, tmp_path, monkeypatch):
+    other = tmp_path / "other"
+    other.mkdir()
+    started, release = threading.Event(), threading.Event()
+    refresh = im_symbol_index.SymbolIndex.refresh
+
+    def slow_refresh(index):
+        if index.root == codebase.resolve():
+            started.set()
+            release.wait(5)
+        return refresh(index)
+
+    monkeypatch.setattr(im_symbol_index.SymbolIndex, "refresh", slow_refresh)
+    indexes = []
+    builders = [threading.Thread(target=lambda: indexes.append(im_symbol_index.get_symbol_index(codebase))) for _ in range(2)]
+    for builder in builders:
+        builder.start()
+    assert started.wait(5)
+
+    start = time.monotonic()
+    assert im_symbol_index.find_symbol_index(codebase) is None
+    assert im_symbol_index.get_symbol_index(other).root == other.resolve()
+    assert time.monotonic() - start < 1
+
+    release.set()
+    for builder in builders:
+        builder.join(5)
+    # both callers got the one index that was built
+    assert len(indexes) == 2 and indexes[0] is indexes[1] is im_symbol_index.find_symbol_index(codebase)
+
+def test_replace_method_writes_through(codebase):
+    cwd = codebase / "pkg"
+    index = im_symbol_index.get_symbol_index(cwd)
+    changed = []
+    index.add_listener(changed.extend)
+
+    new_method = "def do_stuff(self) -> str:\n    return 'changed'\n"
+    result = ReplaceMethod()(["MyClass", "do_stuff", new_method], cwd=cwd, logger=None)
+    assert "replaced successfully" in result
+
+    assert changed == [cwd.resolve() / "test.py"]
+    [(_, symbol)] = index.find_methods("MyClass", "do_stuff")
+    assert symbol.docstring is None
+
+def test_watcher_picks_up_external_changes(codebase):
+    index = im_symbol_index.SymbolIndex(codebase)
+    index.refresh()
+    changed = []
+    index.add_listener(changed.extend)
+
+    index.start_watching(interval=0.05)
+    try:
+        (codebase / "pkg" / "external.py").write_text("class External:\n    pass\n")
+        deadline = time.time() + 5
+        while not changed and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        index.stop_watching()
+
+    assert changed == [codebase.resolve() / "pkg" / "external.py"]
+    assert [s.name for _, s in index.find_classes("External")] == ["External"]
+
+def test_tools_use_index(codebase):
+    cwd = codebase / "pkg"
+
+    result = ListMethods()(["MyClass"], cwd=cwd, logger=None)
+    assert result == "Method `do_stuff(self) -> str` with docstring `{ This method does stuff. }`"
+
+    result = ShowMethodBody()(["MyClass", "do_stuff"], cwd=codebase, logger=None)
+    assert result.startswith("```\ndef do_stuff(self) -> str:\n")
+    assert result.endswith("        return 'test'\n```")
+
+    result = ListClasses()(["test.py"], cwd=cwd, logger=None)
+    assert result == "The classes in `test.py` are `MyClass` with docstring `Class Docstring`, `MyClass2` with docstring `Another class Docstring`."
+
+def test_symbol_offsets():
+    source = "# ä comment\nclass A:\n    def f(self):\n        return 'ö'\n\ndef g():\n    pass"
+    data = source.encode("utf-8")
+    symbols = {s.qualname: s for s in im_symbol_index.parse_symbols(source)}
+    assert data[symbols["A.f"].start:symbols["A.f"].end] == "    def f(self):\n        return 'ö'\n".encode("utf-8")
+    # the last line has no newline
+    assert data[symbols["g"].start:symbols["g"].end] == b"def g():\n    pass"
+
+def test_resolve_dotted_names(codebase):
+    (codebase / "pkg" / "__init__.py").write_text("class Outer:\n    class Inner:\n        def run(self):\n            pass\n\ndef helper():\n    return 1\n")
+    index = im_symbol_index.get_symbol_index(codebase)
+
+    for name in ["pkg.test.MyClass.do_stuff", "test.MyClass.do_stuff", "MyClass.do_stuff"]:
+        assert [s.qualname for _, s in index.resolve(name)] == ["MyClass.do_stuff"]
+    assert [s.qualname for _, s in index.resolve("pkg.Outer.Inner.run")] == ["Outer.Inner.run"]
+    assert [s.qualname for _, s in index.resolve("pkg.helper")] == ["helper"]
+    assert index.resolve("other.MyClass.do_stuff") == []
+    assert index.resolve("st.MyClass.do_stuff") == []
+
+def test_show_method_body_by_offsets(codebase):
+    (codebase / "pkg" / "util.py").write_text("def helper(x):\n    return x + 1\n")
+    tool = ShowMethodBody()
+    assert tool(["pkg.util.helper"], cwd=codebase, logger=None) == "```\ndef helper(x):\n    return x + 1\n```"
+    assert tool(["test.MyClass.do_stuff"], cwd=codebase, logger=None).startswith("```\ndef do_stuff(self) -> str:\n")
+    assert tool(["missing"], cwd=codebase, logger=None) == f"No method or function `missing` found in any module in {codebase}"
+
+    index = im_symbol_index.get_symbol_index(codebase)
+    [(path, symbol)] = index.resolve("helper")
+    with open(path, "w") as f:
+        f.write("import os\n\ndef helper(x):\n    return x + 2\n")
+    # stale offsets are never used for the new content
+    assert index.source(path, symbol) is None
+    assert tool(["helper"], cwd=codebase, logger=None) == "```\ndef helper(x):\n    return x + 2\n```"
+
+if __name__ == "__main__":
+    pytest.main()
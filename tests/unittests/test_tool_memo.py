@@ -0,0 +1,77 @@
+import os
+import shutil
+import pytest
+
+from pathlib import Path
+import sys
+path_root = Path(__file__).parents[2]
+sys.path.append(str(path_root))
+
+from SmolCoder.src.aci import AgentComputerInterface
+from SmolCoder.src.symbol_index import find_symbol_index, get_symbol_index
+from SmolCoder.src.toolkit import Toolkit
+from SmolCoder.src.tools.finish import Finish
+from SmolCoder.src.tools.list_files import ListFiles
+from SmolCoder.src.tools.replace_method import ReplaceMethod
+from SmolCoder.src.tools.search_code import SearchCode
+from SmolCoder.src.tools.show_method import ShowMethodBody
+
+test_codebase = Path(os.path.dirname(__file__)) / '../test_codebase'
+
+@pytest.fixture
+def codebase(codebase):
+    shutil.copy(test_codebase / "test.py", codebase / "test.py")
+    return codebase
+
+def _aci(codebase):
+    return AgentComputerInterface(codebase, Toolkit([ListFiles(), ShowMethodBody(), ReplaceMethod(), Finish()]), logger=None)
+
+def test_repeated_calls_are_memoized(codebase):
+    aci = _aci(codebase)
+    first = aci.get_observation("List_Files", ["."])
+    (codebase / "new.txt").write_text("not seen, the observation is memoized")
+    assert aci.get_observation("List_Files", ["."]) == first
+    assert aci.get_observation("List_Files", ["  .  "]) == first
+    assert aci.memo_stats.hits == 2 and aci.memo_stats.misses == 1
+
+    aci.clear_memo()
+    assert "new.txt" in aci.get_observation("List_Files", ["."])
+
+def test_whitespace_within_arguments_is_kept(codebase):
+    (codebase / "spaces.py").write_text("a = 'foo  bar'\n")
+    aci = AgentComputerInterface(codebase, Toolkit([SearchCode(), Finish()]), logger=None)
+    assert aci.get_observation("Search_Code", ["foo bar"]).startswith("No matches found")
+    assert aci.get_observation("Search_Code", ["foo  bar"]).startswith("Found 1 matches")
+    assert aci.memo_stats.misses == 2
+
+def test_writes_invalidate_the_memo(codebase):
+    aci = _aci(codebase)
+    assert "return" in aci.get_observation("Show_Method_Body", ["MyClass", "do_stuff"])
+    obs = aci.get_observation("Replace_Method", ["MyClass", "do_stuff", "def do_stuff(self) -> str:\n    return 'changed'\n"])
+    assert "replaced successfully" in obs
+    assert "'changed'" in aci.get_observation("Show_Method_Body", ["MyClass", "do_stuff"])
+    assert aci.memo_stats.hits == 0
+
+def test_index_changes_invalidate_the_memo(codebase):
+    aci = _aci(codebase)
+    first = aci.get_observation("Show_Method_Body", ["MyClass", "do_stuff"])
+    path = codebase / "test.py"
+    path.write_text(path.read_text().replace("def do_stuff", "def do_other_stuff"))
+    get_symbol_index(codebase).update_file(path)
+    assert aci.get_observation("Show_Method_Body", ["MyClass", "do_stuff"]) != first
+    assert aci.memo_stats.misses == 2
+
+def test_only_tools_of_the_symbol_index_build_it(codebase):
+    aci = _aci(codebase)
+    aci.get_observation("List_Files", ["."])
+    assert find_symbol_index(codebase) is None
+
+    aci.get_observation("Show_Method_Body", ["MyClass", "do_stuff"])
+    assert find_symbol_index(codebase) is not None
+    # from now on the memoized listing is invalidated by the index as well
+    (codebase / "new.py").write_text("")
+    get_symbol_index(codebase).update_file(codebase / "new.py")
+    assert "new.py" in aci.get_observation("List_Files", ["."])
+
+if __name__ == "__main__":
+    pytest.main()